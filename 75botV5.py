@@ -3,29 +3,64 @@
 Bot Discord complet regroupant :
 - Hébergement de "hosting channels" (texte / vocal)
 - Création de canaux temporaires (texte ou vocal)
-- Limite : maximum 3 canaux temporaires actifs par utilisateur
+- Limite : 3 canaux temporaires actifs par utilisateur par défaut (MAX_TEMP_PER_USER, réglable par serveur avec /set_temp_quota)
 - Commandes slash et commandes préfixées (où utile)
-- Langues / traductions (fr / en / ar)
-- Keepalive minimal via Flask (utile pour Replit)
-- Persistance JSON pour ne pas perdre les configs au redémarrage
-- Gestion automatique de suppression de canaux vides
-- Keepalive configurable par serveur (envoi périodique)
-- Commandes d'administration : setup_hosting, remove_hosting, list_hosting, setup_keepalive, remove_keepalive, keepalive_status
+- Langues / traductions (fr / en / ar, un fichier par langue dans locales/, chargé à la demande)
+- Keepalive HTTP sur la boucle du bot (utile pour Replit) : /healthz, /readyz et métriques Prometheus sur /metrics
+- Persistance JSON pour ne pas perdre les configs au redémarrage (écriture différée et regroupée, atomique)
+- Moteur de stockage SQLite optionnel (STORAGE_BACKEND=sqlite) : tables normalisées, WAL, migration depuis le JSON
+- Moteur journal optionnel (STORAGE_BACKEND=journal) : ajout en fin de fichier par lot + compaction en snapshot
+- Moteur par serveur optionnel (STORAGE_BACKEND=sharded) : un fichier par serveur, chargé à la demande
+- Gestion automatique de suppression de canaux vides (échéances pilotées par les événements vocaux, sans polling)
+- Recyclage : un salon vocal vidé reste réservé à son propriétaire pendant RECYCLE_WINDOW_SECONDS
+- Purge en masse des salons temporaires (/purge_temp) : filtres, suppressions parallèles bornées, reprise sur 429/5xx
+- Contrôle d'admission des créations : place du quota réservée atomiquement, seaux à jetons par membre / hosting channel /
+  serveur, délestage si la passerelle ou l'API REST sature
+- Expiration des salons texte temporaires inactifs (TEXT_IDLE_MINUTES ou par hosting channel, désactivée par défaut),
+  avertissement facultatif
+- Logs JSON structurés (LOG) écrits par un thread : file bornée sans blocage, échantillonnage, erreurs répétées regroupées
+- Traçage optionnel (TRACE_SAMPLE_RATE / TRACE_SLOW_MS) : spans par handler, commande et appel REST, fichier OTLP/JSON
+- Profilage à la demande (/perf_profile, admins) : échantillonnage de la pile de la boucle ou tracemalloc,
+  une session bornée à la fois
+- Réconciliation au démarrage : enregistrements orphelins supprimés, échéances de suppression réarmées
+- Keepalive configurable par serveur (envoi périodique, échéances triées, envois parallèles bornés, gigue)
+- Sharding optionnel (SHARD_COUNT / SHARD_IDS, AutoShardedBot) : échéances, envois keepalive et métriques par shard
+- Mode cluster optionnel (CLUSTER_WORKERS=N) : un coordinateur lance et relance N processus, état partagé en SQLite,
+  langues des utilisateurs / salons relues périodiquement par chaque worker
+- Commandes d'administration : setup_hosting, remove_hosting, list_hosting, set_temp_quota, purge_temp, perf_profile, setup_keepalive, remove_keepalive, keepalive_status
 - Commandes utilisateur : create_temp, delete_temp, list_temp, invite (pour inviter/ajouter un user), change_host
 - Le code est volontairement détaillé et commenté.
 """
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import discord.app_commands as app_commands
+import abc
 import asyncio
+import contextlib
+import contextvars
+import functools
+import hashlib
+import heapq
+import io
 import json
 import os
-from threading import Thread
-from flask import Flask
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
 from typing import Optional, Dict, Any, List
 import time
 import traceback
+import tracemalloc
+import math
+from collections import deque
+import string
+import signal
+import subprocess
+import sys
+import urllib.request
 
 # ---------------------------
 # Configuration / constants
@@ -34,39 +69,634 @@ import traceback
 DATA_FILE = "bot_data.json"  # persistence file
 DEFAULT_TEMP_CATEGORY_ID = None  # si tu veux forcer une catégorie par défaut, mets l'ID ici, sinon None
 KEEPALIVE_PORT = int(os.environ.get("KEEPALIVE_PORT", 8080))
+# délai avant suppression d'un salon vocal temporaire resté vide (annulé si quelqu'un revient)
+EMPTY_CHANNEL_DELETE_SECONDS = float(os.environ.get("EMPTY_CHANNEL_DELETE_SECONDS", 10))
+# fenêtre pendant laquelle un salon vocal vidé reste disponible pour son propriétaire (modifiable par hosting channel)
+RECYCLE_WINDOW_SECONDS = float(os.environ.get("RECYCLE_WINDOW_SECONDS", 60))
+# salons texte temporaires : expiration après N minutes sans message (modifiable par hosting channel, 0 = jamais,
+# valeur par défaut : les déploiements existants ne perdent pas de salons sans l'avoir demandé),
+# avertissement facultatif avant, balayage périodique et nombre max de suppressions par serveur et par balayage
+TEXT_IDLE_MINUTES = float(os.environ.get("TEXT_IDLE_MINUTES", 0))
+TEXT_IDLE_WARNING_MINUTES = float(os.environ.get("TEXT_IDLE_WARNING_MINUTES", 0))
+IDLE_SWEEP_SECONDS = float(os.environ.get("IDLE_SWEEP_SECONDS", 60))
+IDLE_SWEEP_BATCH = int(os.environ.get("IDLE_SWEEP_BATCH", 25))
+# keepalive : envois simultanés max, espacement minimal par salon, gigue (fraction de l'intervalle), intervalle minimal
+KEEPALIVE_CONCURRENCY = int(os.environ.get("KEEPALIVE_CONCURRENCY", 10))
+KEEPALIVE_CHANNEL_MIN_GAP = float(os.environ.get("KEEPALIVE_CHANNEL_MIN_GAP", 5))
+KEEPALIVE_JITTER_RATIO = float(os.environ.get("KEEPALIVE_JITTER_RATIO", 0.05))
+KEEPALIVE_MIN_INTERVAL_SECONDS = 10
+KEEPALIVE_RETRY_SECONDS = 60
+# Mode cluster : CLUSTER_WORKERS > 1 -> processus coordinateur + N workers (CLUSTER_WORKER_ID est posé par le coordinateur)
+CLUSTER_WORKERS = int(os.environ.get("CLUSTER_WORKERS", 1))
+CLUSTER_WORKER_ID = int(os.environ["CLUSTER_WORKER_ID"]) if os.environ.get("CLUSTER_WORKER_ID") else None
+CLUSTER_MODE = CLUSTER_WORKERS > 1 or CLUSTER_WORKER_ID is not None
+CLUSTER_LEASE_SECONDS = 30.0
+# user_lang / channel_lang ne sont rattachés à aucun shard : chaque worker relit ceux des autres dans la base partagée
+CLUSTER_LANG_REFRESH_SECONDS = float(os.environ.get("CLUSTER_LANG_REFRESH_SECONDS", 10))
 
 # If present, a config.json can specify token and optionally guild id (not required)
 CONFIG_FILE = "config.json"
 
 # ---------------------------
-# Flask keepalive (minimal)
+# Structured logging (queue + background writer thread)
 # ---------------------------
-app = Flask("keepalive_app")
+# Les handlers n'écrivent plus sur stdout : LOG.info / LOG.error déposent une entrée dans une file bornée
+# (les plus anciennes sont perdues si elle est pleine, la boucle n'attend jamais) et un thread écrit
+# une ligne JSON par entrée (ts, level, event, msg, guild / user / channel, champs libres, traceback).
+# Les tracebacks sont mis en forme par le thread. LOG_SAMPLE="event=ratio,..." échantillonne les événements
+# fréquents ; une même erreur répétée n'est écrite qu'une fois par LOG_ERROR_WINDOW_SECONDS (avec le nombre de répétitions).
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "off": 100}
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "info").lower()
+LOG_FILE = os.environ.get("LOG_FILE") or None  # vide = stdout
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_ERROR_WINDOW_SECONDS = float(os.environ.get("LOG_ERROR_WINDOW_SECONDS", 60))
+LOG_SAMPLE = {k.strip(): float(v) for k, v in (item.split("=", 1) for item in os.environ.get("LOG_SAMPLE", "").split(",") if "=" in item)}
+
+
+class StructuredLogger:
+    def __init__(self, path: Optional[str], level: str, queue_size: int, sample: Dict[str, float], error_window: float):
+        self.path = path
+        self.min_level = LOG_LEVELS.get(level, LOG_LEVELS["info"])
+        self.sample = sample
+        self.error_window = error_window
+        self._queue: deque = deque(maxlen=max(queue_size, 1))
+        self._wake = threading.Event()
+        self._stop = False
+        self._errors: Dict[tuple, list] = {}   # (event, type, message) -> [fenêtre jusqu'à, répétitions masquées]
+        self._thread: Optional[threading.Thread] = None
+        # appelé depuis la boucle et depuis d'autres threads (export des traces, bail du cluster) :
+        # fenêtres d'erreurs, compteurs et démarrage du thread d'écriture sont protégés
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"written": 0, "dropped": 0, "sampled_out": 0, "suppressed": 0}
+
+    def log(self, level: str, event: str, msg: str = "", exc: Any = False, guild: Any = None, user: Any = None, channel: Any = None, **fields) -> None:
+        """
+        guild / user / channel : objet discord ou id. exc=True joint l'exception en cours, exc=<exception> celle-ci
+        (résultat d'un gather(return_exceptions=True) par exemple).
+        """
+        if LOG_LEVELS[level] < self.min_level:
+            return
+        ratio = self.sample.get(event)
+        if ratio is not None and random.random() >= ratio:
+            with self._lock:
+                self.stats["sampled_out"] += 1
+            return
+        if isinstance(exc, BaseException):
+            exc_info = (type(exc), exc, exc.__traceback__)
+        else:
+            exc_info = sys.exc_info() if exc else None
+        if exc_info is not None and exc_info[0] is None:
+            exc_info = None
+        now = time.time()
+        entry = {"ts": round(now, 3), "level": level, "event": event}
+        if msg:
+            entry["msg"] = msg
+        for name, value in (("guild", guild), ("user", user), ("channel", channel)):
+            if value is not None:
+                entry[name] = getattr(value, "id", value)
+        if ratio is not None:
+            entry["sample"] = ratio
+        entry.update(fields)
+        with self._lock:
+            if exc_info is not None or level == "error":
+                key = (event, exc_info[0].__name__ if exc_info else None, str(exc_info[1])[:200] if exc_info else msg)
+                window = self._errors.get(key)
+                if window is not None and now < window[0]:
+                    window[1] += 1
+                    self.stats["suppressed"] += 1
+                    return
+                if window is not None and window[1]:
+                    entry["repeated"] = window[1]
+                if len(self._errors) > 1000:
+                    self._errors = {k: w for k, w in self._errors.items() if now < w[0]}
+                self._errors[key] = [now + self.error_window, 0]
+            if len(self._queue) == self._queue.maxlen:
+                self.stats["dropped"] += 1
+            self._queue.append((entry, exc_info))
+            self._ensure_thread()
+        self._wake.set()
+
+    def debug(self, event: str, msg: str = "", **fields) -> None:
+        self.log("debug", event, msg, **fields)
+
+    def info(self, event: str, msg: str = "", **fields) -> None:
+        self.log("info", event, msg, **fields)
+
+    def warning(self, event: str, msg: str = "", **fields) -> None:
+        self.log("warning", event, msg, **fields)
+
+    def error(self, event: str, msg: str = "", exc: Any = True, **fields) -> None:
+        self.log("error", event, msg, exc=exc, **fields)
+
+    def _ensure_thread(self) -> None:
+        # sous _lock : un seul thread d'écriture
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        stream = open(self.path, "a", encoding="utf-8") if self.path else sys.stdout
+        try:
+            while True:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                self._drain(stream)
+                if self._stop:
+                    break
+        finally:
+            if self.path:
+                stream.close()
+
+    def _drain(self, stream) -> None:
+        lines = []
+        while self._queue:
+            try:
+                entry, exc_info = self._queue.popleft()
+            except IndexError:
+                break
+            if exc_info is not None:
+                entry["exc"] = "".join(traceback.format_exception(*exc_info))
+            lines.append(json.dumps(entry, ensure_ascii=False, default=str))
+        if lines:
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+                self.stats["written"] += len(lines)
+            except Exception:
+                pass
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Écrit ce qui reste dans la file puis arrête le thread (à l'arrêt du bot).
+        """
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
 
 
-@app.route("/")
-def home():
-    return "Bot is alive!"
+LOG = StructuredLogger(LOG_FILE, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE, LOG_ERROR_WINDOW_SECONDS)
+
+
+# ---------------------------
+# Tracing (spans per handler / command / REST call, OTLP JSON file exporter)
+# ---------------------------
+# Chaque handler (@timed_handler), commande slash ou préfixée ouvre une span racine ; les appels REST Discord
+# (attente de rate limit comprise) et les flush du stockage faits pendant son exécution deviennent ses enfants.
+# La span courante suit le contexte asyncio (contextvars), y compris dans les tâches créées depuis le handler.
+# Échantillonnage en tête : TRACE_SAMPLE_RATE (0 = off, 1 = tout) ; TRACE_SLOW_MS garde en plus toute trace
+# plus lente que ce seuil. Les traces retenues sont écrites par un thread dans TRACE_FILE, une ligne OTLP/JSON
+# par trace (format lu par le receiver otlpjsonfile d'OpenTelemetry), avec rotation à TRACE_MAX_BYTES.
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0))
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", 0))
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+TRACE_MAX_BYTES = int(os.environ.get("TRACE_MAX_BYTES", 10 * 1024 * 1024))
+TRACE_BACKUPS = int(os.environ.get("TRACE_BACKUPS", 3))
+TRACE_MAX_SPANS = 256  # spans gardées par trace
+TRACE_SERVICE_NAME = "75bot"
+
+_CURRENT_SPAN: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attrs", "error", "root", "spans", "sampled")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attrs = attrs
+        self.error: Optional[str] = None
+        if parent is None:
+            self.trace_id = os.urandom(16).hex()
+            self.parent_id = None
+            self.root = self
+            self.spans: List["Span"] = []
+            self.sampled = False  # décidé par Tracer.start
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.root = parent.root
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
 
 
-def run_keepalive_server() -> None:
+class TraceFileExporter:
     """
-    Démarre le serveur Flask sur un thread séparé.
-    Utilisé pour les environnements comme Replit pour éviter que l'instance soit mise en veille.
+    File de traces terminées + thread d'écriture (les plus anciennes sont perdues si la file est pleine).
     """
-    try:
-        app.run(host="0.0.0.0", port=KEEPALIVE_PORT)
-    except Exception as e:
-        # Si le serveur ne démarre pas, on ignore (par ex. sur un hébergement qui n'autorise pas Flask)
-        print("Keepalive server error:", e)
 
+    def __init__(self, path: str, max_bytes: int, backups: int, queue_size: int = 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: deque = deque(maxlen=queue_size)
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {"exported": 0, "dropped": 0}
+
+    def export(self, spans: List[Span]) -> None:
+        if len(self._queue) == self._queue.maxlen:
+            self.stats["dropped"] += 1
+        self._queue.append(spans)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    @staticmethod
+    def _attr(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _encode(self, spans: List[Span]) -> str:
+        out = []
+        for span in spans:
+            item = {"traceId": span.trace_id, "spanId": span.span_id, "name": span.name, "kind": 1,
+                    "startTimeUnixNano": str(span.start_ns), "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [self._attr(k, v) for k, v in span.attrs.items()],
+                    "status": {"code": 2, "message": span.error} if span.error else {"code": 1}}
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            out.append(item)
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [self._attr("service.name", TRACE_SERVICE_NAME), self._attr("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": TRACE_SERVICE_NAME}, "spans": out}],
+        }]}, ensure_ascii=False)
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(1.0)
+            self._wake.clear()
+            lines = []
+            while self._queue:
+                try:
+                    lines.append(self._encode(self._queue.popleft()))
+                except IndexError:
+                    break
+                except Exception:
+                    LOG.error("trace_export_error", "Erreur d'encodage d'une trace")
+            if lines:
+                try:
+                    if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                        self._rotate()
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                    self.stats["exported"] += len(lines)
+                except Exception:
+                    LOG.error("trace_export_error", "Erreur d'écriture des traces", path=self.path)
+            if self._stop:
+                break
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class Tracer:
+    def __init__(self, exporter: TraceFileExporter, sample_rate: float, slow_ms: float):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.enabled = sample_rate > 0 or slow_ms > 0
+        self.slow_ns = int(slow_ms * 1_000_000) if slow_ms > 0 else 0
+
+    def start(self, name: str, root: bool = True, **attrs) -> Optional[Span]:
+        """
+        Ouvre une span et en fait la span courante du contexte (sans la restaurer : pour les commandes,
+        dont le début et la fin sont dans deux hooks). root=True : nouvelle trace (un handler, une commande) ;
+        root=False : span enfant, seulement sous une span existante.
+        """
+        if not self.enabled:
+            return None
+        parent = None if root else _CURRENT_SPAN.get()
+        if parent is None and not root:
+            return None
+        if parent is not None and not parent.root.sampled and not self.slow_ns:
+            # trace non échantillonnée et pas de seuil de lenteur : inutile d'enregistrer les enfants
+            return None
+        span = Span(name, parent, attrs)
+        if parent is None:
+            span.sampled = random.random() < self.sample_rate
+        _CURRENT_SPAN.set(span)
+        return span
+
+    def finish(self, span: Optional[Span], error: Optional[str] = None) -> None:
+        if span is None or span.end_ns:
+            return
+        span.end_ns = time.time_ns()
+        if error:
+            span.error = error
+        root = span.root
+        if span is not root:
+            if not root.end_ns:
+                if len(root.spans) < TRACE_MAX_SPANS:
+                    root.spans.append(span)
+            elif root.sampled:
+                # tâche de fond terminée après sa span racine : exportée seule
+                self.exporter.export([span])
+            return
+        if not root.sampled and self.slow_ns and root.end_ns - root.start_ns >= self.slow_ns:
+            root.sampled = True
+        if root.sampled:
+            root.spans.append(root)
+            self.exporter.export(root.spans)
+        root.spans = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, root: bool = False, **attrs):
+        """
+        with TRACER.span("nom", attr=...) as span: ... (span vaut None si le traçage ne s'applique pas).
+        """
+        if not self.enabled or (not root and _CURRENT_SPAN.get() is None):
+            yield None
+            return
+        previous = _CURRENT_SPAN.get()
+        span = self.start(name, root=root, **attrs)
+        error = None
+        try:
+            yield span
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _CURRENT_SPAN.set(previous)
+            self.finish(span, error)
+
+    @staticmethod
+    def annotate(**attrs) -> None:
+        """
+        Ajoute des attributs à la span courante (sans effet hors trace).
+        """
+        span = _CURRENT_SPAN.get()
+        if span is not None:
+            span.attrs.update(attrs)
+
+
+TRACE_EXPORTER = TraceFileExporter(TRACE_FILE, TRACE_MAX_BYTES, TRACE_BACKUPS)
+TRACER = Tracer(TRACE_EXPORTER, TRACE_SAMPLE_RATE, TRACE_SLOW_MS)
+
+
+# ---------------------------
+# Metrics (Prometheus text format, served on /metrics)
+# ---------------------------
+# Les compteurs sont de simples dictionnaires modifiés depuis la boucle asyncio (pas de verrou sur le chemin chaud) ;
+# /metrics est servi sur la même boucle, le rendu lit une copie des valeurs.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = ['%s="%s"' % (n, _escape_label(v)) for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: tuple = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(dict(self._values).items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [compte par seau..., somme, total]
+        self._values: Dict[tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for labels, state in sorted(dict(self._values).items()):
+            state = list(state)
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+class GaugeFunc:
+    """
+    Jauge calculée au moment de la lecture : fn() renvoie un nombre, ou {labels (tuple): valeur}.
+    """
+
+    def __init__(self, name: str, doc: str, fn, labelnames: tuple = ()):
+        self.name = name
+        self.doc = doc
+        self.fn = fn
+        self.labelnames = labelnames
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge"]
+        value = self.fn()
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in samples:
+            if v is None or not math.isfinite(v):
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, doc: str, labelnames: tuple = ()) -> Counter:
+        return self._add(Counter(self.prefix + name, doc, labelnames))
+
+    def histogram(self, name: str, doc: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, doc, labelnames, buckets))
+
+    def gauge_func(self, name: str, doc: str, fn, labelnames: tuple = ()) -> GaugeFunc:
+        return self._add(GaugeFunc(self.prefix + name, doc, fn, labelnames))
 
-def start_keepalive_thread() -> None:
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # une jauge en erreur ne doit pas casser toute la page
+                LOG.error("metric_error", f"Erreur de métrique {metric.name}", metric=metric.name)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry("bot75_")
+TEMP_CREATED = METRICS.counter("temp_channels_created_total", "Temporary channels created", ("guild", "kind"))
+TEMP_DELETED = METRICS.counter("temp_channels_deleted_total", "Temporary channel records removed", ("guild",))
+ADMISSION_REJECTED = METRICS.counter("temp_admission_rejected_total", "Temporary channel creations refused by admission control", ("guild", "reason"))
+TEMP_RECYCLED = METRICS.counter("temp_channels_recycled_total", "Owners moved back into their parked voice channel", ("guild",))
+HANDLER_SECONDS = METRICS.histogram("handler_duration_seconds", "Event handler and command duration", ("handler",))
+REST_SECONDS = METRICS.histogram("rest_request_duration_seconds", "Discord REST call duration (rate-limit waits included)", ("method", "route"))
+REST_ERRORS = METRICS.counter("rest_request_errors_total", "Discord REST calls that raised", ("method", "route"))
+STORAGE_FLUSH_SECONDS = METRICS.histogram("storage_flush_duration_seconds", "Persistence flush (save_data) duration", ("backend",))
+STORAGE_FLUSH_ERRORS = METRICS.counter("storage_flush_errors_total", "Persistence flushes that failed", ("backend",))
+KEEPALIVE_SENDS = METRICS.counter("keepalive_sends_total", "Keepalive messages by shard and result", ("shard", "result"))
+KEEPALIVE_LAG_SECONDS = METRICS.histogram("keepalive_send_lag_seconds", "Keepalive message delay after its due time", ("shard",),
+                                          (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+
+# ---------------------------
+# Keepalive / health HTTP server (aiohttp, on the bot's own event loop)
+# ---------------------------
+# /        : keepalive (Replit & co)
+# /healthz : liveness (la boucle répond)
+# /readyz  : readiness (passerelle Discord connectée et retard de boucle acceptable), 503 sinon
+# /metrics : métriques Prometheus
+HEALTH_MAX_LOOP_LAG = float(os.environ.get("HEALTH_MAX_LOOP_LAG", 1.0))
+LOOP_LAG_SAMPLE_SECONDS = 0.5
+
+
+class HealthServer:
     """
-    Lance le thread du serveur keepalive.
+    Serveur HTTP embarqué dans la boucle du bot : démarré une seule fois (on_ready est rappelé à chaque reconnexion),
+    les endpoints lisent l'état du bot directement, sans thread ni verrou.
     """
-    t = Thread(target=run_keepalive_server, daemon=True)
-    t.start()
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.loop_lag = 0.0
+        self._runner: Optional[web.AppRunner] = None
+        self._lag_task: Optional[asyncio.Task] = None
+        self._starting = False
+
+    async def start(self) -> None:
+        if self._runner is not None or self._starting:
+            return
+        self._starting = True
+        app = web.Application()
+        app.router.add_get("/", self.home)
+        app.router.add_get("/healthz", self.liveness)
+        app.router.add_get("/readyz", self.readiness)
+        app.router.add_get("/metrics", self.metrics)
+        runner = web.AppRunner(app, access_log=None)
+        try:
+            await runner.setup()
+            await web.TCPSite(runner, self.host, self.port).start()
+        except Exception as e:
+            # Si le serveur ne démarre pas (port pris, hébergement sans port), le bot continue sans
+            LOG.error("health_server_error", str(e), exc=False, port=self.port)
+            await runner.cleanup()
+            self._starting = False
+            return
+        self._runner = runner
+        self._starting = False
+        self._lag_task = asyncio.get_running_loop().create_task(self._measure_lag())
+        LOG.info("health_server_started", f"Serveur keepalive démarré sur le port {self.port}", host=self.host, port=self.port)
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _measure_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_LAG_SAMPLE_SECONDS
+            await asyncio.sleep(LOOP_LAG_SAMPLE_SECONDS)
+            self.loop_lag = max(loop.time() - expected, 0.0)
+
+    def status(self) -> Dict[str, Any]:
+        shards = shard_states()
+        guilds = shard_guild_counts()
+        temps = shard_temp_counts()
+        for shard_id, state in shards.items():
+            state["guilds"] = guilds.get(shard_id, 0)
+            state["temp_channels"] = temps.get(shard_id, 0)
+        # prêt seulement si tous les shards de ce processus sont connectés
+        connected = bot.is_ready() and not bot.is_closed() and bool(shards) and all(st["connected"] for st in shards.values())
+        latency = bot.latency
+        return {
+            "ready": connected and self.loop_lag <= HEALTH_MAX_LOOP_LAG,
+            "gateway_connected": connected,
+            "gateway_latency_seconds": round(latency, 4) if math.isfinite(latency) else None,
+            "loop_lag_seconds": round(self.loop_lag, 4),
+            "guilds": len(bot.guilds),
+            "shards": {str(k): v for k, v in sorted(shards.items())},
+        }
+
+    async def home(self, request: web.Request) -> web.Response:
+        return web.Response(text="Bot is alive!")
+
+    async def liveness(self, request: web.Request) -> web.Response:
+        return web.json_response({"alive": True})
+
+    async def readiness(self, request: web.Request) -> web.Response:
+        status = self.status()
+        return web.json_response(status, status=200 if status["ready"] else 503)
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=METRICS.render().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+HEALTH_SERVER = HealthServer("0.0.0.0", KEEPALIVE_PORT)
 
 
 # ---------------------------
@@ -78,8 +708,8 @@ def load_config() -> Dict[str, Any]:
         try:
             with open(CONFIG_FILE, "r", encoding="utf-8") as f:
                 cfg = json.load(f)
-        except Exception as e:
-            print("Erreur lecture config.json:", e)
+        except Exception:
+            LOG.error("config_load_error", f"Erreur lecture {CONFIG_FILE}", path=CONFIG_FILE)
     return cfg
 
 
@@ -93,7 +723,10 @@ def empty_data_template() -> Dict[str, Any]:
         "user_lang": {},         # user_id -> "en"/"fr"/"ar"
         "channel_lang": {},      # channel_id -> "en"/"fr"/"ar"
         "server_lang": {},       # guild_id -> "en"/"fr"/"ar"
-        "keepalive_config": {}   # guild_id -> {"channel_id": int, "interval_minutes": int, "message": str, "last_sent": float}
+        "keepalive_config": {},  # guild_id -> {"channel_id": int, "interval_minutes": int, "message": str, "last_sent": float}
+        "guild_settings": {},    # guild_id -> {"max_temp_per_user": int}
+        "voice_pool": {},        # guild_id -> {idle_pool_channel_id: hosting_channel_id}
+        "temp_origins": {}       # guild_id -> {temp_channel_id: hosting_channel_id} (modèle à appliquer après un redémarrage)
     }
 
 
@@ -111,384 +744,3064 @@ def load_data() -> Dict[str, Any]:
                 if k not in data:
                     data[k] = base[k]
             return data
-    except Exception as e:
-        print("Erreur lors du chargement des données :", e)
+    except Exception:
+        LOG.error("data_load_error", "Erreur lors du chargement des données", path=DATA_FILE)
         # fallback to empty
         data = empty_data_template()
         save_data(data)
         return data
 
 
+def write_json_file(path: str, data: Dict[str, Any]) -> int:
+    """
+    Écrit le document de façon atomique (fichier temporaire + os.replace) et retourne la taille écrite.
+    Un crash pendant l'écriture laisse toujours l'ancien fichier intact.
+    """
+    payload = json.dumps(data, ensure_ascii=False, indent=2)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(payload)
+
+
+def write_data_file(data: Dict[str, Any]) -> int:
+    return write_json_file(DATA_FILE, data)
+
+
 def save_data(data: Dict[str, Any]) -> None:
     try:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print("Erreur lors de la sauvegarde des données :", e)
+        write_data_file(data)
+    except Exception:
+        LOG.error("data_save_error", "Erreur lors de la sauvegarde des données", path=DATA_FILE)
 
 
 # ---------------------------
-# Translations
+# Write-behind persistence (coalesced saves)
 # ---------------------------
-translations = {
-    "setup_hosting_success": {
-        "en": "Hosting channel configured successfully.",
-        "fr": "Canal d'hébergement configuré avec succès.",
-        "ar": "تم إعداد قناة الاستضافة بنجاح."
-    },
-    "no_permission": {
-        "en": "You don't have permission to do that.",
-        "fr": "Vous n'avez pas la permission.",
-        "ar": "ليس لديك الصلاحية للقيام بذلك."
-    },
-    "lang_set_user": {
-        "en": "Your language preference has been set to {lang}.",
-        "fr": "Votre langue a été définie sur : {lang}.",
-        "ar": "تم تعيين لغتك المفضلة إلى {lang}."
-    },
-    "lang_set_channel": {
-        "en": "Channel language set to: {lang}",
-        "fr": "Langue du canal définie sur : {lang}",
-        "ar": "تم تعيين لغة القناة إلى: {lang}"
-    },
-    "lang_set_server": {
-        "en": "Server language set to: {lang}",
-        "fr": "Langue du serveur définie sur : {lang}",
-        "ar": "تم تعيين لغة الخادم إلى: {lang}"
-    },
-    "invalid_lang": {
-        "en": "Invalid language. Choose: en, fr, ar.",
-        "fr": "Langue invalide. Choisissez : en, fr, ar.",
-        "ar": "لغة غير صالحة. اختر: en, fr, ar."
-    },
-    "hosting_not_found": {
-        "en": "Hosting channel not found.",
-        "fr": "Canal d'hébergement introuvable.",
-        "ar": "قناة الاستضافة غير موجودة."
-    },
-    "temp_created": {
-        "en": "Temporary channel created: {channel}",
-        "fr": "Canal temporaire créé : {channel}",
-        "ar": "تم إنشاء القناة المؤقتة: {channel}"
-    },
-    "hosting_removed": {
-        "en": "Hosting channel removed successfully.",
-        "fr": "Canal d'hébergement supprimé avec succès.",
-        "ar": "تمت إزالة قناة الاستضافة بنجاح."
-    },
-    "list_hosting_empty": {
-        "en": "No hosting channels configured.",
-        "fr": "Aucun canal d'hébergement configuré.",
-        "ar": "لا توجد قنوات استضافة مهيأة."
-    },
-    "list_hosting_title": {
-        "en": "Hosting Channels:",
-        "fr": "Canaux d'hébergement :",
-        "ar": "قنوات الاستضافة:"
-    },
-    "invite_success_voice": {
-        "en": "{user} has been moved to the voice channel {channel}.",
-        "fr": "{user} a été déplacé dans le salon vocal {channel}.",
-        "ar": "{user} تم نقله إلى قناة الصوت {channel}."
-    },
-    "invite_success_text": {
-        "en": "{user} has been invited to the text channel {channel}.",
-        "fr": "{user} a été invité dans le salon textuel {channel}.",
-        "ar": "{user} تمت دعوته إلى قناة النص {channel}."
-    },
-    "invite_fail_not_connected": {
-        "en": "{user} is not connected to any voice channel.",
-        "fr": "{user} n'est connecté à aucun salon vocal.",
-        "ar": "{user} غير متصل بأي قناة صوتية."
-    },
-    "change_host_success": {
-        "en": "Ownership transferred to {new_host}.",
-        "fr": "Propriété transférée à {new_host}.",
-        "ar": "تم نقل الملكية إلى {new_host}."
-    },
-    "not_owner": {
-        "en": "Only the current owner can transfer ownership.",
-        "fr": "Seul le propriétaire actuel peut transférer la propriété.",
-        "ar": "فقط المالك الحالي يمكنه نقل الملكية."
-    },
-    "keepalive_set": {
-        "en": "Keepalive configured for {channel} every {interval} minutes.",
-        "fr": "Keepalive configuré pour {channel} toutes les {interval} minutes.",
-        "ar": "تم إعداد Keepalive لـ {channel} كل {interval} دقيقة."
-    },
-    "keepalive_removed": {
-        "en": "Keepalive configuration removed.",
-        "fr": "Configuration Keepalive supprimée.",
-        "ar": "تمت إزالة إعداد Keepalive."
-    },
-    "keepalive_status": {
-        "en": "Keepalive active in {channel}, every {interval} minutes, message: {message}",
-        "fr": "Keepalive actif dans {channel}, toutes les {interval} minutes, message : {message}",
-        "ar": "Keepalive نشط في {channel}، كل {interval} دقيقة، الرسالة: {message}"
-    },
-    "hosting_channel_not_temp": {
-        "en": "This channel is not a temporary or hosting channel.",
-        "fr": "Ce canal n'est pas un canal temporaire ou d'hébergement.",
-        "ar": "هذه القناة ليست قناة مؤقتة أو قناة استضافة."
-    },
-    "user_not_connected_voice": {
-        "en": "{user} is not connected to any voice channel.",
-        "fr": "{user} n'est pas connecté à un salon vocal.",
-        "ar": "{user} غير متصل بأي قناة صوتية."
-    },
-    "already_max_temp": {
-        "en": "You already have 3 active temporary channels. Close one to create a new one.",
-        "fr": "Tu as déjà 3 canaux temporaires actifs. Ferme-en un pour en créer un nouveau.",
-        "ar": "لديك بالفعل 3 قنوات مؤقتة نشطة. أغلق واحدة لإنشاء جديدة."
-    },
-    "created_temp_voice": {
-        "en": "Created a temporary voice channel: {channel}. ({count}/3)",
-        "fr": "Canal vocal temporaire créé : {channel}. ({count}/3)",
-        "ar": "تم إنشاء قناة صوتية مؤقتة: {channel}. ({count}/3)"
-    },
-    "created_temp_text": {
-        "en": "Created a temporary text channel: {channel}. ({count}/3)",
-        "fr": "Canal textuel temporaire créé : {channel}. ({count}/3)",
-        "ar": "تم إنشاء قناة نصية مؤقتة: {channel}. ({count}/3)"
-    },
-    "deleted_temp": {
-        "en": "Temporary channel {channel} deleted.",
-        "fr": "Canal temporaire {channel} supprimé.",
-        "ar": "تم حذف القناة المؤقتة {channel}."
-    },
-    "no_temp_to_delete": {
-        "en": "You have no temporary channel to delete.",
-        "fr": "Tu n'as aucun canal temporaire à supprimer.",
-        "ar": "ليس لديك قناة مؤقتة للحذف."
-    }
+# Les handlers ne sauvegardent plus directement : chaque modification passe par set_entry(), qui met à jour
+# DATA puis la signale au moteur de stockage. Les écritures sont regroupées sur SAVE_COALESCE_SECONDS
+# et exécutées hors de la boucle (thread).
+SAVE_COALESCE_SECONDS = float(os.environ.get("SAVE_COALESCE_SECONDS", 2.0))
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json").lower()  # "json", "sqlite", "journal" ou "sharded"
+if CLUSTER_MODE and STORAGE_BACKEND != "sqlite":
+    # les workers écrivent ligne par ligne dans la même base ; les moteurs fichier s'écraseraient entre processus
+    LOG.info("storage_backend_override", f"Mode cluster : STORAGE_BACKEND={STORAGE_BACKEND} remplacé par sqlite (état partagé entre processus)",
+             requested=STORAGE_BACKEND, backend="sqlite")
+    STORAGE_BACKEND = "sqlite"
+SQLITE_FILE = os.environ.get("SQLITE_FILE", "bot_data.sqlite3")
+
+# Sections dont les entrées sont rangées par serveur : DATA[section][guild_id][key]
+GUILD_SCOPED_SECTIONS = ("hosting_channels", "temp_channels", "voice_pool", "temp_origins")
+# Sections dont la clé est l'id du serveur : DATA[section][guild_id] = valeur
+GUILD_KEYED_SECTIONS = ("keepalive_config", "server_lang", "guild_settings")
+
+
+def apply_change(data: Dict[str, Any], section: str, guild_id: Optional[str], key: str, value: Any) -> None:
+    """
+    Applique une modification élémentaire à un document au format DATA (value=None -> suppression).
+    """
+    target = data.setdefault(section, {})
+    if guild_id is not None:
+        if value is None and str(guild_id) not in target:
+            return
+        target = target.setdefault(str(guild_id), {})
+    if value is None:
+        target.pop(str(key), None)
+    else:
+        target[str(key)] = value
+
+
+def _snapshot(obj: Any) -> Any:
+    """
+    Copie profonde rapide de DATA (dict / list / valeurs JSON uniquement), prise sur la boucle
+    pour que le thread d'écriture ne voie jamais un dict modifié pendant la sérialisation.
+    """
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_snapshot(v) for v in obj]
+    return obj
+
+
+class CoalescedStorage(abc.ABC):
+    """
+    Base commune des moteurs de stockage : les modifications signalées par record() sont accumulées
+    puis écrites en un seul lot après window_seconds, dans un thread.
+    Les sous-classes implémentent load(), record(), _take_batch(), _write_batch() et _requeue()
+    (un moteur incomplet échoue dès sa création).
+    """
+
+    name = "storage"
+    size_unit = "octets"
+
+    def __init__(self, window_seconds: float, executor: Optional[ThreadPoolExecutor] = None):
+        self.window_seconds = window_seconds
+        self._executor = executor
+        self._pending_writes = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._write_lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            "flushes": 0,
+            "merged_writes": 0,
+            "last_merged": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "last_size": 0,
+            "errors": 0,
+        }
+
+    # --- propre à chaque moteur ---
+    @abc.abstractmethod
+    def load(self) -> Dict[str, Any]:
+        """
+        Lit l'état persistant au format DATA.
+        """
+
+    @abc.abstractmethod
+    def record(self, section: str, guild_id: Optional[str], key: str, value: Any, home_guild: Optional[str] = None) -> None:
+        """
+        Prend note d'une modification (déjà appliquée à DATA) et arme le flush.
+        """
+
+    def ensure_guild(self, data: Dict[str, Any], gid: str) -> bool:
+        """
+        Charge l'état d'un serveur à la demande ; True si le serveur vient d'être chargé.
+        Par défaut tout est chargé au démarrage.
+        """
+        return False
+
+    async def load_guild(self, data: Dict[str, Any], gid: str) -> bool:
+        """
+        Variante asynchrone d'ensure_guild : la lecture se fait hors de la boucle.
+        """
+        return False
+
+    async def stored_guilds(self) -> Optional[set]:
+        """
+        Serveurs ayant un état persistant ; None si tout est déjà en mémoire (chargé au démarrage).
+        """
+        return None
+
+    def is_loaded(self, gid: str) -> bool:
+        """
+        True si l'état du serveur est déjà dans DATA (toujours le cas pour les moteurs qui chargent tout au démarrage).
+        """
+        return True
+
+    @abc.abstractmethod
+    def _take_batch(self) -> Any:
+        """
+        Lot à écrire (pris sur la boucle), ou None s'il n'y a rien à écrire.
+        """
+
+    @abc.abstractmethod
+    def _write_batch(self, batch: Any) -> int:
+        """
+        Écrit le lot (dans l'executor) ; retourne sa taille en size_unit.
+        """
+
+    @abc.abstractmethod
+    def _requeue(self, batch: Any) -> None:
+        """
+        Remet en attente un lot dont l'écriture a échoué.
+        """
+
+    # --- mécanique commune ---
+    def _arm_flush(self) -> None:
+        self._pending_writes += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # pas de boucle (démarrage / arrêt) : on écrit tout de suite
+            self.flush_sync()
+            return
+        if self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    def _take(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._take_batch()
+        merged = self._pending_writes
+        self._pending_writes = 0
+        return batch, merged
+
+    def _write_locked(self, batch: Any) -> int:
+        with self._write_lock:
+            return self._write_batch(batch)
+
+    def _record_flush(self, started: float, merged: int, size: int) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.stats["flushes"] += 1
+        self.stats["merged_writes"] += max(merged - 1, 0)
+        self.stats["last_merged"] = merged
+        self.stats["last_flush_ms"] = elapsed_ms
+        self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+        self.stats["last_size"] = size
+        STORAGE_FLUSH_SECONDS.observe(elapsed_ms / 1000.0, self.name)
+        LOG.debug("storage_flush", f"Données sauvegardées ({self.name}) : {size} {self.size_unit} en {elapsed_ms:.1f} ms ({merged} écriture(s) regroupée(s))",
+                  backend=self.name, size=size, ms=round(elapsed_ms, 1), merged=merged)
+
+    def _on_error(self, batch: Any, merged: int) -> None:
+        self.stats["errors"] += 1
+        STORAGE_FLUSH_ERRORS.inc(self.name)
+        # on remet le lot en attente pour retenter au prochain flush
+        self._requeue(batch)
+        self._pending_writes += merged
+        LOG.error("storage_flush_error", f"Erreur lors de la sauvegarde des données ({self.name})", backend=self.name)
+
+    async def flush(self) -> None:
+        batch, merged = self._take()
+        if batch is None:
+            return
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            with TRACER.span("storage.flush", backend=self.name, merged=merged):
+                size = await loop.run_in_executor(self._executor, self._write_locked, batch)
+        except Exception:
+            self._on_error(batch, merged)
+            if self._timer is None:
+                self._timer = loop.call_later(self.window_seconds, self._on_timer)
+            return
+        self._record_flush(started, merged, size)
+
+    def flush_sync(self) -> None:
+        batch, merged = self._take()
+        if batch is None:
+            return
+        started = time.perf_counter()
+        try:
+            size = self._write_locked(batch)
+        except Exception:
+            self._on_error(batch, merged)
+            return
+        self._record_flush(started, merged, size)
+
+    def close(self) -> None:
+        self.flush_sync()
+
+
+class WriteBehindSaver(CoalescedStorage):
+    """
+    Moteur JSON : un fichier unique réécrit en entier, mais au plus une fois par fenêtre.
+    Le snapshot est pris sur la boucle, la sérialisation + l'écriture atomique tournent dans un thread.
+    Le snapshot n'est pas une copie complète de DATA : il reprend le précédent (jamais modifié une fois pris)
+    et ne recopie que les entrées modifiées depuis, avec leurs sections / serveurs (copies superficielles).
+    """
+
+    name = "json"
+
+    def __init__(self, get_data, window_seconds: float):
+        super().__init__(window_seconds)
+        self._get_data = get_data
+        self._dirty = False
+        self._changed: set = set()   # (section, guild_id ou None, key) modifiés depuis le dernier snapshot
+        self._full = True            # prochain snapshot complet (démarrage, reprise après erreur)
+        self._last: Optional[Dict[str, Any]] = None
+        self._seq = 0
+        self._written_seq = 0
+
+    def load(self) -> Dict[str, Any]:
+        return load_data()
+
+    def record(self, section: str, guild_id: Optional[str], key: str, value: Any, home_guild: Optional[str] = None) -> None:
+        self._changed.add((section, guild_id, key))
+        self.mark_dirty()
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+        self._arm_flush()
+
+    def _incremental_snapshot(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        snap = dict(self._last)
+        copied: set = set()
+        for section, gid, key in self._changed:
+            if section not in copied:
+                snap[section] = dict(snap.get(section) or {})
+                copied.add(section)
+            target, source = snap[section], data.get(section, {})
+            if gid is not None:
+                if gid not in source:
+                    target.pop(gid, None)
+                    continue
+                if (section, gid) not in copied:
+                    target[gid] = dict(target.get(gid) or {})
+                    copied.add((section, gid))
+                target, source = target[gid], source[gid]
+            if key in source:
+                target[key] = _snapshot(source[key])
+            else:
+                target.pop(key, None)
+        return snap
+
+    def _take_batch(self):
+        if not self._dirty:
+            return None
+        self._dirty = False
+        self._seq += 1
+        data = self._get_data()
+        if self._full or self._last is None:
+            snap = _snapshot(data)
+            self._full = False
+        else:
+            snap = self._incremental_snapshot(data)
+        self._changed = set()
+        self._last = snap
+        return snap, self._seq
+
+    def _write_batch(self, batch) -> int:
+        snapshot, seq = batch
+        # Deux flush peuvent se chevaucher dans l'executor : on n'écrit jamais un snapshot plus ancien.
+        if seq <= self._written_seq:
+            return 0
+        size = write_data_file(snapshot)
+        self._written_seq = seq
+        return size
+
+    def _requeue(self, batch) -> None:
+        # le lot raté contenait déjà les modifications : le prochain snapshot repart de zéro
+        self._dirty = True
+        self._full = True
+
+
+# ---------------------------
+# SQLite storage backend (optional, STORAGE_BACKEND=sqlite)
+# ---------------------------
+# Tables normalisées, écritures ligne par ligne (upsert / delete) en une transaction par lot,
+# journal WAL. Toutes les requêtes passent par un executor à un seul thread (jamais sur la boucle).
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS hosting_channels (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    type TEXT,
+    temp_category_id INTEGER,
+    owner_id INTEGER,
+    extra TEXT,
+    PRIMARY KEY (guild_id, channel_id)
+);
+CREATE INDEX IF NOT EXISTS idx_hosting_owner ON hosting_channels (guild_id, owner_id);
+CREATE TABLE IF NOT EXISTS temp_channels (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    owner_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, channel_id)
+);
+CREATE INDEX IF NOT EXISTS idx_temp_owner ON temp_channels (guild_id, owner_id);
+CREATE TABLE IF NOT EXISTS voice_pool (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    hosting_channel_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, channel_id)
+);
+CREATE TABLE IF NOT EXISTS temp_origins (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    hosting_channel_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, channel_id)
+);
+CREATE TABLE IF NOT EXISTS user_lang (user_id INTEGER PRIMARY KEY, lang TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS channel_lang (channel_id INTEGER PRIMARY KEY, lang TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS server_lang (guild_id INTEGER PRIMARY KEY, lang TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS keepalive_config (
+    guild_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    interval_minutes INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    last_sent REAL NOT NULL DEFAULT 0,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS guild_settings (guild_id INTEGER PRIMARY KEY, settings TEXT NOT NULL);
+"""
+
+_HOSTING_COLUMNS = ("type", "temp_category_id", "owner_id")
+_KEEPALIVE_COLUMNS = ("channel_id", "interval_minutes", "message", "last_sent")
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+def _extra_json(value: Dict[str, Any], columns) -> Optional[str]:
+    """
+    Champs sans colonne dédiée, conservés en JSON pour ne rien perdre des configs.
+    """
+    extra = {k: v for k, v in value.items() if k not in columns}
+    return json.dumps(extra, ensure_ascii=False) if extra else None
+
+
+def _encode_hosting(guild_id, key, value):
+    return (int(guild_id), int(key), value.get("type"), _int_or_none(value.get("temp_category_id")),
+            _int_or_none(value.get("owner_id")), _extra_json(value, _HOSTING_COLUMNS))
+
+
+def _encode_guild_ref(guild_id, key, value):
+    return (int(guild_id), int(key), int(value))
+
+
+def _encode_lang(guild_id, key, value):
+    return (int(key), str(value))
+
+
+def _encode_settings(guild_id, key, value):
+    return (int(key), json.dumps(value, ensure_ascii=False))
+
+
+def _encode_keepalive(guild_id, key, value):
+    return (int(key), int(value["channel_id"]), int(value.get("interval_minutes", 1)), str(value.get("message", "🔄 Keepalive")),
+            float(value.get("last_sent", 0)), _extra_json(value, _KEEPALIVE_COLUMNS))
+
+
+# section -> (upsert SQL, delete SQL, encodeur de ligne, encodeur de clé pour la suppression)
+_SQLITE_SECTIONS = {
+    "hosting_channels": (
+        "INSERT OR REPLACE INTO hosting_channels (guild_id, channel_id, type, temp_category_id, owner_id, extra) VALUES (?, ?, ?, ?, ?, ?)",
+        "DELETE FROM hosting_channels WHERE guild_id = ? AND channel_id = ?",
+        _encode_hosting,
+        lambda guild_id, key: (int(guild_id), int(key)),
+    ),
+    "temp_channels": (
+        "INSERT OR REPLACE INTO temp_channels (guild_id, channel_id, owner_id) VALUES (?, ?, ?)",
+        "DELETE FROM temp_channels WHERE guild_id = ? AND channel_id = ?",
+        _encode_guild_ref,
+        lambda guild_id, key: (int(guild_id), int(key)),
+    ),
+    "voice_pool": (
+        "INSERT OR REPLACE INTO voice_pool (guild_id, channel_id, hosting_channel_id) VALUES (?, ?, ?)",
+        "DELETE FROM voice_pool WHERE guild_id = ? AND channel_id = ?",
+        _encode_guild_ref,
+        lambda guild_id, key: (int(guild_id), int(key)),
+    ),
+    "temp_origins": (
+        "INSERT OR REPLACE INTO temp_origins (guild_id, channel_id, hosting_channel_id) VALUES (?, ?, ?)",
+        "DELETE FROM temp_origins WHERE guild_id = ? AND channel_id = ?",
+        _encode_guild_ref,
+        lambda guild_id, key: (int(guild_id), int(key)),
+    ),
+    "user_lang": (
+        "INSERT OR REPLACE INTO user_lang (user_id, lang) VALUES (?, ?)",
+        "DELETE FROM user_lang WHERE user_id = ?",
+        _encode_lang,
+        lambda guild_id, key: (int(key),),
+    ),
+    "channel_lang": (
+        "INSERT OR REPLACE INTO channel_lang (channel_id, lang) VALUES (?, ?)",
+        "DELETE FROM channel_lang WHERE channel_id = ?",
+        _encode_lang,
+        lambda guild_id, key: (int(key),),
+    ),
+    "server_lang": (
+        "INSERT OR REPLACE INTO server_lang (guild_id, lang) VALUES (?, ?)",
+        "DELETE FROM server_lang WHERE guild_id = ?",
+        _encode_lang,
+        lambda guild_id, key: (int(key),),
+    ),
+    "keepalive_config": (
+        "INSERT OR REPLACE INTO keepalive_config (guild_id, channel_id, interval_minutes, message, last_sent, extra) VALUES (?, ?, ?, ?, ?, ?)",
+        "DELETE FROM keepalive_config WHERE guild_id = ?",
+        _encode_keepalive,
+        lambda guild_id, key: (int(key),),
+    ),
+    "guild_settings": (
+        "INSERT OR REPLACE INTO guild_settings (guild_id, settings) VALUES (?, ?)",
+        "DELETE FROM guild_settings WHERE guild_id = ?",
+        _encode_settings,
+        lambda guild_id, key: (int(key),),
+    ),
 }
 
+
+def _encode_sql_op(section: str, guild_id: Optional[str], key: str, value: Any):
+    upsert_sql, delete_sql, encode_row, encode_key = _SQLITE_SECTIONS[section]
+    if value is None:
+        return delete_sql, encode_key(guild_id, key)
+    return upsert_sql, encode_row(guild_id, key, value)
+
+
+class SqliteStorage(CoalescedStorage):
+    """
+    Moteur SQLite : une ligne par entrée, seules les lignes modifiées sont écrites.
+    Les modifications d'une même clé dans la fenêtre sont fusionnées (la dernière gagne).
+    """
+
+    name = "sqlite"
+    size_unit = "ligne(s)"
+
+    def __init__(self, path: str, window_seconds: float):
+        super().__init__(window_seconds, ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-storage"))
+        self.path = path
+        # timeout : en mode cluster plusieurs processus écrivent dans la même base
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SQLITE_SCHEMA)
+        # (section, guild_id, key) -> (sql, params), encodé sur la boucle pour ne jamais lire DATA depuis le thread
+        self._pending: Dict[tuple, tuple] = {}
+
+    def record(self, section: str, guild_id: Optional[str], key: str, value: Any, home_guild: Optional[str] = None) -> None:
+        self._pending[(section, guild_id, str(key))] = _encode_sql_op(section, guild_id, key, value)
+        self._arm_flush()
+
+    def _take_batch(self):
+        if not self._pending:
+            return None
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _execute_ops(self, ops) -> None:
+        # regroupe par requête pour executemany ; une seule opération par clé, l'ordre entre clés est indifférent
+        grouped: Dict[str, List[tuple]] = {}
+        for sql, params in ops:
+            grouped.setdefault(sql, []).append(params)
+        cur = self._conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            for sql, rows in grouped.items():
+                cur.executemany(sql, rows)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    def _write_batch(self, batch) -> int:
+        self._execute_ops(batch.values())
+        return len(batch)
+
+    def _requeue(self, batch) -> None:
+        for k, op in batch.items():
+            self._pending.setdefault(k, op)
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_from_json(self, path: str) -> int:
+        """
+        Migration unique depuis l'ancien bot_data.json (ignorée si déjà faite ou si le fichier n'existe pas).
+        """
+        if self._meta("json_migrated") or not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        ops = []
+        skipped = 0
+        for section in _SQLITE_SECTIONS:
+            entries = legacy.get(section, {}) or {}
+            if section in GUILD_SCOPED_SECTIONS:
+                items = [(gid, key, value) for gid, mapping in entries.items() for key, value in (mapping or {}).items()]
+            else:
+                items = [(None, key, value) for key, value in entries.items()]
+            for gid, key, value in items:
+                try:
+                    ops.append(_encode_sql_op(section, gid, key, value))
+                except Exception:
+                    skipped += 1
+        ops.append(("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ("json_migrated", str(time.time()))))
+        self._execute_ops(ops)
+        LOG.info("storage_migrated", f"Migration {path} -> {self.path} : {len(ops) - 1} ligne(s) importée(s), {skipped} ignorée(s)",
+                 backend=self.name, source=path, rows=len(ops) - 1, skipped=skipped)
+        return len(ops) - 1
+
+    def load(self) -> Dict[str, Any]:
+        with self._write_lock:
+            try:
+                self.migrate_from_json(DATA_FILE)
+            except Exception:
+                LOG.error("storage_migration_error", "Erreur lors de la migration JSON -> SQLite", backend=self.name)
+            data = empty_data_template()
+            for gid, cid, typ, cat, owner, extra in self._conn.execute(
+                    "SELECT guild_id, channel_id, type, temp_category_id, owner_id, extra FROM hosting_channels"):
+                info = {"type": typ, "temp_category_id": cat, "owner_id": owner}
+                if extra:
+                    info.update(json.loads(extra))
+                data["hosting_channels"].setdefault(str(gid), {})[str(cid)] = info
+            for gid, cid, owner in self._conn.execute("SELECT guild_id, channel_id, owner_id FROM temp_channels"):
+                data["temp_channels"].setdefault(str(gid), {})[str(cid)] = owner
+            for gid, cid, hosting_id in self._conn.execute("SELECT guild_id, channel_id, hosting_channel_id FROM voice_pool"):
+                data["voice_pool"].setdefault(str(gid), {})[str(cid)] = hosting_id
+            for gid, cid, hosting_id in self._conn.execute("SELECT guild_id, channel_id, hosting_channel_id FROM temp_origins"):
+                data["temp_origins"].setdefault(str(gid), {})[str(cid)] = hosting_id
+            for section, column in (("user_lang", "user_id"), ("channel_lang", "channel_id"), ("server_lang", "guild_id")):
+                for key, lang in self._conn.execute(f"SELECT {column}, lang FROM {section}"):
+                    data[section][str(key)] = lang
+            for gid, cid, interval, message, last_sent, extra in self._conn.execute(
+                    "SELECT guild_id, channel_id, interval_minutes, message, last_sent, extra FROM keepalive_config"):
+                cfg = {"channel_id": cid, "interval_minutes": interval, "message": message, "last_sent": last_sent}
+                if extra:
+                    cfg.update(json.loads(extra))
+                data["keepalive_config"][str(gid)] = cfg
+            for gid, settings in self._conn.execute("SELECT guild_id, settings FROM guild_settings"):
+                data["guild_settings"][str(gid)] = json.loads(settings)
+            return data
+
+    def _read_langs(self) -> Dict[str, Dict[str, str]]:
+        with self._write_lock:
+            return {section: {str(key): lang for key, lang in self._conn.execute(f"SELECT {column}, lang FROM {section}")}
+                    for section, column in (("user_lang", "user_id"), ("channel_lang", "channel_id"))}
+
+    async def refresh_langs(self, data: Dict[str, Any]) -> bool:
+        """
+        Relit user_lang / channel_lang (écrits aussi par les autres workers) dans le thread du stockage ;
+        les clés modifiées ici et pas encore écrites gardent la valeur locale. Retourne True si DATA a changé.
+        """
+        fresh = await asyncio.get_running_loop().run_in_executor(self._executor, self._read_langs)
+        changed = False
+        for section, rows in fresh.items():
+            current = data.setdefault(section, {})
+            for pending_section, _, key in self._pending:
+                if pending_section != section:
+                    continue
+                if key in current:
+                    rows[key] = current[key]
+                else:
+                    rows.pop(key, None)
+            if rows != current:
+                current.clear()
+                current.update(rows)
+                changed = True
+        return changed
+
+    def close(self) -> None:
+        self.flush_sync()
+        with self._write_lock:
+            self._conn.close()
+        self._executor.shutdown(wait=False)
+
+
 # ---------------------------
-# Helpers for translations & language
+# Append-only journal backend (optional, STORAGE_BACKEND=journal)
 # ---------------------------
-def tr(data: Dict[str, Any], guild_id: Optional[int], user_id: Optional[int], channel_id: Optional[int], key: str, **kwargs) -> str:
+# Chaque modification est ajoutée au journal sous forme d'une ligne JSON compacte ; les lignes sont
+# écrites + fsync par lot. Au démarrage : dernier snapshot (DATA_FILE) + relecture de la fin du journal.
+# Quand le journal dépasse JOURNAL_COMPACT_BYTES, il est replié dans un nouveau snapshot en arrière-plan.
+JOURNAL_FILE = os.environ.get("JOURNAL_FILE", DATA_FILE + ".journal")
+JOURNAL_COMPACT_BYTES = int(os.environ.get("JOURNAL_COMPACT_BYTES", 1024 * 1024))
+
+
+class JournalStorage(CoalescedStorage):
     """
-    Retourne la traduction pour la clé 'key' en vérifiant l'ordre:
-    user_lang -> channel_lang -> server_lang -> 'fr' par défaut.
+    Moteur journal : écriture O(1) par modification, un crash perd au plus le dernier lot non synchronisé.
+    Chaque ligne porte un numéro de séquence ("n") ; le snapshot mémorise le dernier numéro replié
+    ("journal_seq"), ce qui rend la relecture sûre même si le crash survient pendant une compaction.
     """
-    user_langs = data.get("user_lang", {})
-    channel_langs = data.get("channel_lang", {})
-    server_langs = data.get("server_lang", {})
-
-    lang = None
-    if user_id and str(user_id) in user_langs:
-        lang = user_langs[str(user_id)]
-    elif channel_id and str(channel_id) in channel_langs:
-        lang = channel_langs[str(channel_id)]
-    elif guild_id and str(guild_id) in server_langs:
-        lang = server_langs[str(guild_id)]
-    else:
-        lang = "fr"
 
-    text = translations.get(key, {}).get(lang)
-    if not text:
-        # fallback simple
-        text = key
-    if kwargs:
+    name = "journal"
+    size_unit = "ligne(s)"
+
+    def __init__(self, get_data, path: str, window_seconds: float, compact_bytes: int):
+        super().__init__(window_seconds, ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-storage"))
+        self._get_data = get_data
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._lines: List[bytes] = []
+        self._seq = 0
+        self._journal_bytes = 0
+        self._file = None
+        self._compacting = False
+        self.stats["compactions"] = 0
+        self.stats["journal_bytes"] = 0
+
+    def load(self) -> Dict[str, Any]:
+        data = load_data()
+        snapshot_seq = int(data.pop("journal_seq", 0) or 0)
+        self._seq = snapshot_seq
+        replayed = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # dernière ligne tronquée par un crash : rien d'exploitable après
+                        break
+                    if rec["n"] <= snapshot_seq:
+                        continue
+                    apply_change(data, rec["s"], rec.get("g"), rec["k"], rec.get("v"))
+                    self._seq = rec["n"]
+                    replayed += 1
+        if replayed:
+            LOG.info("journal_replayed", f"Journal relu : {replayed} modification(s) appliquée(s) après le snapshot", replayed=replayed)
+            # on repart d'un journal vide pour borner la relecture au prochain démarrage
+            self._compact_locked(_snapshot(data), self._seq)
+        return data
+
+    def record(self, section: str, guild_id: Optional[str], key: str, value: Any, home_guild: Optional[str] = None) -> None:
+        self._seq += 1
+        rec = {"n": self._seq, "s": section, "k": key}
+        if guild_id is not None:
+            rec["g"] = guild_id
+        if value is not None:
+            rec["v"] = value
+        # encodé sur la boucle : la ligne reflète la valeur au moment de la modification
+        self._lines.append((json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+        self._arm_flush()
+
+    def _take_batch(self):
+        if not self._lines:
+            return None
+        batch, self._lines = self._lines, []
+        return batch
+
+    def _write_batch(self, batch) -> int:
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        payload = b"".join(batch)
+        self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._journal_bytes += len(payload)
+        self.stats["journal_bytes"] = self._journal_bytes
+        return len(batch)
+
+    def _requeue(self, batch) -> None:
+        self._lines[:0] = batch
+
+    def _compact_locked(self, snapshot: Dict[str, Any], seq: int) -> int:
+        with self._write_lock:
+            snapshot["journal_seq"] = seq
+            size = write_data_file(snapshot)
+            # le snapshot est en place : le journal peut repartir de zéro
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.path, "wb")
+            self._journal_bytes = 0
+            self.stats["journal_bytes"] = 0
+            return size
+
+    async def flush(self) -> None:
+        await super().flush()
+        if self._journal_bytes >= self.compact_bytes and not self._compacting:
+            self._compacting = True
+            asyncio.ensure_future(self._compact())
+
+    async def _compact(self) -> None:
+        # les lignes encore en attente sont déjà reflétées dans DATA, donc dans le snapshot
+        pending, merged = self._take()
+        snapshot, seq = _snapshot(self._get_data()), self._seq
+        started = time.perf_counter()
+        try:
+            size = await asyncio.get_running_loop().run_in_executor(self._executor, self._compact_locked, snapshot, seq)
+            self.stats["compactions"] += 1
+            LOG.info("journal_compacted", f"Journal replié dans un nouveau snapshot : {size} octets en {(time.perf_counter() - started) * 1000.0:.1f} ms", size=size)
+        except Exception:
+            if pending:
+                self._requeue(pending)
+                self._pending_writes += merged
+                self._arm_flush()
+            LOG.error("journal_compaction_error", "Erreur lors de la compaction du journal")
+        finally:
+            self._compacting = False
+
+    def close(self) -> None:
+        self.flush_sync()
+        # arrêt propre : snapshot à jour et journal vide
         try:
-            return text.format(**kwargs)
+            self._compact_locked(_snapshot(self._get_data()), self._seq)
         except Exception:
-            return text
-    return text
+            LOG.error("journal_compaction_error", "Erreur lors de la compaction du journal")
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._executor.shutdown(wait=False)
 
 
-def get_lang_pref(data: Dict[str, Any], guild_id: Optional[int], user_id: Optional[int], channel_id: Optional[int]) -> str:
+# ---------------------------
+# Per-guild sharded backend (optional, STORAGE_BACKEND=sharded)
+# ---------------------------
+# Un fichier par serveur (hosting, temp channels, keepalive, langues serveur/canal) dans SHARD_DIR,
+# plus un fichier global (langues utilisateur, langues de canal sans serveur connu, index keepalive).
+# Un serveur n'est chargé qu'au premier événement le concernant ; un flush n'écrit que les serveurs modifiés.
+SHARD_DIR = os.environ.get("SHARD_DIR", "bot_data_guilds")
+SHARD_GLOBAL_FILE = "_global.json"
+
+
+def _read_json_file(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ShardedStorage(CoalescedStorage):
+    """
+    Moteur par serveur : chargement paresseux (ensure_guild) et écriture des seuls fichiers modifiés.
+    Les serveurs ayant un keepalive sont chargés au démarrage pour que la boucle keepalive les voie.
+    """
+
+    name = "sharded"
+    size_unit = "fichier(s)"
+
+    def __init__(self, get_data, directory: str, window_seconds: float):
+        super().__init__(window_seconds, ThreadPoolExecutor(max_workers=1, thread_name_prefix="sharded-storage"))
+        self._get_data = get_data
+        self.directory = directory
+        self._loaded: set = set()
+        self._dirty_guilds: set = set()
+        self._global_dirty = False
+        self._keepalive_guilds: set = set()
+        self._loading: Dict[str, asyncio.Future] = {}  # guild_id -> lecture en cours dans l'exécuteur
+        self._guild_channel_langs: Dict[str, set] = {}  # guild_id -> {channel_id avec une langue}
+        self.stats["loaded_guilds"] = 0
+
+    def _guild_path(self, gid: str) -> str:
+        return os.path.join(self.directory, f"{gid}.json")
+
+    def _global_path(self) -> str:
+        return os.path.join(self.directory, SHARD_GLOBAL_FILE)
+
+    def _migrate_from_json(self) -> None:
+        """
+        Découpage unique de l'ancien bot_data.json en fichiers par serveur.
+        """
+        if os.path.exists(self._global_path()) or not os.path.exists(DATA_FILE):
+            return
+        legacy = _read_json_file(DATA_FILE)
+        guilds = set()
+        for section in GUILD_SCOPED_SECTIONS + GUILD_KEYED_SECTIONS:
+            guilds.update((legacy.get(section) or {}).keys())
+        for gid in guilds:
+            doc = {section: (legacy.get(section) or {}).get(gid, {}) for section in GUILD_SCOPED_SECTIONS}
+            doc.update({section: (legacy.get(section) or {}).get(gid) for section in GUILD_KEYED_SECTIONS})
+            doc["channel_lang"] = {}
+            write_json_file(self._guild_path(gid), doc)
+        # écrit en dernier : sa présence marque la migration comme terminée
+        write_json_file(self._global_path(), {
+            "user_lang": legacy.get("user_lang") or {},
+            "channel_lang": legacy.get("channel_lang") or {},
+            "keepalive_guilds": sorted((legacy.get("keepalive_config") or {}).keys()),
+        })
+        LOG.info("storage_migrated", f"Migration {DATA_FILE} -> {self.directory} : {len(guilds)} serveur(s)",
+                 backend=self.name, source=DATA_FILE, guilds=len(guilds))
+
+    def load(self) -> Dict[str, Any]:
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            self._migrate_from_json()
+        except Exception:
+            LOG.error("storage_migration_error", "Erreur lors de la migration JSON -> fichiers par serveur", backend=self.name)
+        data = empty_data_template()
+        if os.path.exists(self._global_path()):
+            try:
+                glob = _read_json_file(self._global_path())
+                data["user_lang"] = glob.get("user_lang") or {}
+                data["channel_lang"] = glob.get("channel_lang") or {}
+                self._keepalive_guilds = set(glob.get("keepalive_guilds") or [])
+            except Exception:
+                LOG.error("data_load_error", "Erreur lors du chargement des données", path=self._global_path())
+        for gid in list(self._keepalive_guilds):
+            self.ensure_guild(data, gid)
+        return data
+
+    def _read_guild_doc(self, gid: str) -> Optional[Dict[str, Any]]:
+        path = self._guild_path(gid)
+        if not os.path.exists(path):
+            return None
+        try:
+            return _read_json_file(path)
+        except Exception:
+            LOG.error("data_load_error", f"Erreur lors du chargement des données du serveur {gid}", guild=gid, path=path)
+            return None
+
+    def ensure_guild(self, data: Dict[str, Any], gid: str) -> bool:
+        if gid in self._loaded:
+            return False
+        self._apply_guild_doc(data, gid, self._read_guild_doc(gid))
+        return True
+
+    async def load_guild(self, data: Dict[str, Any], gid: str) -> bool:
+        """
+        Lecture du fichier du serveur dans l'exécuteur du stockage ; les appels concurrents
+        pour un même serveur partagent la même lecture.
+        """
+        if gid in self._loaded:
+            return False
+        fut = self._loading.get(gid)
+        if fut is None:
+            fut = asyncio.get_running_loop().run_in_executor(self._executor, self._read_guild_doc, gid)
+            self._loading[gid] = fut
+        try:
+            doc = await asyncio.shield(fut)
+        finally:
+            if self._loading.get(gid) is fut:
+                del self._loading[gid]
+        # un ensure_guild synchrone (set_entry) a pu passer entre-temps : DATA fait alors foi
+        if gid in self._loaded:
+            return False
+        self._apply_guild_doc(data, gid, doc)
+        return True
+
+    def _list_guild_files(self) -> set:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return set()
+        return {name[:-5] for name in names if name.endswith(".json") and name != SHARD_GLOBAL_FILE}
+
+    async def stored_guilds(self) -> Optional[set]:
+        """
+        Index des fichiers par serveur (listé dans l'exécuteur), plus les serveurs déjà chargés.
+        """
+        listed = await asyncio.get_running_loop().run_in_executor(self._executor, self._list_guild_files)
+        return listed | self._loaded
+
+    def is_loaded(self, gid: str) -> bool:
+        return gid in self._loaded
+
+    def _apply_guild_doc(self, data: Dict[str, Any], gid: str, doc: Optional[Dict[str, Any]]) -> None:
+        self._loaded.add(gid)
+        self.stats["loaded_guilds"] = len(self._loaded)
+        if not doc:
+            return
+        for section in GUILD_SCOPED_SECTIONS + GUILD_KEYED_SECTIONS:
+            if doc.get(section):
+                data[section][gid] = doc[section]
+        channel_langs = doc.get("channel_lang") or {}
+        data["channel_lang"].update(channel_langs)
+        self._guild_channel_langs[gid] = set(channel_langs)
+
+    def record(self, section: str, guild_id: Optional[str], key: str, value: Any, home_guild: Optional[str] = None) -> None:
+        if section == "user_lang" or (section == "channel_lang" and home_guild is None):
+            self._global_dirty = True
+        else:
+            gid = guild_id or home_guild
+            self._dirty_guilds.add(gid)
+            if section == "channel_lang":
+                owned = self._guild_channel_langs.setdefault(gid, set())
+                if value is None:
+                    owned.discard(key)
+                else:
+                    owned.add(key)
+                # une langue de canal migrée depuis le fichier global change de propriétaire
+                self._global_dirty = True
+            elif section == "keepalive_config":
+                had = gid in self._keepalive_guilds
+                if value is None:
+                    self._keepalive_guilds.discard(gid)
+                else:
+                    self._keepalive_guilds.add(gid)
+                if had != (gid in self._keepalive_guilds):
+                    self._global_dirty = True
+        self._arm_flush()
+
+    def _take_batch(self):
+        if not self._dirty_guilds and not self._global_dirty:
+            return None
+        data = self._get_data()
+        files = []
+        for gid in self._dirty_guilds:
+            doc = {section: data[section].get(gid, {}) for section in GUILD_SCOPED_SECTIONS}
+            doc.update({section: data[section].get(gid) for section in GUILD_KEYED_SECTIONS})
+            doc["channel_lang"] = {cid: data["channel_lang"][cid] for cid in self._guild_channel_langs.get(gid, ()) if cid in data["channel_lang"]}
+            empty = not any(doc.values())
+            files.append((self._guild_path(gid), None if empty else _snapshot(doc)))
+        if self._global_dirty:
+            owned = set().union(*self._guild_channel_langs.values()) if self._guild_channel_langs else set()
+            files.append((self._global_path(), {
+                "user_lang": dict(data["user_lang"]),
+                "channel_lang": {cid: code for cid, code in data["channel_lang"].items() if cid not in owned},
+                "keepalive_guilds": sorted(self._keepalive_guilds),
+            }))
+        self._dirty_guilds = set()
+        self._global_dirty = False
+        return files
+
+    def _write_batch(self, batch) -> int:
+        for path, doc in batch:
+            if doc is None:
+                # plus rien pour ce serveur : on supprime le fichier plutôt que d'en garder un vide
+                if os.path.exists(path):
+                    os.remove(path)
+            else:
+                write_json_file(path, doc)
+        return len(batch)
+
+    def _requeue(self, batch) -> None:
+        for path, _ in batch:
+            name = os.path.basename(path)
+            if name == SHARD_GLOBAL_FILE:
+                self._global_dirty = True
+            else:
+                self._dirty_guilds.add(name[:-len(".json")])
+
+    def close(self) -> None:
+        self.flush_sync()
+        self._executor.shutdown(wait=False)
+
+
+# ---------------------------
+# Cluster mode: one coordinator process, N worker processes sharing the SQLite store
+# ---------------------------
+# CLUSTER_WORKERS > 1 : le script lancé devient coordinateur ; il découpe les shards en plages contiguës,
+# lance un processus par plage (CLUSTER_WORKER_ID, SHARD_COUNT, SHARD_IDS, KEEPALIVE_PORT + id) et le relance
+# s'il s'arrête. Chaque serveur appartient à un seul shard, donc à un seul worker : ses canaux temporaires,
+# son quota de canaux par membre, l'admission des créations et ses envois keepalive ne sont gérés que par ce processus.
+# Un bail SQLite (shard_leases) garantit qu'un shard n'est jamais tenu par deux processus à la fois ;
+# un worker ne charge l'état qu'après avoir obtenu son bail (il voit donc le dernier flush du précédent).
+class ShardLease:
+    """
+    Bail exclusif sur une plage de shards, stocké dans la base SQLite partagée et renouvelé par un thread.
+    """
+
+    def __init__(self, path: str, worker: str, shard_ids: List[int], ttl: float):
+        self.path = path
+        self.worker = worker
+        self.shard_ids = list(shard_ids)
+        self.ttl = ttl
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS shard_leases (shard_id INTEGER PRIMARY KEY, worker TEXT NOT NULL, pid INTEGER, expires REAL NOT NULL)")
+        return conn
+
+    def _try_acquire(self, conn: sqlite3.Connection) -> Optional[str]:
+        """
+        Prend (ou prolonge) le bail de tous les shards en une transaction ; renvoie le détenteur en cas de conflit.
+        """
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            marks = ",".join("?" * len(self.shard_ids))
+            row = conn.execute(f"SELECT worker, pid FROM shard_leases WHERE shard_id IN ({marks}) AND worker != ? AND expires > ?",
+                               (*self.shard_ids, self.worker, now)).fetchone()
+            if row is not None:
+                conn.execute("ROLLBACK")
+                return f"{row[0]} (pid {row[1]})"
+            conn.executemany("INSERT OR REPLACE INTO shard_leases (shard_id, worker, pid, expires) VALUES (?, ?, ?, ?)",
+                             [(sid, self.worker, os.getpid(), now + self.ttl) for sid in self.shard_ids])
+            conn.execute("COMMIT")
+            return None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire_blocking(self) -> None:
+        if not self.shard_ids:
+            return
+        conn = self._connect()
+        try:
+            waited = 0.0
+            while True:
+                holder = self._try_acquire(conn)
+                if holder is None:
+                    LOG.info("cluster_lease_acquired", f"Cluster : {self.worker} détient les shards {self.shard_ids}", worker=self.worker, shards=self.shard_ids)
+                    return
+                if waited % 10 == 0:
+                    LOG.info("cluster_lease_wait", f"Cluster : shards {self.shard_ids} encore tenus par {holder}, attente...", shards=self.shard_ids, holder=holder)
+                time.sleep(1.0)
+                waited += 1.0
+        finally:
+            conn.close()
+
+    def start_renewal(self) -> None:
+        self._thread = threading.Thread(target=self._renew_loop, name="shard-lease", daemon=True)
+        self._thread.start()
+
+    def _renew_loop(self) -> None:
+        conn = self._connect()
+        while not self._stop.wait(self.ttl / 3.0):
+            try:
+                holder = self._try_acquire(conn)
+            except Exception:
+                LOG.error("cluster_lease_error", "Cluster : erreur de renouvellement du bail", shards=self.shard_ids)
+                continue
+            if holder is not None:
+                # un autre processus a pris nos shards (bail expiré) : on s'arrête proprement, le coordinateur relance
+                LOG.warning("cluster_lease_lost", f"Cluster : bail perdu au profit de {holder}, arrêt du worker.", holder=holder)
+                os.kill(os.getpid(), signal.SIGTERM)
+                break
+        conn.close()
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            # un renouvellement en cours réécrirait le bail après sa suppression
+            self._thread.join(self.ttl)
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM shard_leases WHERE worker = ?", (self.worker,))
+        finally:
+            conn.close()
+
+
+def cluster_shard_total(workers: int) -> int:
+    """
+    Nombre total de shards : SHARD_COUNT s'il est numérique, sinon celui conseillé par Discord (au moins un par worker).
+    """
+    if SHARD_COUNT.isdigit():
+        return max(int(SHARD_COUNT), workers)
+    try:
+        req = urllib.request.Request("https://discord.com/api/v10/gateway/bot",
+                                     headers={"Authorization": f"Bot {TOKEN}", "User-Agent": "DiscordBot (75bot, 1.0)"})
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            recommended = int(json.load(resp)["shards"])
+    except Exception as e:
+        print("Cluster : nombre de shards conseillé indisponible, un shard par worker :", e)
+        recommended = workers
+    return max(recommended, workers)
+
+
+def run_cluster(workers: int) -> int:
     """
-    Récupère le code langue effectif pour l'utilisateur/canal/serveur.
+    Coordinateur : lance un worker par plage de shards et le relance (backoff exponentiel) s'il s'arrête.
+    SIGTERM / Ctrl+C arrêtent proprement tous les workers.
     """
-    user_langs = data.get("user_lang", {})
-    channel_langs = data.get("channel_lang", {})
-    server_langs = data.get("server_lang", {})
+    total = cluster_shard_total(workers)
+    ranges = [list(range(i * total // workers, (i + 1) * total // workers)) for i in range(workers)]
+    procs: Dict[int, subprocess.Popen] = {}
+    started_at: Dict[int, float] = {}
+    restarts: Dict[int, int] = {i: 0 for i in range(workers)}
+    respawn_at: Dict[int, float] = {}
+    stopping = threading.Event()
+
+    def spawn(i: int) -> None:
+        env = dict(os.environ, CLUSTER_WORKER_ID=str(i), SHARD_COUNT=str(total), SHARD_IDS=",".join(map(str, ranges[i])),
+                   KEEPALIVE_PORT=str(KEEPALIVE_PORT + i))
+        procs[i] = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+        started_at[i] = time.monotonic()
+        print(f"Cluster : worker {i} lancé (pid {procs[i].pid}, shards {ranges[i][0]}-{ranges[i][-1]} sur {total})")
+
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    for i in range(workers):
+        spawn(i)
+    while not stopping.wait(1.0):
+        now = time.monotonic()
+        for i, proc in list(procs.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            del procs[i]
+            if now - started_at[i] > 60:
+                restarts[i] = 0
+            delay = min(2 ** restarts[i], 60)
+            restarts[i] += 1
+            respawn_at[i] = now + delay
+            print(f"Cluster : worker {i} arrêté (code {code}), relance dans {delay} s")
+        for i, due in list(respawn_at.items()):
+            if now >= due:
+                del respawn_at[i]
+                spawn(i)
+    print("Cluster : arrêt des workers...")
+    for proc in procs.values():
+        proc.terminate()
+    deadline = time.monotonic() + 30
+    for proc in procs.values():
+        try:
+            proc.wait(timeout=max(deadline - time.monotonic(), 0.1))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return 0
+
 
-    if user_id and str(user_id) in user_langs:
-        return user_langs[str(user_id)]
-    if channel_id and str(channel_id) in channel_langs:
-        return channel_langs[str(channel_id)]
-    if guild_id and str(guild_id) in server_langs:
-        return server_langs[str(guild_id)]
-    return "fr"
+def create_storage(get_data) -> CoalescedStorage:
+    """
+    Choisit le moteur de stockage selon STORAGE_BACKEND (json par défaut).
+    """
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStorage(SQLITE_FILE, SAVE_COALESCE_SECONDS)
+    if STORAGE_BACKEND == "journal":
+        return JournalStorage(get_data, JOURNAL_FILE, SAVE_COALESCE_SECONDS, JOURNAL_COMPACT_BYTES)
+    if STORAGE_BACKEND == "sharded":
+        return ShardedStorage(get_data, SHARD_DIR, SAVE_COALESCE_SECONDS)
+    return WriteBehindSaver(get_data, SAVE_COALESCE_SECONDS)
 
 
 # ---------------------------
-# Core bot setup
+# Translations (catalog loaded from locales/<lang>.json)
 # ---------------------------
-intents = discord.Intents.default()
-intents.guilds = True
-intents.members = True
-intents.voice_states = True
-intents.messages = True
-intents.message_content = True  # si tu veux utiliser les commandes prefix
+# Chaque langue est un fichier JSON clé -> modèle ("_name" = nom affiché de la langue).
+# Ajouter une langue = déposer un fichier dans LOCALES_DIR, sans toucher au code.
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+DEFAULT_LANG = "fr"
+LANG_CACHE_MAX = 100_000
+_FORMATTER = string.Formatter()
+
+
+def _compile_template(template: str):
+    """
+    Pré-analyse un modèle "{champ}" une seule fois : retourne la chaîne telle quelle s'il n'a pas de champ,
+    sinon une liste (texte littéral, nom de champ). Les modèles avec conversion / format_spec, ou dont un champ
+    n'est pas un simple nom ({0}, {a.b}, {x[0]}), gardent str.format.
+    """
+    try:
+        parts = list(_FORMATTER.parse(template))
+    except ValueError:
+        return template
+    if all(field is None for _, field, _, _ in parts):
+        return template
+    if any(spec or conv or not field.isidentifier() for _, field, spec, conv in parts if field is not None):
+        return ("format", template)
+    return [(literal, field) for literal, field, _, _ in parts]
+
+
+def _render_template(compiled, kwargs: Dict[str, Any]) -> str:
+    if isinstance(compiled, str):
+        return compiled
+    if isinstance(compiled, tuple):
+        return compiled[1].format(**kwargs)
+    return "".join(literal + (str(kwargs[field]) if field is not None else "") for literal, field in compiled)
+
+
+class TranslationCatalog:
+    """
+    Catalogue de traductions : un fichier par langue, chargé et précompilé au premier usage.
+    """
+
+    def __init__(self, directory: str, default_lang: str):
+        self.directory = directory
+        self.default_lang = default_lang
+        self._bundles: Dict[str, Dict[str, Any]] = {}
+        self._raw: Dict[str, Dict[str, str]] = {}
+
+    def available(self) -> List[str]:
+        """
+        Codes des langues présentes dans le dossier (sans les charger).
+        """
+        try:
+            return sorted(f[:-len(".json")] for f in os.listdir(self.directory) if f.endswith(".json"))
+        except OSError:
+            return [self.default_lang]
+
+    def _bundle(self, lang: str) -> Dict[str, Any]:
+        bundle = self._bundles.get(lang)
+        if bundle is None:
+            raw: Dict[str, str] = {}
+            path = os.path.join(self.directory, f"{lang}.json")
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        raw = json.load(f)
+                except Exception:
+                    LOG.error("locale_load_error", f"Erreur lecture des traductions {path}", lang=lang, path=path)
+            self._raw[lang] = raw
+            bundle = {k: _compile_template(v) for k, v in raw.items() if isinstance(v, str)}
+            self._bundles[lang] = bundle
+        return bundle
+
+    def display_name(self, lang: str) -> str:
+        self._bundle(lang)
+        return self._raw.get(lang, {}).get("_name", lang)
+
+    def render(self, lang: str, key: str, kwargs: Dict[str, Any]) -> str:
+        compiled = self._bundle(lang).get(key)
+        if compiled is None and lang != self.default_lang:
+            compiled = self._bundle(self.default_lang).get(key)
+        if compiled is None:
+            # fallback simple
+            return key
+        if not kwargs:
+            return compiled if isinstance(compiled, str) else self._raw_text(lang, key)
+        try:
+            return _render_template(compiled, kwargs)
+        except Exception:
+            return self._raw_text(lang, key)
+
+    def _raw_text(self, lang: str, key: str) -> str:
+        text = self._raw.get(lang, {}).get(key)
+        return text if text is not None else self._raw.get(self.default_lang, {}).get(key, key)
+
+
+CATALOG = TranslationCatalog(LOCALES_DIR, DEFAULT_LANG)
+
+# ---------------------------
+# Helpers for translations & language
+# ---------------------------
+# Cache (user_id, channel_id, guild_id) -> langue effective ; vidé à chaque changement de langue
+# (set_entry sur user_lang / channel_lang / server_lang) ou au chargement d'un serveur.
+_lang_cache: Dict[tuple, str] = {}
+LANG_SECTIONS = ("user_lang", "channel_lang", "server_lang")
+
+
+def invalidate_lang_cache() -> None:
+    _lang_cache.clear()
+
+
+def _resolve_lang(data: Dict[str, Any], guild_id: Optional[int], user_id: Optional[int], channel_id: Optional[int]) -> str:
+    """
+    Ordre : user_lang -> channel_lang -> server_lang -> DEFAULT_LANG.
+    """
+    if user_id and str(user_id) in data.get("user_lang", {}):
+        return data["user_lang"][str(user_id)]
+    if channel_id and str(channel_id) in data.get("channel_lang", {}):
+        return data["channel_lang"][str(channel_id)]
+    if guild_id and str(guild_id) in data.get("server_lang", {}):
+        return data["server_lang"][str(guild_id)]
+    return DEFAULT_LANG
+
+
+def get_lang_pref(data: Dict[str, Any], guild_id: Optional[int], user_id: Optional[int], channel_id: Optional[int]) -> str:
+    """
+    Récupère le code langue effectif pour l'utilisateur/canal/serveur (mémoïsé pour DATA).
+    """
+    if data is not DATA:
+        return _resolve_lang(data, guild_id, user_id, channel_id)
+    cache_key = (user_id, channel_id, guild_id)
+    lang = _lang_cache.get(cache_key)
+    if lang is None:
+        if len(_lang_cache) >= LANG_CACHE_MAX:
+            _lang_cache.clear()
+        lang = _lang_cache[cache_key] = _resolve_lang(data, guild_id, user_id, channel_id)
+    return lang
+
+
+def tr(data: Dict[str, Any], guild_id: Optional[int], user_id: Optional[int], channel_id: Optional[int], key: str, **kwargs) -> str:
+    """
+    Retourne la traduction pour la clé 'key' en vérifiant l'ordre:
+    user_lang -> channel_lang -> server_lang -> 'fr' par défaut.
+    """
+    return CATALOG.render(get_lang_pref(data, guild_id, user_id, channel_id), key, kwargs)
+
+
+# Choix proposés par les commandes de langue : un par fichier de locales/
+LANG_CHOICES = [app_commands.Choice(name=code, value=code) for code in sorted(CATALOG.available(), key=lambda c: (c != DEFAULT_LANG, c))]
+
+
+# ---------------------------
+# Core bot setup
+# ---------------------------
+intents = discord.Intents.default()
+intents.guilds = True
+intents.members = True
+intents.voice_states = True
+intents.messages = True
+intents.message_content = True  # si tu veux utiliser les commandes prefix
+
+# Charger config (optionnel)
+_config = load_config()
+TOKEN = os.environ.get("DISCORD_TOKEN") or _config.get("token") or ""
+CLIENT_ID = os.environ.get("CLIENT_ID") or _config.get("client_id") or None
+# Sharding : SHARD_COUNT vide = une seule connexion (commands.Bot), "auto" = nombre conseillé par Discord, N = N shards.
+# SHARD_IDS : shards gérés par ce processus (tous par défaut ; exige un SHARD_COUNT numérique)
+SHARD_COUNT = (os.environ.get("SHARD_COUNT") or str(_config.get("shard_count") or "")).strip().lower()
+SHARD_IDS = [int(x) for x in (os.environ.get("SHARD_IDS") or "").split(",") if x.strip()] or None
+
+# Cluster coordinator: it only spawns and supervises the workers, so it stops here, before the bot is built
+# and before the storage is opened, loaded or migrated (each worker does that once it holds its lease).
+if __name__ == "__main__" and CLUSTER_WORKERS > 1 and CLUSTER_WORKER_ID is None:
+    if not TOKEN:
+        print("ERREUR: Token Discord non fourni. Place ton token dans la variable d'environnement DISCORD_TOKEN ou config.json.")
+        sys.exit(1)
+    sys.exit(run_cluster(CLUSTER_WORKERS))
+
+
+class GuildStateTree(app_commands.CommandTree):
+    """
+    Command tree that makes sure the guild's persisted state is loaded before any slash command runs.
+    """
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # start of the command for the handler_duration_seconds metric (see on_app_command_completion)
+        interaction.extras["started"] = time.perf_counter()
+        # root span of the command (ended in on_app_command_completion / on_error)
+        name = "/" + interaction.command.qualified_name if interaction.command else "interaction"
+        interaction.extras["span"] = TRACER.start(name, guild=interaction.guild_id or 0, user=interaction.user.id)
+        if interaction.guild_id:
+            await load_guild_state(interaction.guild_id)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError) -> None:
+        TRACER.finish(interaction.extras.get("span"), f"{type(error).__name__}: {error}")
+        await super().on_error(interaction, error)
+
+
+# Create bot with both commands.Bot and app commands (slash), sharded if SHARD_COUNT is set
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix="!", intents=intents, tree_cls=GuildStateTree,
+                                  shard_count=None if SHARD_COUNT == "auto" else int(SHARD_COUNT), shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents, tree_cls=GuildStateTree)
+
+
+def shard_id_for(guild_id: int) -> int:
+    """
+    Shard that carries a guild (Discord formula); 0 when not sharded or before the shard count is known.
+    """
+    count = bot.shard_count or 1
+    return (int(guild_id) >> 22) % count if count > 1 else 0
+
+
+def owns_guild(guild_id: int) -> bool:
+    """
+    True if this process runs the shard of the guild (always True outside cluster / multi-process sharding).
+    """
+    return SHARD_IDS is None or shard_id_for(guild_id) in SHARD_IDS
+
+
+def shard_guild_counts() -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for guild in bot.guilds:
+        shard_id = shard_id_for(guild.id)
+        counts[shard_id] = counts.get(shard_id, 0) + 1
+    return counts
+
+
+def shard_temp_counts() -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for guild_id, n in TEMP_REGISTRY.guild_counts().items():
+        shard_id = shard_id_for(guild_id)
+        counts[shard_id] = counts.get(shard_id, 0) + n
+    return counts
+
+
+def shard_states() -> Dict[int, Dict[str, Any]]:
+    """
+    Connection state of each shard run by this process (a single pseudo-shard 0 when not sharded).
+    """
+    if isinstance(bot, commands.AutoShardedBot):
+        out = {}
+        for shard_id, shard in dict(bot.shards).items():
+            latency = shard.latency
+            out[shard_id] = {"connected": not shard.is_closed(), "latency": latency if math.isfinite(latency) else None}
+        return out
+    ws = bot.ws
+    latency = bot.latency
+    return {0: {"connected": bool(ws is not None and ws.open and not bot.is_closed()), "latency": latency if math.isfinite(latency) else None}}
+
+
+def instrument_http(http) -> None:
+    """
+    Time every Discord REST call (route template as label, e.g. POST /guilds/{guild_id}/channels).
+    Inside a traced handler each call is a child span (rate-limit waits included).
+    Also count the calls in flight (rate-limit waits included) in http.in_flight, read by the admission control.
+    """
+    request = http.request
+    http.in_flight = 0
+
+    async def timed_request(route, **kwargs):
+        started = time.perf_counter()
+        http.in_flight += 1
+        try:
+            with TRACER.span("rest " + route.method + " " + route.path, **{"http.method": route.method, "http.route": route.path}):
+                return await request(route, **kwargs)
+        except Exception:
+            REST_ERRORS.inc(route.method, route.path)
+            raise
+        finally:
+            http.in_flight -= 1
+            REST_SECONDS.observe(time.perf_counter() - started, route.method, route.path)
+
+    http.request = timed_request
+
+
+instrument_http(bot.http)
+
+
+def timed_handler(func):
+    """
+    Record the duration of an event handler in handler_duration_seconds (label = handler name)
+    and trace it as a root span.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with TRACER.span(name, root=True):
+                return await func(*args, **kwargs)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    started = interaction.extras.get("started")
+    if started is not None:
+        HANDLER_SECONDS.observe(time.perf_counter() - started, "/" + command.qualified_name)
+    TRACER.finish(interaction.extras.get("span"))
+
+
+@bot.before_invoke
+async def _before_prefix_command(ctx: commands.Context):
+    ctx.started = time.perf_counter()
+    # set in the command's own context: its REST calls become children of this span
+    ctx.span = TRACER.start("!" + ctx.command.qualified_name, guild=ctx.guild.id if ctx.guild else 0, user=ctx.author.id)
+
+
+@bot.after_invoke
+async def _after_prefix_command(ctx: commands.Context):
+    started = getattr(ctx, "started", None)
+    if started is not None and ctx.command is not None:
+        HANDLER_SECONDS.observe(time.perf_counter() - started, "!" + ctx.command.qualified_name)
+    TRACER.finish(getattr(ctx, "span", None), "command failed" if ctx.command_failed else None)
+
+
+METRICS.gauge_func("gateway_latency_seconds", "Discord gateway heartbeat latency", lambda: bot.latency)
+METRICS.gauge_func("temp_channels", "Live temporary channels", lambda: {(str(g),): n for g, n in TEMP_REGISTRY.guild_counts().items()}, ("guild",))
+METRICS.gauge_func("event_loop_lag_seconds", "Event loop wake-up delay (sampled every 0.5 s)", lambda: HEALTH_SERVER.loop_lag)
+METRICS.gauge_func("empty_channel_deletions_pending", "Armed empty temp channel deletion deadlines",
+                   lambda: {(str(shard_id),): len(sched) for shard_id, sched in list(EMPTY_CHANNEL_SCHEDULERS.items())}, ("shard",))
+METRICS.gauge_func("shard_connected", "1 if the shard's gateway connection is open", lambda: {(str(k),): float(v["connected"]) for k, v in shard_states().items()}, ("shard",))
+METRICS.gauge_func("shard_latency_seconds", "Gateway heartbeat latency per shard", lambda: {(str(k),): v["latency"] for k, v in shard_states().items()}, ("shard",))
+METRICS.gauge_func("shard_guilds", "Guilds per shard", lambda: {(str(k),): n for k, n in shard_guild_counts().items()}, ("shard",))
+METRICS.gauge_func("shard_temp_channels", "Live temporary channels per shard", lambda: {(str(k),): n for k, n in shard_temp_counts().items()}, ("shard",))
+METRICS.gauge_func("rest_requests_in_flight", "Discord REST calls in progress or waiting on a rate limit", lambda: bot.http.in_flight)
+METRICS.gauge_func("traces_exported", "Traces written to TRACE_FILE", lambda: TRACE_EXPORTER.stats["exported"])
+METRICS.gauge_func("log_entries_dropped", "Log entries lost because the log queue was full", lambda: LOG.stats["dropped"])
+METRICS.gauge_func("storage_last_flush_size", "Size of the last persistence flush (bytes for json, rows or files for the other backends)",
+                   lambda: {(STORAGE.name, STORAGE.size_unit): STORAGE.stats["last_size"]}, ("backend", "unit"))
+
+
+# ---------------------------
+# Load persistent data at startup
+# ---------------------------
+# Cluster worker: hold the lease on our shards before loading the shared state
+CLUSTER_LEASE = ShardLease(SQLITE_FILE, f"worker-{CLUSTER_WORKER_ID}", SHARD_IDS or [], CLUSTER_LEASE_SECONDS) if CLUSTER_WORKER_ID is not None else None
+if CLUSTER_LEASE is not None:
+    CLUSTER_LEASE.acquire_blocking()
+    CLUSTER_LEASE.start_renewal()
+STORAGE = create_storage(lambda: DATA)
+DATA = STORAGE.load()
+# We'll operate on DATA dict through set_entry(), which records each change in STORAGE (coalesced, off-loop save).
+
+
+def set_entry(section: str, key: str, value: Any, guild_id: Optional[str] = None, home_guild: Optional[int] = None) -> None:
+    """
+    Point d'entrée unique des modifications persistantes : met à jour DATA puis le signale au stockage.
+    value=None supprime l'entrée. guild_id est requis pour hosting_channels / temp_channels.
+    home_guild : serveur auquel rattacher une entrée non rangée par serveur (ex. channel_lang).
+    """
+    gid = str(guild_id) if guild_id is not None else None
+    if gid is None and section in GUILD_KEYED_SECTIONS:
+        home_guild = key
+    home = gid or (str(home_guild) if home_guild is not None else None)
+    if home is not None:
+        # l'état du serveur doit être chargé avant d'être modifié (stockage par serveur)
+        ensure_guild_loaded(home)
+    apply_change(DATA, section, gid, key, value)
+    if section in LANG_SECTIONS:
+        invalidate_lang_cache()
+    elif section in ROUTED_SECTIONS and gid is not None:
+        ROUTING.apply(DATA, section, gid, key, value)
+        if section == "hosting_channels":
+            # le modèle (idle_minutes) a pu changer : réinscrit les salons texte issus de ce hosting channel
+            IDLE_EXPIRER.retrack(int(key))
+    STORAGE.record(section, gid, str(key), value, home_guild=home)
+
+
+def ensure_guild_loaded(guild_id: int) -> None:
+    """
+    Charge à la demande l'état du serveur (stockage par serveur) et reconstruit son index.
+    Sans effet pour les moteurs qui chargent tout au démarrage.
+    """
+    gid = str(guild_id)
+    if STORAGE.ensure_guild(DATA, gid):
+        rebuild_index_for_guild(gid)
+        # the guild may bring server/channel languages with it
+        invalidate_lang_cache()
+
+
+async def load_guild_state(guild_id: int) -> None:
+    """
+    Comme ensure_guild_loaded, mais le fichier du serveur est lu hors de la boucle (handlers de la gateway).
+    """
+    gid = str(guild_id)
+    if await STORAGE.load_guild(DATA, gid):
+        rebuild_index_for_guild(gid)
+        invalidate_lang_cache()
+
+
+_lang_refresh_task: Optional[asyncio.Task] = None
+
+
+async def _refresh_cluster_langs() -> None:
+    while True:
+        await asyncio.sleep(CLUSTER_LANG_REFRESH_SECONDS)
+        try:
+            if await STORAGE.refresh_langs(DATA):
+                invalidate_lang_cache()
+        except Exception:
+            LOG.error("cluster_lang_refresh_error", "Cluster : erreur de relecture des langues")
+
+
+def start_cluster_lang_refresh() -> None:
+    """
+    Worker de cluster : relit toutes les CLUSTER_LANG_REFRESH_SECONDS les langues modifiées par les autres workers
+    (une seule tâche, même si on_ready est rappelé).
+    """
+    global _lang_refresh_task
+    if not CLUSTER_MODE or CLUSTER_LANG_REFRESH_SECONDS <= 0:
+        return
+    if _lang_refresh_task is None or _lang_refresh_task.done():
+        _lang_refresh_task = asyncio.get_running_loop().create_task(_refresh_cluster_langs())
+
+
+# Utility: helper to ensure keys exist in DATA maps (string keys for JSON uniformity)
+def ensure_guild_maps(guild_id: int) -> None:
+    """
+    Ensure nested structures exist for the guild in DATA (loading its state first if needed).
+    """
+    gid = str(guild_id)
+    ensure_guild_loaded(gid)
+    if "hosting_channels" not in DATA:
+        DATA["hosting_channels"] = {}
+    if gid not in DATA["hosting_channels"]:
+        DATA["hosting_channels"][gid] = {}
+    if "temp_channels" not in DATA:
+        DATA["temp_channels"] = {}
+    if gid not in DATA["temp_channels"]:
+        DATA["temp_channels"][gid] = {}
+    if "keepalive_config" not in DATA:
+        DATA["keepalive_config"] = {}
+    if "user_lang" not in DATA:
+        DATA["user_lang"] = {}
+    if "channel_lang" not in DATA:
+        DATA["channel_lang"] = {}
+    if "server_lang" not in DATA:
+        DATA["server_lang"] = {}
+    if "guild_settings" not in DATA:
+        DATA["guild_settings"] = {}
+
+
+# ---------------------------
+# In-memory auxiliary caches
+# ---------------------------
+# We save to DATA for persistence (channel_id -> owner_id), but keep an in-memory registry of temp channels
+# with int keys and compact records for fast per-user counts, ownership transfer and lifecycle queries.
+class TempChannelRecord:
+    __slots__ = ("channel_id", "guild_id", "owner_id", "origin_id", "kind", "created_at", "last_active")
+
+    def __init__(self, channel_id: int, guild_id: int, owner_id: int, origin_id: Optional[int], kind: Optional[str], created_at: float):
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.owner_id = owner_id
+        self.origin_id = origin_id      # hosting channel d'origine (None : commande ou enregistrement restauré)
+        self.kind = kind                # "voice" / "text" (None tant que non résolu après un redémarrage)
+        self.created_at = created_at
+        self.last_active = created_at
+
+
+class TempChannelRegistry:
+    """
+    Registre des canaux temporaires : ajout / suppression / transfert en O(1).
+    - _by_owner[(guild_id, owner_id)] = {channel_id}
+    - _by_guild[guild_id] = {channel_id: None}, ordre d'insertion = ordre de création (comptes par serveur, plus anciens d'abord)
+    - _by_origin[hosting_id] = {channel_id}
+    Les dates de création ne sont pas persistées : un enregistrement restauré au démarrage date de son chargement.
+    """
+
+    def __init__(self):
+        self.records: Dict[int, TempChannelRecord] = {}
+        self._by_owner: Dict[tuple, set] = {}
+        self._by_guild: Dict[int, Dict[int, None]] = {}
+        self._by_origin: Dict[int, set] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self.records
+
+    def get(self, channel_id: int) -> Optional[TempChannelRecord]:
+        return self.records.get(channel_id)
+
+    def add(self, channel_id: int, guild_id: int, owner_id: int, origin_id: Optional[int] = None, kind: Optional[str] = None,
+            created_at: Optional[float] = None) -> TempChannelRecord:
+        if channel_id in self.records:
+            self.remove(channel_id)
+        rec = TempChannelRecord(channel_id, guild_id, owner_id, origin_id, kind, created_at or time.time())
+        self.records[channel_id] = rec
+        self._by_owner.setdefault((guild_id, owner_id), set()).add(channel_id)
+        self._by_guild.setdefault(guild_id, {})[channel_id] = None
+        if origin_id is not None:
+            self._by_origin.setdefault(origin_id, set()).add(channel_id)
+        return rec
+
+    def remove(self, channel_id: int) -> Optional[TempChannelRecord]:
+        rec = self.records.pop(channel_id, None)
+        if rec is None:
+            return None
+        self._discard(self._by_owner, (rec.guild_id, rec.owner_id), channel_id)
+        guild_map = self._by_guild.get(rec.guild_id)
+        if guild_map is not None:
+            guild_map.pop(channel_id, None)
+            if not guild_map:
+                del self._by_guild[rec.guild_id]
+        if rec.origin_id is not None:
+            self._discard(self._by_origin, rec.origin_id, channel_id)
+        return rec
+
+    def transfer(self, channel_id: int, new_owner_id: int) -> Optional[TempChannelRecord]:
+        rec = self.records.get(channel_id)
+        if rec is None or rec.owner_id == new_owner_id:
+            return rec
+        self._discard(self._by_owner, (rec.guild_id, rec.owner_id), channel_id)
+        rec.owner_id = new_owner_id
+        self._by_owner.setdefault((rec.guild_id, new_owner_id), set()).add(channel_id)
+        return rec
+
+    def touch(self, channel_id: int, when: Optional[float] = None) -> None:
+        rec = self.records.get(channel_id)
+        if rec is not None:
+            rec.last_active = when or time.time()
+
+    @staticmethod
+    def _discard(index: Dict[Any, set], key: Any, channel_id: int) -> None:
+        members = index.get(key)
+        if members is not None:
+            members.discard(channel_id)
+            if not members:
+                del index[key]
+
+    def count_for(self, guild_id: int, owner_id: int) -> int:
+        return len(self._by_owner.get((guild_id, owner_id), ()))
+
+    def owned_by(self, guild_id: int, owner_id: int) -> List[int]:
+        # ordre de création
+        return sorted(self._by_owner.get((guild_id, owner_id), ()), key=lambda cid: self.records[cid].created_at)
+
+    def guild_count(self, guild_id: int) -> int:
+        return len(self._by_guild.get(guild_id, ()))
+
+    def guild_counts(self) -> Dict[int, int]:
+        return {guild_id: len(channels) for guild_id, channels in list(self._by_guild.items())}
+
+    def from_origin(self, hosting_id: int) -> List[int]:
+        return list(self._by_origin.get(hosting_id, ()))
+
+    def oldest(self, guild_id: Optional[int] = None, limit: Optional[int] = None) -> List[TempChannelRecord]:
+        """
+        Canaux les plus anciens d'abord (d'un serveur, ou de tous les serveurs).
+        """
+        if guild_id is not None:
+            source = (self.records[cid] for cid in self._by_guild.get(guild_id, ()))
+        else:
+            source = iter(self.records.values())
+        out = []
+        for rec in source:
+            if limit is not None and len(out) >= limit:
+                break
+            out.append(rec)
+        return out
+
+    def rebuild_guild(self, guild_id: int, temp_map: Dict[str, Any], origins: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Resynchronise un serveur avec DATA['temp_channels'][gid] (les métadonnées déjà connues sont conservées,
+        le hosting channel d'origine des enregistrements restaurés vient de DATA['temp_origins'][gid]).
+        """
+        wanted = {int(cid): int(owner_id) for cid, owner_id in temp_map.items()}
+        origins = origins or {}
+        for cid in list(self._by_guild.get(guild_id, ())):
+            if cid not in wanted:
+                self.remove(cid)
+        for cid, owner_id in wanted.items():
+            if cid not in self.records:
+                origin_id = origins.get(str(cid))
+                self.add(cid, guild_id, owner_id, origin_id=int(origin_id) if origin_id is not None else None)
+            else:
+                self.transfer(cid, owner_id)
+
+    def clear(self) -> None:
+        self.records.clear()
+        self._by_owner.clear()
+        self._by_guild.clear()
+        self._by_origin.clear()
+
+
+TEMP_REGISTRY = TempChannelRegistry()
+
+ROUTED_SECTIONS = ("hosting_channels", "temp_channels")
+
+
+class RoutingIndex:
+    """
+    Routage des événements vocaux / messages sans parcourir DATA :
+    routes[channel_id int] = ("hosting", hosting_info) ou ("temp", owner_id),
+    default_category[guild_id int] = catégorie temporaire par défaut du serveur (déjà résolue).
+    Un événement dont le salon n'est pas dans routes est ignoré après une seule recherche.
+    Tenu à jour par set_entry() et rebuild_index_for_guild().
+    """
+
+    def __init__(self):
+        self.routes: Dict[int, tuple] = {}
+        self.default_category: Dict[int, Optional[int]] = {}
+        self._by_guild: Dict[int, set] = {}
+
+    def get(self, channel_id: Optional[int]) -> Optional[tuple]:
+        if channel_id is None:
+            return None
+        return self.routes.get(channel_id)
+
+    def rebuild_guild(self, data: Dict[str, Any], gid: str) -> None:
+        guild_id = int(gid)
+        for cid in self._by_guild.pop(guild_id, ()):
+            self.routes.pop(cid, None)
+        channels = set()
+        for cid, info in data.get("hosting_channels", {}).get(gid, {}).items():
+            self.routes[int(cid)] = ("hosting", info)
+            channels.add(int(cid))
+        for cid, owner_id in data.get("temp_channels", {}).get(gid, {}).items():
+            self.routes[int(cid)] = ("temp", owner_id)
+            channels.add(int(cid))
+        if channels:
+            self._by_guild[guild_id] = channels
+        self._resolve_category(data, gid)
+
+    def apply(self, data: Dict[str, Any], section: str, gid: str, key: str, value: Any) -> None:
+        guild_id = int(gid)
+        cid = int(key)
+        if value is None:
+            self.routes.pop(cid, None)
+            self._by_guild.get(guild_id, set()).discard(cid)
+        else:
+            self.routes[cid] = ("hosting" if section == "hosting_channels" else "temp", value)
+            self._by_guild.setdefault(guild_id, set()).add(cid)
+        if section == "hosting_channels":
+            self._resolve_category(data, gid)
+
+    def _resolve_category(self, data: Dict[str, Any], gid: str) -> None:
+        # première catégorie configurée sur un hosting channel du serveur (ordre de configuration)
+        cat_id = None
+        for info in data.get("hosting_channels", {}).get(gid, {}).values():
+            if info and info.get("temp_category_id"):
+                cat_id = int(info["temp_category_id"])
+                break
+        if cat_id is None:
+            self.default_category.pop(int(gid), None)
+        else:
+            self.default_category[int(gid)] = cat_id
+
+
+ROUTING = RoutingIndex()
+
+
+def rebuild_index_for_guild(gid: str) -> None:
+    """
+    Rebuild the temp channel registry and the routing index for one guild from DATA.
+    """
+    TEMP_REGISTRY.rebuild_guild(int(gid), DATA.get("temp_channels", {}).get(gid, {}), DATA.get("temp_origins", {}).get(gid))
+    ROUTING.rebuild_guild(DATA, gid)
+
+
+async def route_lookup(guild_id: int, *channel_ids: Optional[int]) -> List[Optional[tuple]]:
+    """
+    Routes des salons donnés. L'état du serveur n'est chargé (hors de la boucle) que si aucun salon n'est routé
+    et qu'il ne l'est pas encore : un salon ordinaire d'un serveur déjà chargé ne coûte qu'une recherche.
+    """
+    routes = [ROUTING.get(cid) for cid in channel_ids]
+    if any(route is not None for route in routes) or STORAGE.is_loaded(str(guild_id)):
+        return routes
+    await load_guild_state(guild_id)
+    return [ROUTING.get(cid) for cid in channel_ids]
+
+
+def rebuild_index_from_data() -> None:
+    """
+    Rebuild the temp channel registry and the routing index from DATA on startup (guilds already loaded only).
+    """
+    TEMP_REGISTRY.clear()
+    for gid in set(DATA.get("temp_channels", {})) | set(DATA.get("hosting_channels", {})):
+        rebuild_index_for_guild(gid)
+
+
+rebuild_index_from_data()
+
+
+# ---------------------------
+# Deadline scheduler (one timer for every deadline)
+# ---------------------------
+class DeadlineScheduler:
+    """
+    Planificateur d'échéances basé sur un tas binaire et un seul timer de la boucle (call_at),
+    toujours armé sur l'échéance la plus proche. Aucun polling : armer est O(log n), annuler O(1),
+    et le coût CPU suit le nombre d'événements, pas le nombre d'échéances en attente.
+    Une clé n'a qu'une échéance à la fois : la réarmer remplace la précédente.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._heap: List[tuple] = []               # (deadline, seq, key) ; entrées périmées ignorées au dépilage
+        self._entries: Dict[Any, tuple] = {}       # key -> (seq, deadline, callback, args)
+        self._seq = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_when = 0.0
+        self.stats: Dict[str, int] = {"armed": 0, "cancelled": 0, "fired": 0, "errors": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_armed(self, key: Any) -> bool:
+        return key in self._entries
+
+    def deadline(self, key: Any) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def schedule(self, key: Any, delay: float, callback, *args) -> None:
+        """
+        Arme (ou réarme) l'échéance de 'key' dans 'delay' secondes ; callback(*args) est une coroutine.
+        """
+        loop = asyncio.get_running_loop()
+        when = loop.time() + max(delay, 0.0)
+        self._seq += 1
+        self._entries[key] = (self._seq, when, callback, args)
+        heapq.heappush(self._heap, (when, self._seq, key))
+        self.stats["armed"] += 1
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+        self._rearm(loop)
+
+    def cancel(self, key: Any) -> bool:
+        if self._entries.pop(key, None) is None:
+            return False
+        self.stats["cancelled"] += 1
+        # l'entrée reste dans le tas et sera ignorée au dépilage (annulation paresseuse)
+        return True
+
+    def _compact(self) -> None:
+        self._heap = [(when, seq, key) for key, (seq, when, _, _) in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def _is_live(self, item: tuple) -> bool:
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[0] == item[1]
+
+    def _rearm(self, loop: asyncio.AbstractEventLoop) -> None:
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return
+        when = self._heap[0][0]
+        if self._timer is not None:
+            if self._timer_when <= when:
+                return
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+        self._timer_when = when
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != seq:
+                continue
+            del self._entries[key]
+            self.stats["fired"] += 1
+            loop.create_task(self._fire(key, entry[2], entry[3]))
+        self._rearm(loop)
+
+    async def _fire(self, key: Any, callback, args: tuple) -> None:
+        try:
+            await callback(*args)
+        except Exception:
+            self.stats["errors"] += 1
+            LOG.error("scheduler_error", f"Erreur dans le planificateur {self.name}", scheduler=self.name, key=key)
+
+
+# Échéances de suppression des salons vocaux temporaires vides, une file par shard (clé : channel_id int)
+EMPTY_CHANNEL_SCHEDULERS: Dict[int, DeadlineScheduler] = {}
+
+
+def empty_channel_scheduler(guild_id: int) -> DeadlineScheduler:
+    shard_id = shard_id_for(guild_id)
+    scheduler = EMPTY_CHANNEL_SCHEDULERS.get(shard_id)
+    if scheduler is None:
+        scheduler = EMPTY_CHANNEL_SCHEDULERS[shard_id] = DeadlineScheduler(f"empty_channels/shard{shard_id}")
+    return scheduler
+
+
+# ---------------------------
+# Keepalive engine: guilds ordered by next due time, messages sent when due
+# ---------------------------
+def keepalive_interval_seconds(cfg: Dict[str, Any]) -> float:
+    """
+    Intervalle effectif : interval_seconds (précision infra-minute) sinon interval_minutes.
+    """
+    if cfg.get("interval_seconds"):
+        return max(float(cfg["interval_seconds"]), KEEPALIVE_MIN_INTERVAL_SECONDS)
+    return max(int(cfg.get("interval_minutes", 1)), 1) * 60.0
+
+
+def keepalive_interval_display(cfg: Dict[str, Any]):
+    """
+    Intervalle effectif en minutes pour les messages (entier si possible, sinon 2 décimales).
+    """
+    minutes = keepalive_interval_seconds(cfg) / 60.0
+    return int(minutes) if minutes.is_integer() else round(minutes, 2)
+
+
+class KeepaliveEngine:
+    """
+    Remplace la boucle "toutes les minutes" : les serveurs sont rangés dans un tas par prochaine échéance
+    et la tâche dort exactement jusqu'à la plus proche. Les envois dus au même moment partent en parallèle
+    (KEEPALIVE_CONCURRENCY au plus par shard : un shard chargé ne bloque pas les autres), avec un espacement minimal par salon, puis les last_sent du lot sont
+    enregistrés ensemble (un seul flush du stockage). Une gigue aléatoire évite que des milliers de serveurs
+    ayant le même intervalle se déclenchent à la même seconde.
+    """
+
+    def __init__(self, concurrency: int, channel_min_gap: float, jitter_ratio: float):
+        self.channel_min_gap = channel_min_gap
+        self.jitter_ratio = jitter_ratio
+        self.concurrency = concurrency
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._heap: List[tuple] = []          # (due_ts, seq, guild_id)
+        self._entries: Dict[str, int] = {}    # guild_id -> seq de l'échéance valide
+        self._seq = 0
+        self._channel_last: Dict[int, float] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {"sent": 0, "failed": 0, "ticks": 0, "last_lag_ms": 0.0, "max_lag_ms": 0.0}
+
+    def start(self) -> None:
+        """
+        Charge toutes les configs et lance la tâche (une seule fois, même si on_ready est rappelé).
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._wake = asyncio.Event()
+        self._heap, self._entries = [], {}
+        for gid in list(DATA.get("keepalive_config", {})):
+            self.update(gid)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def update(self, gid: str, after_send: bool = False) -> None:
+        """
+        (Re)calcule l'échéance d'un serveur après un changement de config ou un envoi.
+        """
+        cfg = DATA.get("keepalive_config", {}).get(str(gid))
+        if not cfg or not owns_guild(int(gid)):
+            # config supprimée, ou serveur géré par un autre processus du cluster
+            self.remove(gid)
+            return
+        interval = keepalive_interval_seconds(cfg)
+        jitter = random.uniform(0, self.jitter_ratio * interval)
+        due = float(cfg.get("last_sent", 0) or 0) + interval
+        now = time.time()
+        if due < now and not after_send:
+            # en retard (démarrage, nouvelle config) : étalé sur la fenêtre de gigue plutôt que tout de suite
+            due = now
+        self._push(str(gid), due + jitter)
+
+    def retry_later(self, gid: str) -> None:
+        self._push(str(gid), time.time() + KEEPALIVE_RETRY_SECONDS)
+
+    def remove(self, gid: str) -> None:
+        if self._entries.pop(str(gid), None) is not None:
+            self._maybe_compact()
+
+    def _push(self, gid: str, due: float) -> None:
+        self._seq += 1
+        self._entries[gid] = self._seq
+        heapq.heappush(self._heap, (due, self._seq, gid))
+        if self._wake is not None and self._heap[0][1] == self._seq:
+            # nouvelle échéance la plus proche : on réveille la tâche pour qu'elle se recale
+            self._wake.set()
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        # configs supprimées / réarmées : entrées périmées retirées quand elles dominent le tas
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [item for item in self._heap if self._entries.get(item[2]) == item[1]]
+            heapq.heapify(self._heap)
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self._drop_stale()
+                timeout = self._heap[0][0] - time.time() if self._heap else None
+                if timeout is None or timeout > 0:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due_ts, seq, gid = heapq.heappop(self._heap)
+                    if self._entries.get(gid) != seq:
+                        continue
+                    del self._entries[gid]
+                    due.append((gid, due_ts))
+                if due:
+                    self.stats["ticks"] += 1
+                    asyncio.get_running_loop().create_task(self._dispatch(due))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                LOG.error("keepalive_engine_error", "Erreur dans le moteur keepalive")
+                await asyncio.sleep(1)
+
+    async def _dispatch(self, due: List[tuple]) -> None:
+        results = await asyncio.gather(*(self._send_one(gid, due_ts) for gid, due_ts in due))
+        for (gid, _), sent_at in zip(due, results):
+            cfg = DATA.get("keepalive_config", {}).get(gid)
+            if cfg is None or gid in self._entries:
+                # config supprimée ou remplacée pendant l'envoi
+                continue
+            if sent_at is None:
+                self.retry_later(gid)
+                continue
+            cfg["last_sent"] = sent_at
+            # le stockage regroupe ces écritures : un seul flush pour tout le lot
+            set_entry("keepalive_config", gid, cfg)
+            self.update(gid, after_send=True)
+
+    async def _send_one(self, gid: str, due_ts: float) -> Optional[float]:
+        cfg = DATA.get("keepalive_config", {}).get(gid)
+        if not cfg:
+            return None
+        shard_id = shard_id_for(int(gid))
+        try:
+            channel = bot.get_channel(int(cfg.get("channel_id")))
+            if not channel:
+                self.stats["failed"] += 1
+                KEEPALIVE_SENDS.inc(str(shard_id), "failed")
+                return None
+            semaphore = self._semaphores.get(shard_id)
+            if semaphore is None:
+                semaphore = self._semaphores[shard_id] = asyncio.Semaphore(self.concurrency)
+            async with semaphore:
+                # espacement minimal par salon : le créneau est réservé avant d'attendre,
+                # deux serveurs dus qui partagent un salon ne partent donc pas coup sur coup
+                now = time.time()
+                slot = max(self._channel_last.get(channel.id, 0) + self.channel_min_gap, now)
+                self._channel_last[channel.id] = slot
+                if slot > now:
+                    await asyncio.sleep(slot - now)
+                await channel.send(cfg.get("message", "🔄 Keepalive"))
+                sent_at = time.time()
+                self._channel_last[channel.id] = max(self._channel_last[channel.id], sent_at)
+            lag_ms = max(sent_at - due_ts, 0.0) * 1000.0
+            self.stats["sent"] += 1
+            self.stats["last_lag_ms"] = lag_ms
+            self.stats["max_lag_ms"] = max(self.stats["max_lag_ms"], lag_ms)
+            KEEPALIVE_SENDS.inc(str(shard_id), "sent")
+            KEEPALIVE_LAG_SECONDS.observe(lag_ms / 1000.0, str(shard_id))
+            return sent_at
+        except Exception:
+            # ne pas interrompre le lot pour une erreur d'un serveur
+            self.stats["failed"] += 1
+            KEEPALIVE_SENDS.inc(str(shard_id), "failed")
+            LOG.error("keepalive_send_error", "Erreur keepalive", guild=int(gid), shard=shard_id)
+            return None
+
+
+KEEPALIVE_ENGINE = KeepaliveEngine(KEEPALIVE_CONCURRENCY, KEEPALIVE_CHANNEL_MIN_GAP, KEEPALIVE_JITTER_RATIO)
+
+
+# ---------------------------
+# Helper: check admin
+# ---------------------------
+def is_admin_member(member: discord.Member) -> bool:
+    return member.guild_permissions.administrator
+
+
+# ---------------------------
+# App commands (slash) registration
+# We'll create an app command tree on bot to offer slash commands.
+# ---------------------------
+# We'll register commands on on_ready to allow dynamic guild-scoped registration if CLIENT_ID and guild known.
+# Also provide fallback prefix commands for older clients.
+
+
+# ---------------------------
+# Utility functions to manage temp channels with a per-user limit (3 by default, configurable per server)
+# ---------------------------
+MAX_TEMP_PER_USER = int(os.environ.get("MAX_TEMP_PER_USER", 3))
+
+
+def get_temp_quota(guild_id: int) -> int:
+    settings = DATA.get("guild_settings", {}).get(str(guild_id)) or {}
+    return int(settings.get("max_temp_per_user", MAX_TEMP_PER_USER))
+
+
+def get_user_temp_count(guild_id: int, user_id: int) -> int:
+    return TEMP_REGISTRY.count_for(int(guild_id), int(user_id))
+
+
+def add_temp_channel_record(guild_id: int, channel_id: int, owner_id: int, origin_id: Optional[int] = None, kind: Optional[str] = None) -> None:
+    oid = int(owner_id)
+    # DATA update
+    set_entry("temp_channels", str(channel_id), oid, guild_id=str(guild_id))
+    if origin_id is not None:
+        set_entry("temp_origins", str(channel_id), int(origin_id), guild_id=str(guild_id))
+    # registry update
+    rec = TEMP_REGISTRY.add(int(channel_id), int(guild_id), oid, origin_id=origin_id, kind=kind)
+    IDLE_EXPIRER.track(rec)
+    TEMP_CREATED.inc(str(guild_id), kind or "unknown")
+
+
+def remove_temp_channel_record(guild_id: int, channel_id: int) -> None:
+    gid = str(guild_id)
+    cid = str(channel_id)
+    ensure_guild_loaded(gid)
+    tcs = DATA.get("temp_channels", {}).get(gid, {})
+    owner_id = tcs.get(cid)
+    if owner_id is not None:
+        # remove from DATA
+        set_entry("temp_channels", cid, None, guild_id=gid)
+        TEMP_DELETED.inc(gid)
+    if cid in DATA.get("temp_origins", {}).get(gid, {}):
+        set_entry("temp_origins", cid, None, guild_id=gid)
+    TEMP_REGISTRY.remove(int(channel_id))
+    IDLE_EXPIRER.forget(int(channel_id))
+    RECYCLER.release(int(channel_id))
+
+
+def transfer_temp_channel_record(guild_id: int, channel_id: int, new_owner_id: int) -> None:
+    set_entry("temp_channels", str(channel_id), int(new_owner_id), guild_id=str(guild_id))
+    TEMP_REGISTRY.transfer(int(channel_id), int(new_owner_id))
+    # parked for the previous owner: no longer recyclable
+    RECYCLER.release(int(channel_id))
+
+
+def list_user_temp_channels(guild_id: int, user_id: int) -> List[int]:
+    return TEMP_REGISTRY.owned_by(int(guild_id), int(user_id))
+
+
+# ---------------------------
+# Admission control for temp channel creation
+# ---------------------------
+# Chaque création (hosting texte / vocal, create_temp) doit d'abord obtenir une admission :
+# - délestage si la passerelle du shard est trop lente (ADMISSION_MAX_LATENCY) ou si trop d'appels REST
+#   sont en cours ou en attente de rate limit (ADMISSION_MAX_REST_IN_FLIGHT)
+# - quota par membre du serveur (get_temp_quota), réservé de façon atomique : deux événements simultanés
+#   ne peuvent pas prendre la même place ; release() rend la place une fois le canal enregistré (ou la création ratée)
+# - seaux à jetons par membre, par hosting channel et par serveur (créations / minute + rafale, 0 = sans limite)
+ADMISSION_USER_PER_MINUTE = float(os.environ.get("ADMISSION_USER_PER_MINUTE", 6))
+ADMISSION_USER_BURST = float(os.environ.get("ADMISSION_USER_BURST", 3))
+ADMISSION_HOSTING_PER_MINUTE = float(os.environ.get("ADMISSION_HOSTING_PER_MINUTE", 120))
+ADMISSION_HOSTING_BURST = float(os.environ.get("ADMISSION_HOSTING_BURST", 30))
+ADMISSION_GUILD_PER_MINUTE = float(os.environ.get("ADMISSION_GUILD_PER_MINUTE", 240))
+ADMISSION_GUILD_BURST = float(os.environ.get("ADMISSION_GUILD_BURST", 60))
+ADMISSION_MAX_LATENCY = float(os.environ.get("ADMISSION_MAX_LATENCY", 2.0))
+ADMISSION_MAX_REST_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_REST_IN_FLIGHT", 50))
+ADMISSION_BUCKET_IDLE_SECONDS = 600.0
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, per_minute: float, burst: float, now: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = now
+
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+
+class AdmissionController:
+    # portée -> (créations / minute, rafale)
+    LIMITS = {
+        "user": (ADMISSION_USER_PER_MINUTE, ADMISSION_USER_BURST),
+        "hosting": (ADMISSION_HOSTING_PER_MINUTE, ADMISSION_HOSTING_BURST),
+        "guild": (ADMISSION_GUILD_PER_MINUTE, ADMISSION_GUILD_BURST),
+    }
+
+    def __init__(self):
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self._reserved: Dict[tuple, int] = {}   # (guild_id, user_id) -> créations en cours
+        self._last_prune = time.monotonic()
+        self.stats: Dict[str, int] = {"admitted": 0, "quota": 0, "rate_limited": 0, "overloaded": 0}
+
+    @staticmethod
+    def overloaded(guild_id: int) -> bool:
+        latency = shard_states().get(shard_id_for(guild_id), {}).get("latency")
+        if latency is not None and latency > ADMISSION_MAX_LATENCY:
+            return True
+        return getattr(bot.http, "in_flight", 0) > ADMISSION_MAX_REST_IN_FLIGHT
+
+    def _bucket(self, scope: str, key: int, now: float) -> Optional[TokenBucket]:
+        per_minute, burst = self.LIMITS[scope]
+        if per_minute <= 0:
+            return None
+        bucket = self._buckets.get((scope, key))
+        if bucket is None:
+            bucket = self._buckets[(scope, key)] = TokenBucket(per_minute, burst, now)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # un seau inutilisé depuis longtemps est plein : inutile de le garder
+        self._last_prune = now
+        for key in [k for k, b in self._buckets.items() if now - b.updated > ADMISSION_BUCKET_IDLE_SECONDS]:
+            del self._buckets[key]
+
+    def reserve(self, guild_id: int, user_id: int, hosting_id: Optional[int] = None) -> Optional[str]:
+        """
+        Réserve une création pour ce membre. Retourne None si elle est admise (appeler release() ensuite),
+        sinon la raison du refus : "overloaded", "quota" ou "rate_limited".
+        Pas d'await ici : vérification et réservation sont atomiques sur la boucle.
+        """
+        guild_id, user_id = int(guild_id), int(user_id)
+        if self.overloaded(guild_id):
+            self.stats["overloaded"] += 1
+            ADMISSION_REJECTED.inc(str(guild_id), "overloaded")
+            return "overloaded"
+        slot = (guild_id, user_id)
+        if get_user_temp_count(guild_id, user_id) + self._reserved.get(slot, 0) >= get_temp_quota(guild_id):
+            self.stats["quota"] += 1
+            ADMISSION_REJECTED.inc(str(guild_id), "quota")
+            return "quota"
+        now = time.monotonic()
+        if now - self._last_prune > ADMISSION_BUCKET_IDLE_SECONDS:
+            self._prune(now)
+        scopes = [("user", user_id), ("guild", guild_id)]
+        if hosting_id is not None:
+            scopes.append(("hosting", int(hosting_id)))
+        buckets = [b for b in (self._bucket(scope, key, now) for scope, key in scopes) if b is not None]
+        # tous les seaux doivent avoir un jeton, sinon aucun n'est débité
+        if any(b.refill(now) < 1.0 for b in buckets):
+            self.stats["rate_limited"] += 1
+            ADMISSION_REJECTED.inc(str(guild_id), "rate_limited")
+            return "rate_limited"
+        for b in buckets:
+            b.tokens -= 1.0
+        self._reserved[slot] = self._reserved.get(slot, 0) + 1
+        self.stats["admitted"] += 1
+        return None
+
+    def release(self, guild_id: int, user_id: int) -> None:
+        """
+        Libère la place réservée : le canal est enregistré (il compte désormais dans TEMP_REGISTRY) ou la création a échoué.
+        """
+        slot = (int(guild_id), int(user_id))
+        left = self._reserved.get(slot, 0) - 1
+        if left > 0:
+            self._reserved[slot] = left
+        else:
+            self._reserved.pop(slot, None)
+
+
+ADMISSION = AdmissionController()
+
+
+# réponses aux refus d'admission (clés de traduction)
+ADMISSION_MESSAGES = {"quota": "already_max_temp", "rate_limited": "temp_rate_limited", "overloaded": "bot_overloaded"}
+
+
+# ---------------------------
+# Temp channel provisioning (one API call per channel)
+# ---------------------------
+# Modèle par hosting channel, stocké à côté de temp_category_id : hosting_info["template"] =
+# {"name": "{user}'s Channel", "user_limit": 0-99, "bitrate": bps, "private": bool}
+DEFAULT_CHANNEL_NAMES = {"voice": "{user}'s Channel", "text": "{user}-temp"}
+
+
+def resolve_temp_category(guild: discord.Guild, hosting_info: Optional[Dict[str, Any]] = None) -> Optional[discord.CategoryChannel]:
+    """
+    Catégorie des canaux temporaires : celle du hosting channel s'il y en a un,
+    sinon la première catégorie configurée sur le serveur, sinon DEFAULT_TEMP_CATEGORY_ID.
+    """
+    if hosting_info is not None:
+        temp_cat_id = hosting_info.get("temp_category_id")
+    else:
+        temp_cat_id = ROUTING.default_category.get(guild.id)
+    temp_cat_id = temp_cat_id or DEFAULT_TEMP_CATEGORY_ID
+    if not temp_cat_id:
+        return None
+    try:
+        return guild.get_channel(int(temp_cat_id))
+    except Exception:
+        return None
+
+
+def build_channel_overwrites(guild: discord.Guild, owner: discord.abc.User, kind: str, private: bool) -> Dict[Any, discord.PermissionOverwrite]:
+    """
+    Permissions posées à la création (plus de set_permissions séparés).
+    Les canaux texte sont privés : caché pour @everyone, visible et ouvert à l'écriture pour le propriétaire.
+    """
+    if kind == "text":
+        return {
+            guild.default_role: discord.PermissionOverwrite(view_channel=False),
+            owner: discord.PermissionOverwrite(view_channel=True, send_messages=True),
+        }
+    if private:
+        return {
+            guild.default_role: discord.PermissionOverwrite(view_channel=False),
+            owner: discord.PermissionOverwrite(view_channel=True, connect=True),
+        }
+    return {}
 
-# Charger config (optionnel)
-_config = load_config()
-TOKEN = os.environ.get("DISCORD_TOKEN") or _config.get("token") or ""
-CLIENT_ID = os.environ.get("CLIENT_ID") or _config.get("client_id") or None
 
-# Create bot with both commands.Bot and app commands (slash)
-bot = commands.Bot(command_prefix="!", intents=intents)
+def temp_channel_name(owner: discord.abc.User, kind: str, template: Dict[str, Any]) -> str:
+    name_format = template.get("name") or DEFAULT_CHANNEL_NAMES[kind]
+    try:
+        return name_format.format(user=owner.display_name)
+    except Exception:
+        return DEFAULT_CHANNEL_NAMES[kind].format(user=owner.display_name)
 
 
-# ---------------------------
-# Load persistent data at startup
-# ---------------------------
-DATA = load_data()
-# We'll operate on DATA dict and call save_data(DATA) after each write change.
+def voice_channel_options(guild: discord.Guild, template: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    user_limit / bitrate du modèle, bornés aux limites Discord du serveur.
+    """
+    options: Dict[str, Any] = {}
+    if template.get("user_limit") is not None:
+        options["user_limit"] = max(0, min(int(template["user_limit"]), 99))
+    if template.get("bitrate"):
+        options["bitrate"] = max(8000, min(int(template["bitrate"]), int(guild.bitrate_limit)))
+    return options
 
-# Utility: helper to ensure keys exist in DATA maps (string keys for JSON uniformity)
-def ensure_guild_maps(guild_id: int) -> None:
+
+async def provision_temp_channel(guild: discord.Guild, owner: discord.Member, kind: str, name: Optional[str] = None,
+                                 hosting_info: Optional[Dict[str, Any]] = None, hosting_id: Optional[int] = None) -> discord.abc.GuildChannel:
     """
-    Ensure nested structures exist for the guild in DATA.
+    Crée un canal temporaire (text / voice) en un seul appel REST à partir du modèle du hosting channel,
+    l'enregistre, et pour un vocal arme sa suppression s'il reste vide.
     """
-    gid = str(guild_id)
-    if "hosting_channels" not in DATA:
-        DATA["hosting_channels"] = {}
-    if gid not in DATA["hosting_channels"]:
-        DATA["hosting_channels"][gid] = {}
-    if "temp_channels" not in DATA:
-        DATA["temp_channels"] = {}
-    if gid not in DATA["temp_channels"]:
-        DATA["temp_channels"][gid] = {}
-    if "keepalive_config" not in DATA:
-        DATA["keepalive_config"] = {}
-    if "user_lang" not in DATA:
-        DATA["user_lang"] = {}
-    if "channel_lang" not in DATA:
-        DATA["channel_lang"] = {}
-    if "server_lang" not in DATA:
-        DATA["server_lang"] = {}
+    template = (hosting_info or {}).get("template") or {}
+    category = resolve_temp_category(guild, hosting_info)
+    name = name or temp_channel_name(owner, kind, template)
+    overwrites = build_channel_overwrites(guild, owner, kind, bool(template.get("private")))
+    if kind == "voice":
+        channel = await guild.create_voice_channel(name, category=category, overwrites=overwrites, **voice_channel_options(guild, template))
+    else:
+        channel = await guild.create_text_channel(name, category=category, overwrites=overwrites)
+    add_temp_channel_record(guild.id, channel.id, owner.id, origin_id=hosting_id, kind=kind)
+    if kind == "voice":
+        # the channel is deleted if nobody joins it before the deadline (a join cancels it)
+        schedule_empty_channel_deletion(channel.id, guild.id)
+    return channel
 
 
 # ---------------------------
-# In-memory auxiliary caches
+# Pre-warmed voice channel pool (per voice hosting channel)
 # ---------------------------
-# We save to DATA for persistence, but keep an in-memory index for fast per-user count
-# Structure: user_temp_count[guild_id][user_id] = [channel_ids...]
-user_temp_index: Dict[str, Dict[str, List[str]]] = {}  # guild_id -> user_id -> [channel_id,...]
+# Activé par hosting channel via template["pool_size"] (taille max). Les canaux du pool sont créés cachés
+# à l'avance ; à l'arrivée d'un membre on le déplace directement dedans (un seul appel REST), puis le canal
+# est renommé / ouvert en arrière-plan. La taille visée suit le rythme des arrivées ; le pool est réduit
+# quand les arrivées se calment, puis vidé après POOL_TRIM_SECONDS sans arrivée (la suivante le remplit).
+VOICE_POOL_CHANNEL_NAME = "⏳"
+POOL_RATE_WINDOW = 300.0      # fenêtre d'observation des arrivées (s)
+POOL_HORIZON_SECONDS = 30.0   # taille visée = arrivées attendues sur cet horizon
+POOL_TRIM_SECONDS = 600.0     # pool vidé après ce délai sans arrivée (aucun canal caché gardé au calme)
 
 
-def rebuild_index_from_data() -> None:
+class VoiceChannelPool:
     """
-    Rebuild user_temp_index from DATA['temp_channels'] on startup.
+    Pool de salons vocaux inactifs. L'état persistant est DATA["voice_pool"][guild_id][channel_id] = hosting_channel_id,
+    pour pouvoir retrouver (et nettoyer) les canaux du pool après un redémarrage.
     """
-    global user_temp_index
-    user_temp_index = {}
-    tcs = DATA.get("temp_channels", {})
-    for gid, mapping in tcs.items():
-        user_temp_index[gid] = {}
-        for ch_id, owner_id in mapping.items():
-            owner_key = str(owner_id)
-            if owner_key not in user_temp_index[gid]:
-                user_temp_index[gid][owner_key] = []
-            user_temp_index[gid][owner_key].append(str(ch_id))
 
+    def __init__(self):
+        self._joins: Dict[int, deque] = {}
+        self._last_active: Dict[int, float] = {}  # hosting_id -> dernière arrivée (ou préchauffage)
+        self._refilling: set = set()
+        self._scheduler = DeadlineScheduler("voice_pool")
+        self.stats: Dict[str, int] = {"claimed": 0, "misses": 0, "created": 0, "trimmed": 0}
+
+    @staticmethod
+    def max_size(hosting_info: Optional[Dict[str, Any]]) -> int:
+        if not hosting_info or hosting_info.get("type") != "voice":
+            return 0
+        return max(int((hosting_info.get("template") or {}).get("pool_size") or 0), 0)
+
+    @staticmethod
+    def idle_channels(guild_id: int, hosting_id: int) -> List[int]:
+        return [int(cid) for cid, hid in DATA.get("voice_pool", {}).get(str(guild_id), {}).items() if int(hid) == int(hosting_id)]
+
+    def target_size(self, hosting_id: int, hosting_info: Optional[Dict[str, Any]]) -> int:
+        max_size = self.max_size(hosting_info)
+        if max_size == 0:
+            return 0
+        now = time.monotonic()
+        if now - self._last_active.get(hosting_id, float("-inf")) >= POOL_TRIM_SECONDS:
+            # période calme : plus de canal en attente, la prochaine arrivée relance le remplissage
+            return 0
+        joins = self._joins.get(hosting_id)
+        while joins and now - joins[0] > POOL_RATE_WINDOW:
+            joins.popleft()
+        rate = len(joins or ()) / POOL_RATE_WINDOW
+        return max(1, min(max_size, math.ceil(rate * POOL_HORIZON_SECONDS)))
+
+    async def claim(self, guild: discord.Guild, member: discord.Member, hosting_id: int, hosting_info: Dict[str, Any]) -> Optional[discord.VoiceChannel]:
+        """
+        Prend un canal du pool, l'enregistre comme canal temporaire du membre et l'y déplace.
+        Retourne None si le pool est désactivé ou vide (l'appelant crée alors un canal normalement).
+        """
+        if self.max_size(hosting_info) == 0:
+            return None
+        self._joins.setdefault(hosting_id, deque(maxlen=10_000)).append(time.monotonic())
+        channel = None
+        for cid in self.idle_channels(guild.id, hosting_id):
+            set_entry("voice_pool", str(cid), None, guild_id=guild.id)
+            ch = guild.get_channel(cid)
+            if isinstance(ch, discord.VoiceChannel):
+                channel = ch
+                break
+        self.refill_soon(guild, hosting_id, hosting_info)
+        if channel is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["claimed"] += 1
+        add_temp_channel_record(guild.id, channel.id, member.id, origin_id=hosting_id, kind="voice")
+        # same lifecycle as a created channel: deleted if the member never lands in it
+        schedule_empty_channel_deletion(channel.id, guild.id)
+        try:
+            await member.move_to(channel)
+        except Exception:
+            pass
+        # le membre est déjà dedans : nom et permissions du propriétaire appliqués en arrière-plan
+        asyncio.get_running_loop().create_task(self._finalize(channel, member, hosting_info))
+        return channel
+
+    async def _finalize(self, channel: discord.VoiceChannel, member: discord.Member, hosting_info: Dict[str, Any]) -> None:
+        template = hosting_info.get("template") or {}
+        try:
+            await channel.edit(name=temp_channel_name(member, "voice", template),
+                               overwrites=build_channel_overwrites(channel.guild, member, "voice", bool(template.get("private"))))
+        except Exception:
+            LOG.error("voice_pool_finalize_error", "Erreur lors de l'attribution d'un canal du pool", guild=channel.guild, user=member, channel=channel)
+
+    def refill_soon(self, guild: discord.Guild, hosting_id: int, hosting_info: Dict[str, Any]) -> None:
+        key = (guild.id, int(hosting_id))
+        self._last_active[int(hosting_id)] = time.monotonic()
+        # réduction seulement après une période calme : chaque arrivée repousse l'échéance
+        self._scheduler.schedule(key, POOL_TRIM_SECONDS, self._trim, guild, int(hosting_id))
+        if key in self._refilling:
+            return
+        self._refilling.add(key)
+        asyncio.get_running_loop().create_task(self._refill(guild, int(hosting_id), hosting_info))
 
-rebuild_index_from_data()
+    async def _refill(self, guild: discord.Guild, hosting_id: int, hosting_info: Dict[str, Any]) -> None:
+        try:
+            template = hosting_info.get("template") or {}
+            while len(self.idle_channels(guild.id, hosting_id)) < self.target_size(hosting_id, hosting_info):
+                if str(hosting_id) not in DATA.get("hosting_channels", {}).get(str(guild.id), {}):
+                    # hosting supprimé entre-temps
+                    return
+                ch = await guild.create_voice_channel(
+                    VOICE_POOL_CHANNEL_NAME,
+                    category=resolve_temp_category(guild, hosting_info),
+                    overwrites={guild.default_role: discord.PermissionOverwrite(view_channel=False)},
+                    **voice_channel_options(guild, template),
+                )
+                set_entry("voice_pool", str(ch.id), hosting_id, guild_id=guild.id)
+                self.stats["created"] += 1
+        except Exception:
+            LOG.error("voice_pool_refill_error", "Erreur lors du remplissage du pool vocal", guild=guild, hosting=hosting_id)
+        finally:
+            self._refilling.discard((guild.id, hosting_id))
+
+    async def _trim(self, guild: discord.Guild, hosting_id: int, drain: bool = False) -> None:
+        hosting_info = DATA.get("hosting_channels", {}).get(str(guild.id), {}).get(str(hosting_id))
+        target = 0 if drain else self.target_size(hosting_id, hosting_info)
+        idle = self.idle_channels(guild.id, hosting_id)
+        for cid in idle[target:]:
+            set_entry("voice_pool", str(cid), None, guild_id=guild.id)
+            ch = guild.get_channel(cid)
+            if ch:
+                try:
+                    await ch.delete()
+                except Exception:
+                    pass
+            self.stats["trimmed"] += 1
+        if not drain and target > 0:
+            # le rythme continue de décroître : on revérifie plus tard (jusqu'au pool vide)
+            self._scheduler.schedule((guild.id, hosting_id), POOL_TRIM_SECONDS, self._trim, guild, hosting_id)
+
+    async def drain(self, guild: discord.Guild, hosting_id: int) -> None:
+        """
+        Supprime tous les canaux du pool d'un hosting channel (hosting retiré).
+        """
+        self._scheduler.cancel((guild.id, int(hosting_id)))
+        self._joins.pop(int(hosting_id), None)
+        self._last_active.pop(int(hosting_id), None)
+        await self._trim(guild, int(hosting_id), drain=True)
+
+    def warm(self, guild: discord.Guild) -> None:
+        """
+        Lance le remplissage des pools configurés du serveur (au démarrage).
+        """
+        for hosting_id, info in DATA.get("hosting_channels", {}).get(str(guild.id), {}).items():
+            if self.max_size(info) > 0:
+                self.refill_soon(guild, int(hosting_id), info)
+
+
+VOICE_POOL = VoiceChannelPool()
 
 
 # ---------------------------
-# Keepalive loop (task) to send messages periodically
+# Bulk purge of temp channels (bounded concurrency, rate-limit aware)
 # ---------------------------
-@tasks.loop(minutes=1.0)
-async def keepalive_loop_task():
+PURGE_CONCURRENCY = int(os.environ.get("PURGE_CONCURRENCY", 4))
+PURGE_MAX_RETRIES = 3
+PURGE_PROGRESS_SECONDS = 2.0
+
+
+def select_temp_channels(guild: discord.Guild, owner_id: Optional[int] = None, category_id: Optional[int] = None,
+                         idle_seconds: Optional[float] = None, kind: Optional[str] = None) -> List[int]:
     """
-    Tourne toutes les minutes et vérifie si des messages keepalive doivent être envoyés.
-    La configuration se trouve dans DATA['keepalive_config'].
+    Temp channels of a guild matching every given filter, oldest first.
     """
-    try:
-        cfg_map = DATA.get("keepalive_config", {})
-        now = time.time()
-        for gid_str, cfg in list(cfg_map.items()):
-            try:
-                channel_id = cfg.get("channel_id")
-                interval = int(cfg.get("interval_minutes", 1))
-                message = cfg.get("message", "🔄 Keepalive")
-                last_sent = float(cfg.get("last_sent", 0))
-                if now - last_sent >= interval * 60:
-                    # envoyer
-                    channel = bot.get_channel(int(channel_id))
-                    if channel:
-                        await channel.send(message)
-                        cfg["last_sent"] = now
-                        save_data(DATA)
-            except Exception:
-                # ne pas interrompre la boucle pour une erreur d'un serveur
-                print("Erreur keepalive pour guild", gid_str, traceback.format_exc())
-    except Exception:
-        print("Erreur dans keepalive_loop_task:", traceback.format_exc())
+    now = time.time()
+    selected = []
+    for rec in TEMP_REGISTRY.oldest(guild.id):
+        if owner_id is not None and rec.owner_id != owner_id:
+            continue
+        if idle_seconds is not None and now - rec.last_active < idle_seconds:
+            continue
+        channel = guild.get_channel(rec.channel_id)
+        if kind is not None:
+            rec_kind = rec.kind or (("voice" if isinstance(channel, discord.VoiceChannel) else "text") if channel else None)
+            if rec_kind != kind:
+                continue
+        if category_id is not None and (channel is None or channel.category_id != category_id):
+            continue
+        selected.append(rec.channel_id)
+    return selected
+
+
+async def _purge_one(guild: discord.Guild, channel_id: int) -> str:
+    """
+    Delete one channel: "deleted", "missing" (already gone) or "failed".
+    discord.py already waits on per-route rate limits; a 429 that still surfaces or a 5xx is retried with backoff.
+    """
+    channel = guild.get_channel(channel_id)
+    if channel is None:
+        return "missing"
+    for attempt in range(PURGE_MAX_RETRIES + 1):
+        try:
+            await channel.delete(reason="Temporary channel purge")
+            return "deleted"
+        except discord.NotFound:
+            return "missing"
+        except discord.RateLimited as e:
+            delay = e.retry_after
+        except discord.HTTPException as e:
+            if e.status != 429 and e.status < 500:
+                break
+            delay = 2 ** attempt
+        if attempt < PURGE_MAX_RETRIES:
+            await asyncio.sleep(delay)
+    return "failed"
 
 
-# ---------------------------
-# Helper: check admin
-# ---------------------------
-def is_admin_member(member: discord.Member) -> bool:
-    return member.guild_permissions.administrator
+async def purge_temp_channels(guild: discord.Guild, channel_ids: List[int], on_progress=None) -> Dict[str, int]:
+    """
+    Delete the given temp channels with PURGE_CONCURRENCY workers, then drop their records in one batch and save once.
+    on_progress(done, total) (coroutine) is awaited at most every PURGE_PROGRESS_SECONDS.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for cid in channel_ids:
+        queue.put_nowait(cid)
+    result = {"deleted": 0, "missing": 0, "failed": 0}
+    removed: List[int] = []
+    last_report = time.monotonic()
+
+    async def worker() -> None:
+        nonlocal last_report
+        while not queue.empty():
+            cid = queue.get_nowait()
+            # no deletion deadline / recycling must fire while the channel is being purged
+            cancel_empty_channel_deletion(cid, guild.id)
+            RECYCLER.release(cid)
+            outcome = await _purge_one(guild, cid)
+            result[outcome] += 1
+            if outcome != "failed":
+                removed.append(cid)
+            if on_progress is not None and time.monotonic() - last_report >= PURGE_PROGRESS_SECONDS:
+                last_report = time.monotonic()
+                try:
+                    await on_progress(sum(result.values()), len(channel_ids))
+                except Exception:
+                    pass
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(PURGE_CONCURRENCY, len(channel_ids))))))
+    for cid in removed:
+        remove_temp_channel_record(guild.id, cid)
+    # a single save for the whole batch
+    await STORAGE.flush()
+    LOG.info("temp_purge", "Purge des salons temporaires", guild=guild, **result)
+    return result
 
 
 # ---------------------------
-# App commands (slash) registration
-# We'll create an app command tree on bot to offer slash commands.
+# Owner channel recycling (quick leave / rejoin)
 # ---------------------------
-# We'll register commands on on_ready to allow dynamic guild-scoped registration if CLIENT_ID and guild known.
-# Also provide fallback prefix commands for older clients.
+# Un salon vocal issu d'un hosting channel qui se vide est "garé" pendant la fenêtre de recyclage
+# (template["recycle_seconds"], sinon RECYCLE_WINDOW_SECONDS ; 0 = désactivé) au lieu d'être supprimé
+# après EMPTY_CHANNEL_DELETE_SECONDS. Si son propriétaire revient sur le hosting channel pendant ce temps,
+# il est simplement déplacé dedans : ni création ni suppression, et le salon garde ses réglages.
+class ChannelRecycler:
+    def __init__(self):
+        self._parked: Dict[tuple, int] = {}    # (guild_id, owner_id, hosting_id) -> channel_id
+        self._keys: Dict[int, tuple] = {}      # channel_id -> clé ci-dessus
+        self.stats: Dict[str, int] = {"parked": 0, "recycled": 0}
+
+    def __len__(self) -> int:
+        return len(self._parked)
+
+    @staticmethod
+    def window(hosting_id: int) -> float:
+        route = ROUTING.get(hosting_id)
+        if route is None or route[0] != "hosting":
+            return 0.0
+        template = (route[1] or {}).get("template") or {}
+        return max(float(template.get("recycle_seconds", RECYCLE_WINDOW_SECONDS)), 0.0)
+
+    def park(self, channel_id: int) -> float:
+        """
+        Gare un salon vocal qui vient de se vider ; renvoie le délai avant sa suppression.
+        """
+        rec = TEMP_REGISTRY.get(channel_id)
+        if rec is None or rec.origin_id is None or rec.kind != "voice":
+            return EMPTY_CHANNEL_DELETE_SECONDS
+        window = self.window(rec.origin_id)
+        if window <= 0:
+            return EMPTY_CHANNEL_DELETE_SECONDS
+        self.release(channel_id)
+        key = (rec.guild_id, rec.owner_id, rec.origin_id)
+        previous = self._parked.get(key)
+        if previous is not None:
+            # un seul salon garé par propriétaire et hosting : l'ancien garde son échéance mais n'est plus recyclable
+            self._keys.pop(previous, None)
+        self._parked[key] = channel_id
+        self._keys[channel_id] = key
+        self.stats["parked"] += 1
+        return max(window, EMPTY_CHANNEL_DELETE_SECONDS)
+
+    def release(self, channel_id: int) -> None:
+        key = self._keys.pop(channel_id, None)
+        if key is not None and self._parked.get(key) == channel_id:
+            del self._parked[key]
+
+    def take(self, guild: discord.Guild, owner_id: int, hosting_id: int) -> Optional[discord.VoiceChannel]:
+        """
+        Salon garé du propriétaire pour ce hosting channel (sa suppression est annulée), ou None.
+        """
+        channel_id = self._parked.get((guild.id, owner_id, hosting_id))
+        if channel_id is None:
+            return None
+        self.release(channel_id)
+        channel = guild.get_channel(channel_id)
+        if not isinstance(channel, discord.VoiceChannel):
+            return None
+        cancel_empty_channel_deletion(channel_id, guild.id)
+        self.stats["recycled"] += 1
+        TEMP_RECYCLED.inc(str(guild.id))
+        return channel
+
+
+RECYCLER = ChannelRecycler()
 
 
 # ---------------------------
-# Utility functions to manage temp channels with limit 3 per user
+# Idle expiry of temp text channels
 # ---------------------------
-MAX_TEMP_PER_USER = 3
-
+# Les salons texte temporaires n'ont pas de "vide" comme les salons vocaux : ils expirent après
+# template["idle_minutes"] (sinon TEXT_IDLE_MINUTES ; 0 = jamais) sans message d'un membre, suivis dans
+# TEMP_REGISTRY (last_active, mis à jour par on_message). Chaque salon texte est inscrit dans un tas par serveur
+# à sa prochaine échéance (avertissement ou expiration) ; on_message ne touche pas au tas, une entrée dépilée
+# alors que le salon a servi entre-temps est simplement réinscrite. Une seule tâche balaie toutes les
+# IDLE_SWEEP_SECONDS les seules entrées échues, prévient éventuellement le salon (idle_warning_minutes avant)
+# et supprime les salons expirés par lots via purge_temp_channels (suppressions parallèles bornées, un seul flush).
+class TextIdleExpirer:
+    def __init__(self, sweep_seconds: float, batch_size: int):
+        self.sweep_seconds = sweep_seconds
+        self.batch_size = batch_size
+        self._warned: Dict[int, float] = {}    # channel_id -> last_active au moment de l'avertissement
+        self._heaps: Dict[int, List[tuple]] = {}  # guild_id -> tas (échéance, channel_id) ; entrées périmées ignorées au dépilage
+        self._due: Dict[int, float] = {}       # channel_id -> échéance en vigueur
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"sweeps": 0, "warned": 0, "expired": 0}
+
+    def start(self) -> None:
+        """
+        Lance la tâche de balayage (une seule fois, même si on_ready est rappelé).
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    @staticmethod
+    def limits(rec: TempChannelRecord) -> tuple:
+        """
+        (ttl, avertissement) en secondes pour un salon ; le modèle du hosting channel d'origine prime.
+        """
+        template = {}
+        if rec.origin_id is not None:
+            route = ROUTING.get(rec.origin_id)
+            if route is not None and route[0] == "hosting":
+                template = (route[1] or {}).get("template") or {}
+        ttl = max(float(template.get("idle_minutes", TEXT_IDLE_MINUTES)), 0.0) * 60
+        warning = max(float(template.get("idle_warning_minutes", TEXT_IDLE_WARNING_MINUTES)), 0.0) * 60
+        return ttl, min(warning, ttl)
+
+    def _next_due(self, rec: TempChannelRecord) -> Optional[float]:
+        ttl, warning = self.limits(rec)
+        if ttl <= 0:
+            return None
+        if warning > 0 and self._warned.get(rec.channel_id) != rec.last_active:
+            return rec.last_active + ttl - warning
+        return rec.last_active + ttl
+
+    def track(self, rec: Optional[TempChannelRecord]) -> None:
+        """
+        (Ré)inscrit un salon texte à sa prochaine échéance ; sans effet pour un salon vocal ou sans expiration.
+        """
+        if rec is None or rec.kind != "text":
+            return
+        due = self._next_due(rec)
+        if due is None:
+            self._due.pop(rec.channel_id, None)
+            return
+        self._due[rec.channel_id] = due
+        heapq.heappush(self._heaps.setdefault(rec.guild_id, []), (due, rec.channel_id))
+
+    def retrack(self, hosting_id: int) -> None:
+        """
+        Le modèle d'un hosting channel a changé (ou il a disparu) : recalcule l'échéance de ses salons.
+        """
+        for cid in TEMP_REGISTRY.from_origin(hosting_id):
+            self.track(TEMP_REGISTRY.get(cid))
+
+    def forget(self, channel_id: int) -> None:
+        # l'entrée du tas devient périmée
+        self._due.pop(channel_id, None)
+        self._warned.pop(channel_id, None)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(self.sweep_seconds)
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                LOG.error("idle_sweep_error", "Erreur dans l'expiration des salons texte")
 
-def get_user_temp_count(guild_id: int, user_id: int) -> int:
-    gid = str(guild_id)
-    uid = str(user_id)
-    return len(user_temp_index.get(gid, {}).get(uid, []))
+    async def sweep(self) -> None:
+        self.stats["sweeps"] += 1
+        now = time.time()
+        # seules les guilds ayant une échéance armée sont visitées
+        for gid, heap in list(self._heaps.items()):
+            if not heap or heap[0][0] > now:
+                continue
+            guild = bot.get_guild(gid)
+            if guild is not None:
+                await self.sweep_guild(guild)
+        # tas encombrés d'entrées périmées (salons réinscrits ou supprimés) : reconstruits depuis _due
+        if sum(len(heap) for heap in self._heaps.values()) > 2 * len(self._due) + 64:
+            self._compact()
+
+    def _compact(self) -> None:
+        heaps: Dict[int, List[tuple]] = {}
+        for cid, due in self._due.items():
+            rec = TEMP_REGISTRY.get(cid)
+            if rec is not None:
+                heaps.setdefault(rec.guild_id, []).append((due, cid))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+        self._heaps = heaps
+
+    async def sweep_guild(self, guild: discord.Guild) -> None:
+        now = time.time()
+        expired: List[int] = []
+        warn: List[tuple] = []
+        heap = self._heaps.get(guild.id)
+        if heap is None:
+            return
+        # seules les entrées échues sont visitées ; le reste éventuel part au balayage suivant
+        while heap and heap[0][0] <= now and len(expired) < self.batch_size:
+            due, cid = heapq.heappop(heap)
+            if self._due.get(cid) != due:
+                continue
+            del self._due[cid]
+            rec = TEMP_REGISTRY.get(cid)
+            if rec is None or rec.kind != "text":
+                continue
+            ttl, warning = self.limits(rec)
+            if ttl <= 0:
+                continue
+            idle = now - rec.last_active
+            if idle >= ttl:
+                expired.append(cid)
+                continue
+            if warning > 0 and idle >= ttl - warning and self._warned.get(cid) != rec.last_active:
+                warn.append((rec, ttl - idle))
+                self._warned[cid] = rec.last_active
+            # avertissement envoyé ou activité depuis l'inscription : prochaine échéance
+            self.track(rec)
+        if not heap:
+            self._heaps.pop(guild.id, None)
+        if warn:
+            await asyncio.gather(*(self._warn(guild, rec, remaining) for rec, remaining in warn))
+        if expired:
+            result = await purge_temp_channels(guild, expired)
+            self.stats["expired"] += result["deleted"] + result["missing"]
+            for cid in expired:
+                # suppression échouée : le salon est encore là, il repasse au prochain balayage
+                self.track(TEMP_REGISTRY.get(cid))
+
+    async def _warn(self, guild: discord.Guild, rec: TempChannelRecord, remaining: float) -> None:
+        channel = guild.get_channel(rec.channel_id)
+        if channel is None:
+            return
+        try:
+            await channel.send(tr(DATA, guild.id, rec.owner_id, channel.id, "idle_warning", minutes=max(int(math.ceil(remaining / 60)), 1)))
+            self.stats["warned"] += 1
+        except Exception:
+            LOG.error("idle_warning_error", "Erreur lors de l'avertissement d'inactivité", guild=guild, user=rec.owner_id, channel=rec.channel_id)
 
 
-def add_temp_channel_record(guild_id: int, channel_id: int, owner_id: int) -> None:
-    gid = str(guild_id)
-    cid = str(channel_id)
-    oid = int(owner_id)
-    # DATA update
-    DATA.setdefault("temp_channels", {})
-    DATA["temp_channels"].setdefault(gid, {})
-    DATA["temp_channels"][gid][cid] = oid
-    save_data(DATA)
-    # index update
-    user_temp_index.setdefault(gid, {})
-    user_temp_index[gid].setdefault(str(oid), [])
-    if cid not in user_temp_index[gid][str(oid)]:
-        user_temp_index[gid][str(oid)].append(cid)
+IDLE_EXPIRER = TextIdleExpirer(IDLE_SWEEP_SECONDS, IDLE_SWEEP_BATCH)
 
 
-def remove_temp_channel_record(guild_id: int, channel_id: int) -> None:
-    gid = str(guild_id)
-    cid = str(channel_id)
-    tcs = DATA.get("temp_channels", {}).get(gid, {})
-    owner_id = tcs.get(cid)
-    if owner_id is not None:
-        # remove from DATA
+# ---------------------------
+# On-demand profiling (/perf_profile)
+# ---------------------------
+# cpu   : un thread échantillonne la pile du thread de la boucle toutes les PROFILE_INTERVAL_MS
+#         (sys._current_frames, aucun hook sur le code profilé) ; rapport = fonctions les plus présentes
+#         (self / total), brut = piles repliées (format "folded" des flame graphs).
+# alloc : tracemalloc entre deux instantanés ; rapport = lignes dont la mémoire allouée a le plus augmenté,
+#         brut = instantané final (tracemalloc.Snapshot.load).
+# Une seule session à la fois, durée bornée à PROFILE_MAX_SECONDS ; fichiers bruts dans PROFILE_DIR.
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_SECONDS = int(os.environ.get("PROFILE_MAX_SECONDS", 120))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_DEPTH = 64
+PROFILE_TRACEMALLOC_FRAMES = 10
+ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+class PerfProfiler:
+    def __init__(self):
+        self.busy = False
+
+    @staticmethod
+    def _where(filename: str, lineno: int, name: str) -> str:
+        return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+    def _sample(self, thread_id: int, stop: threading.Event, interval: float, result: Dict[str, Any]) -> None:
+        own: Dict[tuple, int] = {}
+        total: Dict[tuple, int] = {}
+        folded: Dict[str, int] = {}
+        samples = idle = 0
+        while not stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            samples += 1
+            if stack[0][2] == "select" and "selectors" in stack[0][0]:
+                # boucle en attente d'événements : hors des tableaux de fonctions
+                idle += 1
+                continue
+            own[stack[0]] = own.get(stack[0], 0) + 1
+            for func in set(stack):
+                total[func] = total.get(func, 0) + 1
+            key = ";".join(self._where(*func) for func in reversed(stack))
+            folded[key] = folded.get(key, 0) + 1
+        result.update(samples=samples, idle=idle, own=own, total=total, folded=folded)
+
+    async def _cpu(self, seconds: float, top: int, raw_path: str) -> str:
+        stop = threading.Event()
+        result: Dict[str, Any] = {}
+        sampler = threading.Thread(target=self._sample, name="perf-profile", daemon=True,
+                                   args=(threading.get_ident(), stop, PROFILE_INTERVAL_MS / 1000.0, result))
+        sampler.start()
         try:
-            del DATA["temp_channels"][gid][cid]
-        except Exception:
-            pass
-        save_data(DATA)
-        # remove from index
-        uid = str(owner_id)
-        if gid in user_temp_index and uid in user_temp_index[gid]:
-            user_temp_index[gid][uid] = [x for x in user_temp_index[gid][uid] if x != cid]
-            if not user_temp_index[gid][uid]:
-                del user_temp_index[gid][uid]
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+        samples = max(result["samples"], 1)
+        busy = max(result["samples"] - result["idle"], 1)
+        lines = [f"CPU profile: {seconds:g} s, {result['samples']} samples (every {PROFILE_INTERVAL_MS:g} ms), "
+                 f"event loop idle {result['idle'] * 100.0 / samples:.1f} %", "",
+                 "Busy samples only (% of the time the loop was running code):", "  self%  total%  function"]
+        samples = busy
+        # la mécanique de la boucle asyncio est dans toutes les piles : elle n'apprend rien
+        hot = [(func, count) for func, count in result["total"].items() if not func[0].startswith(ASYNCIO_DIR) or func in result["own"]]
+        for func, count in sorted(hot, key=lambda kv: -kv[1])[:top]:
+            lines.append(f"{result['own'].get(func, 0) * 100.0 / samples:7.1f} {count * 100.0 / samples:7.1f}  {self._where(*func)}")
+        lines += ["", "Top self time:"]
+        for func, count in sorted(result["own"].items(), key=lambda kv: -kv[1])[:top]:
+            lines.append(f"{count * 100.0 / samples:7.1f}  {self._where(*func)}")
+        folded = "".join(f"{stack} {count}\n" for stack, count in result["folded"].items())
+        await asyncio.to_thread(self._write, raw_path, folded)
+        return "\n".join(lines) + "\n"
+
+    async def _alloc(self, seconds: float, top: int, raw_path: str) -> str:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+        filters = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>"))
+        before, after = before.filter_traces(filters), after.filter_traces(filters)
+        current = sum(stat.size for stat in after.statistics("filename"))
+        lines = [f"Allocation profile: {seconds:g} s, {current / 1024:.1f} KiB traced at the end", "",
+                 "Top growth by line:", "      size diff     blocks  site"]
+        for stat in after.compare_to(before, "lineno")[:top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size_diff / 1024:+12.1f} KiB {stat.count_diff:+9d}  {frame.filename}:{frame.lineno}")
+        lines += ["", "Top live allocations by line:"]
+        for stat in after.statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:12.1f} KiB {stat.count:10d}  {frame.filename}:{frame.lineno}")
+        await asyncio.to_thread(after.dump, raw_path)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write(path: str, text: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    async def run(self, mode: str, seconds: float, top: int) -> Optional[tuple]:
+        """
+        Profile la boucle pendant seconds (borné) ; retourne (rapport texte, chemin du rapport, chemin du brut),
+        ou None si une session est déjà en cours.
+        """
+        if self.busy:
+            return None
+        self.busy = True
+        try:
+            seconds = max(1.0, min(float(seconds), PROFILE_MAX_SECONDS))
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            base = os.path.join(PROFILE_DIR, f"{mode}-{time.strftime('%Y%m%d-%H%M%S')}")
+            if mode == "alloc":
+                raw_path = base + ".tracemalloc"
+                report = await self._alloc(seconds, top, raw_path)
+            else:
+                raw_path = base + ".folded"
+                report = await self._cpu(seconds, top, raw_path)
+            await asyncio.to_thread(self._write, base + ".txt", report)
+            LOG.info("perf_profile", f"Profil {mode} écrit dans {raw_path}", mode=mode, seconds=seconds)
+            return report, base + ".txt", raw_path
+        finally:
+            self.busy = False
 
 
-def list_user_temp_channels(guild_id: int, user_id: int) -> List[int]:
-    gid = str(guild_id)
-    uid = str(user_id)
-    return [int(x) for x in user_temp_index.get(gid, {}).get(uid, [])]
+PROFILER = PerfProfiler()
 
 
 # ---------------------------
@@ -533,7 +3846,7 @@ async def send_tr_msg(ctx_or_interaction, key: str, **kwargs):
             else:
                 await ctx_or_interaction.send(key)
         except Exception:
-            print("Erreur en envoyant le message traduit.")
+            LOG.error("send_tr_error", "Erreur en envoyant le message traduit.", key=key)
 
 
 # ---------- Slash command: setup_hosting ----------
@@ -541,13 +3854,26 @@ async def send_tr_msg(ctx_or_interaction, key: str, **kwargs):
 @app_commands.describe(
     channel="The channel to use for hosting",
     channel_type="Type of channels to create (text or voice)",
-    temp_category="Category for temporary channels (optional)"
+    temp_category="Category for temporary channels (optional)",
+    name_template="Name of created channels, {user} = member name (optional)",
+    user_limit="Voice channels: max members, 0 = unlimited (optional)",
+    bitrate="Voice channels: bitrate in bps (optional)",
+    private="Hide created voice channels from @everyone (optional)",
+    pool_size="Voice channels: max pre-created idle channels for instant joins, 0 = off (optional)",
+    recycle_seconds="Voice channels: seconds an emptied channel is kept for its owner to rejoin, 0 = off (optional)",
+    idle_minutes="Text channels: minutes without messages before deletion, 0 = never (optional)",
+    idle_warning_minutes="Text channels: warn this many minutes before an idle deletion, 0 = off (optional)"
 )
 @app_commands.default_permissions(administrator=True)
-async def slash_setup_hosting(interaction: discord.Interaction, channel: discord.abc.GuildChannel, channel_type: str, temp_category: Optional[discord.CategoryChannel] = None):
+async def slash_setup_hosting(interaction: discord.Interaction, channel: discord.abc.GuildChannel, channel_type: str, temp_category: Optional[discord.CategoryChannel] = None,
+                              name_template: Optional[str] = None, user_limit: Optional[int] = None, bitrate: Optional[int] = None, private: Optional[bool] = None,
+                              pool_size: Optional[int] = None, recycle_seconds: Optional[int] = None, idle_minutes: Optional[int] = None,
+                              idle_warning_minutes: Optional[int] = None):
     """
     Configurer un channel d'hébergement via slash command.
     channel_type: 'text' ou 'voice'
+    Les options name_template / user_limit / bitrate / private / pool_size / recycle_seconds / idle_minutes / idle_warning_minutes
+    forment le modèle des canaux créés.
     """
     try:
         if channel_type.lower() not in ("text", "voice"):
@@ -557,16 +3883,21 @@ async def slash_setup_hosting(interaction: discord.Interaction, channel: discord
         guild_id = interaction.guild.id
         ensure_guild_maps(guild_id)
         gid = str(guild_id)
-        DATA["hosting_channels"].setdefault(gid, {})
-        DATA["hosting_channels"][gid][str(channel.id)] = {
+        hosting_info = {
             "type": channel_type.lower(),
             "temp_category_id": temp_category.id if temp_category else (DEFAULT_TEMP_CATEGORY_ID if DEFAULT_TEMP_CATEGORY_ID else None),
             "owner_id": interaction.user.id
         }
-        save_data(DATA)
+        template = {k: v for k, v in (("name", name_template), ("user_limit", user_limit), ("bitrate", bitrate), ("private", private), ("pool_size", pool_size),
+                                      ("recycle_seconds", recycle_seconds), ("idle_minutes", idle_minutes),
+                                      ("idle_warning_minutes", idle_warning_minutes)) if v is not None}
+        if template:
+            hosting_info["template"] = template
+        set_entry("hosting_channels", str(channel.id), hosting_info, guild_id=gid)
+        VOICE_POOL.warm(interaction.guild)
         await send_tr_msg(interaction, "setup_hosting_success")
     except Exception as e:
-        print("setup_hosting error:", e, traceback.format_exc())
+        LOG.error("setup_hosting_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         await interaction.response.send_message(f"Erreur: {e}")
 
 
@@ -577,7 +3908,7 @@ async def slash_create_temp(interaction: discord.Interaction, name: str, channel
     """
     Create a temp channel by slash. This is user command to directly create a personal temporary channel.
     channel_type: 'text' or 'voice'
-    Enforce max 3 per user across the guild.
+    Enforce the guild's per-user quota (3 by default) and the admission control.
     """
     await interaction.response.defer(ephemeral=True)
     try:
@@ -588,46 +3919,26 @@ async def slash_create_temp(interaction: discord.Interaction, name: str, channel
 
         guild = interaction.guild
         guild_id = guild.id
-        # Count existing
-        cnt = get_user_temp_count(guild_id, interaction.user.id)
-        if cnt >= MAX_TEMP_PER_USER:
-            await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "already_max_temp"))
+        quota = get_temp_quota(guild_id)
+        # Reserve a quota slot (released once the channel is recorded, or if creation fails)
+        refused = ADMISSION.reserve(guild_id, interaction.user.id)
+        if refused:
+            await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, ADMISSION_MESSAGES[refused], max=quota))
             return
 
-        # Determine category (try server hosting default if any, else DEFAULT_TEMP_CATEGORY_ID)
-        cat = None
-        # Try to get a hosting entry for the current channel
-        hosting_map = DATA.get("hosting_channels", {}).get(str(guild_id), {})
-        # choose any hosting channel that has a temp_category defined
-        temp_cat_id = None
-        for _, info in hosting_map.items():
-            if info.get("temp_category_id"):
-                temp_cat_id = info.get("temp_category_id")
-                break
-        if temp_cat_id:
-            cat = guild.get_channel(int(temp_cat_id))
-        elif DEFAULT_TEMP_CATEGORY_ID:
-            cat = guild.get_channel(int(DEFAULT_TEMP_CATEGORY_ID))
-
+        # Category: server hosting default if any, else DEFAULT_TEMP_CATEGORY_ID (channel created in one call)
+        try:
+            new_channel = await provision_temp_channel(guild, interaction.user, channel_type, name=name)
+        finally:
+            ADMISSION.release(guild_id, interaction.user.id)
+        current_count = get_user_temp_count(guild_id, interaction.user.id)
         if channel_type == "voice":
-            # create voice channel
-            new_channel = await guild.create_voice_channel(name, category=cat)
-            add_temp_channel_record(guild_id, new_channel.id, interaction.user.id)
-            current_count = get_user_temp_count(guild_id, interaction.user.id)
-            await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "created_temp_voice", channel=new_channel.mention, count=current_count))
-            # schedule auto-clean: we'll create a background wait task to delete channel when empty for a period
-            bot.loop.create_task(_auto_delete_when_empty(new_channel, guild_id))
+            await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "created_temp_voice", channel=new_channel.mention, count=current_count, max=quota))
         else:
-            new_channel = await guild.create_text_channel(name, category=cat)
-            # restrict default role view then allow owner
-            await new_channel.set_permissions(guild.default_role, view_channel=False)
-            await new_channel.set_permissions(interaction.user, view_channel=True, send_messages=True)
-            add_temp_channel_record(guild_id, new_channel.id, interaction.user.id)
-            current_count = get_user_temp_count(guild_id, interaction.user.id)
-            await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "created_temp_text", channel=new_channel.mention, count=current_count))
+            await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "created_temp_text", channel=new_channel.mention, count=current_count, max=quota))
             # no auto-delete schedule for text by join/leave; we can schedule TTL or deletion when owner uses delete_temp
     except Exception as e:
-        print("create_temp slash error:", e, traceback.format_exc())
+        LOG.error("create_temp_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send(f"Erreur lors de la création: {e}")
         except Exception:
@@ -658,7 +3969,7 @@ async def slash_delete_temp(interaction: discord.Interaction, channel: discord.a
         remove_temp_channel_record(guild_id, channel.id)
         await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "deleted_temp", channel=channel.name))
     except Exception as e:
-        print("delete_temp slash error:", e, traceback.format_exc())
+        LOG.error("delete_temp_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send(f"Erreur: {e}")
         except Exception:
@@ -685,7 +3996,7 @@ async def slash_list_temp(interaction: discord.Interaction):
                 parts.append(f"- {cid} (non trouvé)")
         await interaction.followup.send("📋 Vos canaux temporaires :\n" + "\n".join(parts))
     except Exception as e:
-        print("list_temp slash error:", e, traceback.format_exc())
+        LOG.error("list_temp_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send(f"Erreur: {e}")
         except Exception:
@@ -694,21 +4005,15 @@ async def slash_list_temp(interaction: discord.Interaction):
 
 # ---------- Slash commands: locale management ----------
 @bot.tree.command(name="set_lang_user", description="Set your language preference")
-@app_commands.choices(lang_code=[
-    app_commands.Choice(name="fr", value="fr"),
-    app_commands.Choice(name="en", value="en"),
-    app_commands.Choice(name="ar", value="ar")
-])
+@app_commands.choices(lang_code=LANG_CHOICES)
 async def slash_set_lang_user(interaction: discord.Interaction, lang_code: app_commands.Choice[str]):
     await interaction.response.defer(ephemeral=True)
     try:
         code = lang_code.value
-        DATA.setdefault("user_lang", {})[str(interaction.user.id)] = code
-        save_data(DATA)
-        names = {"en": "English", "fr": "Français", "ar": "العربية"}
-        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "lang_set_user", lang=names.get(code, code)))
+        set_entry("user_lang", str(interaction.user.id), code)
+        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "lang_set_user", lang=CATALOG.display_name(code)))
     except Exception as e:
-        print("set_lang_user error:", e, traceback.format_exc())
+        LOG.error("set_lang_user_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors du changement de langue.")
         except Exception:
@@ -717,21 +4022,15 @@ async def slash_set_lang_user(interaction: discord.Interaction, lang_code: app_c
 
 @bot.tree.command(name="set_lang_channel", description="Set channel language preference (Admin only)")
 @app_commands.default_permissions(administrator=True)
-@app_commands.choices(lang_code=[
-    app_commands.Choice(name="fr", value="fr"),
-    app_commands.Choice(name="en", value="en"),
-    app_commands.Choice(name="ar", value="ar")
-])
+@app_commands.choices(lang_code=LANG_CHOICES)
 async def slash_set_lang_channel(interaction: discord.Interaction, lang_code: app_commands.Choice[str]):
     await interaction.response.defer(ephemeral=True)
     try:
         code = lang_code.value
-        DATA.setdefault("channel_lang", {})[str(interaction.channel.id)] = code
-        save_data(DATA)
-        names = {"en": "English", "fr": "Français", "ar": "العربية"}
-        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "lang_set_channel", lang=names.get(code, code)))
+        set_entry("channel_lang", str(interaction.channel.id), code, home_guild=interaction.guild.id)
+        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "lang_set_channel", lang=CATALOG.display_name(code)))
     except Exception as e:
-        print("set_lang_channel error:", e, traceback.format_exc())
+        LOG.error("set_lang_channel_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors du changement de langue du canal.")
         except Exception:
@@ -740,21 +4039,15 @@ async def slash_set_lang_channel(interaction: discord.Interaction, lang_code: ap
 
 @bot.tree.command(name="set_lang_server", description="Set server language preference (Admin only)")
 @app_commands.default_permissions(administrator=True)
-@app_commands.choices(lang_code=[
-    app_commands.Choice(name="fr", value="fr"),
-    app_commands.Choice(name="en", value="en"),
-    app_commands.Choice(name="ar", value="ar")
-])
+@app_commands.choices(lang_code=LANG_CHOICES)
 async def slash_set_lang_server(interaction: discord.Interaction, lang_code: app_commands.Choice[str]):
     await interaction.response.defer(ephemeral=True)
     try:
         code = lang_code.value
-        DATA.setdefault("server_lang", {})[str(interaction.guild.id)] = code
-        save_data(DATA)
-        names = {"en": "English", "fr": "Français", "ar": "العربية"}
-        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "lang_set_server", lang=names.get(code, code)))
+        set_entry("server_lang", str(interaction.guild.id), code)
+        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "lang_set_server", lang=CATALOG.display_name(code)))
     except Exception as e:
-        print("set_lang_server error:", e, traceback.format_exc())
+        LOG.error("set_lang_server_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors du changement de langue du serveur.")
         except Exception:
@@ -765,11 +4058,10 @@ async def slash_set_lang_server(interaction: discord.Interaction, lang_code: app
 async def slash_clear_lang_user(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
     try:
-        DATA.get("user_lang", {}).pop(str(interaction.user.id), None)
-        save_data(DATA)
+        set_entry("user_lang", str(interaction.user.id), None)
         await interaction.followup.send("✅ Langue utilisateur réinitialisée.")
     except Exception as e:
-        print("clear_lang_user error:", e, traceback.format_exc())
+        LOG.error("clear_lang_user_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors de la réinitialisation.")
         except Exception:
@@ -781,11 +4073,10 @@ async def slash_clear_lang_user(interaction: discord.Interaction):
 async def slash_clear_lang_channel(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
     try:
-        DATA.get("channel_lang", {}).pop(str(interaction.channel.id), None)
-        save_data(DATA)
+        set_entry("channel_lang", str(interaction.channel.id), None, home_guild=interaction.guild.id)
         await interaction.followup.send("✅ Langue du canal réinitialisée.")
     except Exception as e:
-        print("clear_lang_channel error:", e, traceback.format_exc())
+        LOG.error("clear_lang_channel_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors de la réinitialisation.")
         except Exception:
@@ -797,11 +4088,10 @@ async def slash_clear_lang_channel(interaction: discord.Interaction):
 async def slash_clear_lang_server(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
     try:
-        DATA.get("server_lang", {}).pop(str(interaction.guild.id), None)
-        save_data(DATA)
+        set_entry("server_lang", str(interaction.guild.id), None)
         await interaction.followup.send("✅ Langue du serveur réinitialisée.")
     except Exception as e:
-        print("clear_lang_server error:", e, traceback.format_exc())
+        LOG.error("clear_lang_server_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors de la réinitialisation.")
         except Exception:
@@ -818,13 +4108,13 @@ async def slash_remove_hosting(interaction: discord.Interaction, channel: discor
         guild_id = interaction.guild.id
         gid = str(guild_id)
         if gid in DATA.get("hosting_channels", {}) and str(channel.id) in DATA["hosting_channels"].get(gid, {}):
-            del DATA["hosting_channels"][gid][str(channel.id)]
-            save_data(DATA)
+            set_entry("hosting_channels", str(channel.id), None, guild_id=gid)
+            await VOICE_POOL.drain(interaction.guild, channel.id)
             await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "hosting_removed"))
         else:
             await interaction.followup.send(tr(DATA, guild_id, interaction.user.id, interaction.channel.id, "hosting_not_found"))
     except Exception as e:
-        print("remove_hosting error:", e, traceback.format_exc())
+        LOG.error("remove_hosting_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors de la suppression de l'hébergement.")
         except Exception:
@@ -848,13 +4138,115 @@ async def slash_list_hosting(interaction: discord.Interaction):
             lines.append(f"- {ch.mention if ch else 'Unknown'} (type: {info.get('type')}, owner: {owner.display_name if owner else 'Unknown'})")
         await interaction.followup.send("\n".join(lines))
     except Exception as e:
-        print("list_hosting error:", e, traceback.format_exc())
+        LOG.error("list_hosting_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors de la liste des hébergements.")
         except Exception:
             pass
 
 
+# ---------- Slash admin command: set_temp_quota ----------
+@bot.tree.command(name="set_temp_quota", description="Set how many temporary channels each member can have (Admin only)")
+@app_commands.describe(max_per_user="Temporary channels per member (leave empty to restore the default)")
+@app_commands.default_permissions(administrator=True)
+async def slash_set_temp_quota(interaction: discord.Interaction, max_per_user: Optional[app_commands.Range[int, 1, 50]] = None):
+    """
+    Quota de canaux temporaires par membre pour ce serveur (MAX_TEMP_PER_USER par défaut).
+    """
+    try:
+        if not is_admin_member(interaction.user):
+            await send_tr_msg(interaction, "no_permission")
+            return
+        gid = str(interaction.guild.id)
+        set_entry("guild_settings", gid, {"max_temp_per_user": max_per_user} if max_per_user is not None else None)
+        await send_tr_msg(interaction, "temp_quota_set", max=get_temp_quota(interaction.guild.id))
+    except Exception as e:
+        LOG.error("set_temp_quota_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
+        await interaction.response.send_message(f"Erreur: {e}")
+
+
+# ---------- Slash admin command: purge_temp ----------
+@bot.tree.command(name="purge_temp", description="Delete temporary channels in bulk (Admin only)")
+@app_commands.describe(
+    owner="Only channels owned by this member (optional)",
+    category="Only channels in this category (optional)",
+    idle_minutes="Only channels without activity for at least this many minutes (optional)",
+    channel_type="Only text or voice channels (optional)"
+)
+@app_commands.choices(channel_type=[app_commands.Choice(name="text", value="text"), app_commands.Choice(name="voice", value="voice")])
+@app_commands.default_permissions(administrator=True)
+async def slash_purge_temp(interaction: discord.Interaction, owner: Optional[discord.Member] = None, category: Optional[discord.CategoryChannel] = None,
+                           idle_minutes: Optional[int] = None, channel_type: Optional[app_commands.Choice[str]] = None):
+    """
+    Purge des canaux temporaires du serveur selon les filtres, avec la progression dans la réponse.
+    """
+    await interaction.response.defer(ephemeral=True)
+    try:
+        guild = interaction.guild
+        uid = interaction.user.id
+        cid = interaction.channel.id
+        if not is_admin_member(interaction.user):
+            await interaction.followup.send(tr(DATA, guild.id, uid, cid, "no_permission"))
+            return
+        targets = select_temp_channels(guild, owner_id=owner.id if owner else None, category_id=category.id if category else None,
+                                       idle_seconds=idle_minutes * 60 if idle_minutes is not None else None,
+                                       kind=channel_type.value if channel_type else None)
+        if not targets:
+            await interaction.followup.send(tr(DATA, guild.id, uid, cid, "purge_nothing"))
+            return
+        message = await interaction.followup.send(tr(DATA, guild.id, uid, cid, "purge_progress", done=0, total=len(targets)), wait=True)
+
+        async def report(done: int, total: int) -> None:
+            await message.edit(content=tr(DATA, guild.id, uid, cid, "purge_progress", done=done, total=total))
+
+        result = await purge_temp_channels(guild, targets, on_progress=report)
+        await message.edit(content=tr(DATA, guild.id, uid, cid, "purge_done", **result))
+    except Exception as e:
+        LOG.error("purge_temp_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
+        try:
+            await interaction.followup.send(f"Erreur: {e}")
+        except Exception:
+            pass
+
+
+# ---------- Slash admin command: perf_profile ----------
+@bot.tree.command(name="perf_profile", description="Profile the running bot's CPU or memory allocations (Admin only)")
+@app_commands.describe(
+    seconds="Profiling window in seconds (capped)",
+    mode="cpu: sampled hot functions on the event loop, alloc: allocation sites (tracemalloc)",
+    top="Number of entries in the report"
+)
+@app_commands.choices(mode=[app_commands.Choice(name="cpu", value="cpu"), app_commands.Choice(name="alloc", value="alloc")])
+@app_commands.default_permissions(administrator=True)
+async def slash_perf_profile(interaction: discord.Interaction, seconds: app_commands.Range[int, 1, PROFILE_MAX_SECONDS] = 30,
+                             mode: Optional[app_commands.Choice[str]] = None, top: app_commands.Range[int, 5, 200] = 30):
+    """
+    Profil à la demande (une session à la fois) : rapport en pièce jointe, fichiers bruts dans PROFILE_DIR.
+    """
+    await interaction.response.defer(ephemeral=True)
+    try:
+        guild_id = interaction.guild.id if interaction.guild else None
+        uid = interaction.user.id
+        cid = interaction.channel.id if interaction.channel else None
+        if not interaction.guild or not is_admin_member(interaction.user):
+            await interaction.followup.send(tr(DATA, guild_id, uid, cid, "no_permission"))
+            return
+        mode_value = mode.value if mode else "cpu"
+        result = await PROFILER.run(mode_value, seconds, top)
+        if result is None:
+            await interaction.followup.send(tr(DATA, guild_id, uid, cid, "profile_busy"))
+            return
+        report, report_path, raw_path = result
+        await interaction.followup.send(tr(DATA, guild_id, uid, cid, "profile_done", mode=mode_value, seconds=min(seconds, PROFILE_MAX_SECONDS), path=raw_path),
+                                        file=discord.File(io.BytesIO(report.encode("utf-8")), filename=os.path.basename(report_path)))
+    except Exception as e:
+        LOG.error("perf_profile_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
+        try:
+            await interaction.followup.send(f"Erreur: {e}")
+        except Exception:
+            pass
+
+
 # ---------- Command: invite (prefix) ----------
 @bot.command(name="invite")
 @commands.has_guild_permissions(manage_channels=True)
@@ -896,7 +4288,7 @@ async def cmd_invite(ctx: commands.Context, member: discord.Member, channel: Opt
     except commands.MissingPermissions:
         await ctx.send(tr(DATA, ctx.guild.id, ctx.author.id, ctx.channel.id, "no_permission"))
     except Exception as e:
-        print("invite command error:", e, traceback.format_exc())
+        LOG.error("invite_error", str(e), guild=ctx.guild, user=ctx.author, channel=ctx.channel)
         await ctx.send(f"Erreur lors de l'invitation: {e}")
 
 
@@ -931,23 +4323,15 @@ async def cmd_change_host(ctx: commands.Context, new_host: discord.Member):
 
         # transfer
         if gid in DATA.get("temp_channels", {}) and str(channel_id) in DATA["temp_channels"][gid]:
-            DATA["temp_channels"][gid][str(channel_id)] = new_host.id
-            # update index
-            if gid in user_temp_index:
-                # remove from old
-                old_owner = str(current_owner_id)
-                if old_owner in user_temp_index[gid]:
-                    user_temp_index[gid][old_owner] = [x for x in user_temp_index[gid][old_owner] if x != str(channel_id)]
-                # add to new
-                user_temp_index[gid].setdefault(str(new_host.id), [])
-                user_temp_index[gid][str(new_host.id)].append(str(channel_id))
+            transfer_temp_channel_record(guild_id, channel_id, new_host.id)
         elif gid in DATA.get("hosting_channels", {}) and str(channel_id) in DATA["hosting_channels"][gid]:
-            DATA["hosting_channels"][gid][str(channel_id)]["owner_id"] = new_host.id
+            hosting_info = dict(DATA["hosting_channels"][gid][str(channel_id)])
+            hosting_info["owner_id"] = new_host.id
+            set_entry("hosting_channels", str(channel_id), hosting_info, guild_id=gid)
 
-        save_data(DATA)
         await ctx.send(tr(DATA, guild_id, ctx.author.id, ctx.channel.id, "change_host_success", new_host=new_host.display_name))
     except Exception as e:
-        print("change_host error:", e, traceback.format_exc())
+        LOG.error("change_host_error", str(e), guild=ctx.guild, user=ctx.author, channel=ctx.channel)
         await ctx.send(f"Erreur: {e}")
 
 
@@ -955,27 +4339,39 @@ async def cmd_change_host(ctx: commands.Context, new_host: discord.Member):
 @bot.tree.command(name="setup_keepalive", description="Set up automatic keepalive messages")
 @app_commands.describe(
     channel="The text channel for keepalive messages",
-    interval_minutes="Interval in minutes between messages",
-    message="The keepalive message to send"
+    interval_minutes="Interval in minutes between messages (optional when interval_seconds is given)",
+    message="The keepalive message to send",
+    interval_seconds="Sub-minute interval in seconds (overrides interval_minutes)"
 )
 @app_commands.default_permissions(administrator=True)
-async def slash_setup_keepalive(interaction: discord.Interaction, channel: discord.TextChannel, interval_minutes: int, message: str = "🔄 Keepalive"):
+async def slash_setup_keepalive(interaction: discord.Interaction, channel: discord.TextChannel, interval_minutes: Optional[int] = None, message: str = "🔄 Keepalive", interval_seconds: Optional[int] = None):
     await interaction.response.defer(ephemeral=True)
     try:
-        if interval_minutes < 1:
+        if interval_seconds is not None:
+            if interval_seconds < KEEPALIVE_MIN_INTERVAL_SECONDS:
+                await interaction.followup.send(f"The interval must be at least {KEEPALIVE_MIN_INTERVAL_SECONDS} seconds.")
+                return
+            if interval_minutes is None:
+                # colonne toujours renseignée (stockage sqlite, anciennes versions) : minute arrondie au-dessus
+                interval_minutes = -(-interval_seconds // 60)
+        elif interval_minutes is None or interval_minutes < 1:
             await interaction.followup.send("The interval must be at least 1 minute.")
             return
         gid = str(interaction.guild.id)
-        DATA.setdefault("keepalive_config", {})[gid] = {
+        cfg = {
             "channel_id": channel.id,
-            "interval_minutes": interval_minutes,
+            "interval_minutes": max(interval_minutes, 1),
             "message": message,
             "last_sent": 0
         }
-        save_data(DATA)
-        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "keepalive_set", channel=channel.mention, interval=interval_minutes))
+        if interval_seconds is not None:
+            cfg["interval_seconds"] = interval_seconds
+        set_entry("keepalive_config", gid, cfg)
+        KEEPALIVE_ENGINE.update(gid)
+        interval_display = keepalive_interval_display(cfg)
+        await interaction.followup.send(tr(DATA, interaction.guild.id, interaction.user.id, interaction.channel.id, "keepalive_set", channel=channel.mention, interval=interval_display))
     except Exception as e:
-        print("setup_keepalive error:", e, traceback.format_exc())
+        LOG.error("setup_keepalive_error", str(e), guild=interaction.guild_id, user=interaction.user, channel=interaction.channel_id)
         try:
             await interaction.followup.send("Erreur lors de la configuration keepalive.")
         except Exception:
@@ -987,8 +4383,8 @@ async def slash_setup_keepalive(interaction: discord.Interaction, channel: disco
 async def cmd_remove_keepalive(ctx: commands.Context):
     gid = str(ctx.guild.id)
     if gid in DATA.get("keepalive_config", {}):
-        del DATA["keepalive_config"][gid]
-        save_data(DATA)
+        set_entry("keepalive_config", gid, None)
+        KEEPALIVE_ENGINE.remove(gid)
         await ctx.send(tr(DATA, ctx.guild.id, ctx.author.id, ctx.channel.id, "keepalive_removed"))
     else:
         await ctx.send("Aucune configuration keepalive trouvée.")
@@ -1002,93 +4398,97 @@ async def cmd_keepalive_status(ctx: commands.Context):
         return
     cfg = DATA["keepalive_config"][gid]
     channel = bot.get_channel(cfg["channel_id"])
-    await ctx.send(tr(DATA, ctx.guild.id, ctx.author.id, ctx.channel.id, "keepalive_status", channel=channel.mention if channel else "Channel non trouvé", interval=cfg["interval_minutes"], message=cfg["message"]))
+    await ctx.send(tr(DATA, ctx.guild.id, ctx.author.id, ctx.channel.id, "keepalive_status", channel=channel.mention if channel else "Channel non trouvé", interval=keepalive_interval_display(cfg), message=cfg["message"]))
 
 
 # ---------- Voice state / temp channel auto-create when joining hosting ----------
 @bot.event
+@timed_handler
 async def on_voice_state_update(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
     """
     - Si l'utilisateur rejoint un channel configuré en hosting (type voice), on crée un channel temporaire et le déplace dedans.
-    - Si l'utilisateur quitte un channel temporaire et le laisse vide, on supprime le channel.
+    - Si l'utilisateur quitte un channel temporaire et le laisse vide, on supprime le channel
+      (après la fenêtre de recyclage : son propriétaire qui revient sur le hosting channel y est replacé).
     - Si changement de channel, on vérifie l'ancien pour suppression.
     """
     try:
         guild = member.guild
         if not guild:
             return
-        gid = str(guild.id)
+        if before.channel == after.channel:
+            # mute / deafen / stream updates: nothing to route
+            return
+        after_route, before_route = await route_lookup(guild.id, after.channel.id if after.channel else None,
+                                                       before.channel.id if before.channel else None)
+        if after_route is None and before_route is None:
+            return
+        TRACER.annotate(guild=guild.id, user=member.id)
+
+        # ----- LEAVING (or switching away from) a temp channel -----
+        # If the channel is now empty => park it for its owner and arm its deletion deadline (a rejoin before it expires cancels it).
+        # Handled first so that an owner switching straight to the hosting channel gets their channel back.
+        if before_route is not None and before_route[0] == "temp":
+            TEMP_REGISTRY.touch(before.channel.id)
+            if len(before.channel.members) == 0:
+                schedule_empty_channel_deletion(before.channel.id, guild.id, delay=RECYCLER.park(before.channel.id))
+
+        # ----- JOINING a temp channel: cancel its pending deletion -----
+        if after_route is not None and after_route[0] == "temp":
+            cancel_empty_channel_deletion(after.channel.id, guild.id)
+            RECYCLER.release(after.channel.id)
+            TEMP_REGISTRY.touch(after.channel.id)
 
         # ----- JOINING a hosting channel -----
-        if after.channel and gid in DATA.get("hosting_channels", {}) and str(after.channel.id) in DATA["hosting_channels"][gid]:
-            hosting_info = DATA["hosting_channels"][gid][str(after.channel.id)]
+        if after_route is not None and after_route[0] == "hosting":
+            hosting_info = after_route[1]
             if hosting_info and hosting_info.get("type") == "voice":
-                # Check user limit
+                # Owner back within the recycle window: move them into their parked channel (no create / delete)
+                recycled = RECYCLER.take(guild, member.id, after.channel.id)
+                if recycled is not None:
+                    try:
+                        await member.move_to(recycled)
+                        LOG.info("temp_voice_recycled", f"Temporary voice channel recycled: {recycled.name}", guild=guild, user=member, channel=recycled)
+                    except Exception:
+                        schedule_empty_channel_deletion(recycled.id, guild.id)
+                    return
+
+                # Check user quota and creation rate (a quota slot is reserved until the channel is recorded)
                 user_id = member.id
-                if get_user_temp_count(guild.id, user_id) >= MAX_TEMP_PER_USER:
+                refused = ADMISSION.reserve(guild.id, user_id, after.channel.id)
+                if refused == "quota":
                     # send DM if possible
                     try:
-                        await member.send(tr(DATA, guild.id, user_id, after.channel.id, "already_max_temp"))
+                        await member.send(tr(DATA, guild.id, user_id, after.channel.id, "already_max_temp", max=get_temp_quota(guild.id)))
                     except Exception:
                         pass
-                    # optionally move back or do nothing
+                if refused:
+                    # rate limited / overloaded: shed silently (no extra REST call)
                     return
 
-                # Create a new voice channel
-                category = None
-                if hosting_info.get("temp_category_id"):
-                    try:
-                        category = guild.get_channel(int(hosting_info["temp_category_id"]))
-                    except Exception:
-                        category = None
-                elif DEFAULT_TEMP_CATEGORY_ID:
-                    category = guild.get_channel(int(DEFAULT_TEMP_CATEGORY_ID))
-                channel_name = f"{member.display_name}'s Channel"
+                # Take a pre-warmed channel if the hosting has a pool (member moved in one call),
+                # else create a new voice channel from the hosting template (auto-delete armed until the member joins)
                 try:
-                    new_channel = await guild.create_voice_channel(channel_name, category=category)
-                    add_temp_channel_record(guild.id, new_channel.id, member.id)
-                    # move the member
-                    try:
-                        await member.move_to(new_channel)
-                    except Exception:
-                        pass
-                    print(f"Temporary voice channel created: {new_channel.name} for {member.display_name}")
-                    # schedule auto-delete when empty
-                    bot.loop.create_task(_auto_delete_when_empty(new_channel, guild.id))
+                    new_channel = await VOICE_POOL.claim(guild, member, after.channel.id, hosting_info)
+                    if new_channel is None:
+                        new_channel = await provision_temp_channel(guild, member, "voice", hosting_info=hosting_info, hosting_id=after.channel.id)
+                        # move the member
+                        try:
+                            await member.move_to(new_channel)
+                        except Exception:
+                            pass
+                    LOG.info("temp_voice_created", f"Temporary voice channel created: {new_channel.name}", guild=guild, user=member, channel=new_channel)
                 except Exception as e:
-                    print("Erreur lors de la création du canal temporaire (voice):", e, traceback.format_exc())
-
-        # ----- LEAVING a temp channel -----
-        # If the user leaves a channel that was a temp and it's now empty => delete
-        if before.channel and gid in DATA.get("temp_channels", {}) and str(before.channel.id) in DATA["temp_channels"][gid]:
-            # If after.channel is None OR user switched to another channel, check emptiness
-            ch = before.channel
-            # If channel has no members:
-            if ch and len(ch.members) == 0:
-                try:
-                    await ch.delete()
-                except Exception:
-                    pass
-                remove_temp_channel_record(guild.id, ch.id)
-                print(f"Deleted empty temporary channel: {ch.name}")
-
-        # ----- SWITCHED channels: check old channel for cleanup -----
-        if before.channel and after.channel and before.channel != after.channel:
-            if gid in DATA.get("temp_channels", {}) and str(before.channel.id) in DATA["temp_channels"][gid]:
-                if len(before.channel.members) == 0:
-                    try:
-                        await before.channel.delete()
-                    except Exception:
-                        pass
-                    remove_temp_channel_record(guild.id, before.channel.id)
-                    print(f"Deleted temporary channel on switch: {before.channel.name}")
+                    LOG.error("temp_voice_create_error", str(e), guild=guild, user=member, hosting=after.channel.id)
+                finally:
+                    ADMISSION.release(guild.id, user_id)
 
     except Exception as e:
-        print("on_voice_state_update error:", e, traceback.format_exc())
+        LOG.error("on_voice_state_update_error", str(e), guild=member.guild, user=member)
 
 
 # ---------- on_message for text hosting auto-create ----------
 @bot.event
+@timed_handler
 async def on_message(message: discord.Message):
     """
     If a hosting channel is configured as text, when a user sends a message in that channel and they don't have a temp text channel,
@@ -1103,136 +4503,254 @@ async def on_message(message: discord.Message):
         if not guild:
             return
 
-        gid = str(guild.id)
-        # If guild has no hosting, ignore
-        hosting_map = DATA.get("hosting_channels", {}).get(gid, {})
-        if not hosting_map:
-            # but still process commands
+        # If the channel is not a hosting channel, ignore (but still process commands)
+        route, = await route_lookup(guild.id, message.channel.id)
+        if route is not None and route[0] == "temp":
+            TEMP_REGISTRY.touch(message.channel.id)
+        if route is None or route[0] != "hosting":
             await bot.process_commands(message)
             return
+        TRACER.annotate(guild=guild.id, user=message.author.id, hosting=message.channel.id)
 
         # Check if the channel is configured as a text hosting
-        hosting_info = hosting_map.get(str(message.channel.id))
+        hosting_info = route[1]
         if hosting_info and hosting_info.get("type") == "text":
-            # If user already has a temp channel, skip
+            # If user already has all the temp channels allowed, skip (spam / overload is shed silently)
             user_id = message.author.id
-            if get_user_temp_count(guild.id, user_id) >= MAX_TEMP_PER_USER:
+            refused = ADMISSION.reserve(guild.id, user_id, message.channel.id)
+            if refused == "quota":
                 # notify user via DM if possible
                 try:
-                    await message.author.send(tr(DATA, guild.id, user_id, message.channel.id, "already_max_temp"))
+                    await message.author.send(tr(DATA, guild.id, user_id, message.channel.id, "already_max_temp", max=get_temp_quota(guild.id)))
                 except Exception:
                     pass
-            else:
-                # create new text channel
-                category = None
-                if hosting_info.get("temp_category_id"):
-                    try:
-                        category = guild.get_channel(int(hosting_info.get("temp_category_id")))
-                    except Exception:
-                        category = None
-                elif DEFAULT_TEMP_CATEGORY_ID:
-                    category = guild.get_channel(int(DEFAULT_TEMP_CATEGORY_ID))
-                channel_name = f"{message.author.display_name}-temp"
+            elif not refused:
+                # create new text channel (private to the user, admins keep access through manage_channels)
                 try:
-                    temp_channel = await guild.create_text_channel(channel_name, category=category)
-                    # restrict default role and allow the user + admins
-                    await temp_channel.set_permissions(guild.default_role, view_channel=False)
-                    await temp_channel.set_permissions(message.author, view_channel=True, send_messages=True)
-                    # optionally allow admins: leave as general (admins usually have manage_channels)
-                    add_temp_channel_record(guild.id, temp_channel.id, message.author.id)
+                    try:
+                        temp_channel = await provision_temp_channel(guild, message.author, "text", hosting_info=hosting_info, hosting_id=message.channel.id)
+                    finally:
+                        ADMISSION.release(guild.id, user_id)
                     await message.channel.send(tr(DATA, guild.id, message.author.id, message.channel.id, "temp_created", channel=temp_channel.mention))
                     await temp_channel.send(f"Welcome {message.author.mention}! This is your temporary channel.")
-                    print(f"Temporary text channel created: {temp_channel.name} for {message.author.display_name}")
+                    LOG.info("temp_text_created", f"Temporary text channel created: {temp_channel.name}", guild=guild, user=message.author, channel=temp_channel)
                 except Exception as e:
-                    print("Error creating temporary text channel:", e, traceback.format_exc())
+                    LOG.error("temp_text_create_error", str(e), guild=guild, user=message.author, hosting=message.channel.id)
 
         # allow commands to be processed (prefix)
         await bot.process_commands(message)
     except Exception as e:
-        print("on_message handler error:", e, traceback.format_exc())
+        LOG.error("on_message_error", str(e), guild=message.guild, user=message.author, channel=message.channel)
+
+
+# ---------- Helper: delete temp voice channels once they stay empty (deadline driven) ----------
+def schedule_empty_channel_deletion(channel_id: int, guild_id: int, delay: float = EMPTY_CHANNEL_DELETE_SECONDS) -> None:
+    """
+    Arm the deletion deadline of an empty temp voice channel. A rejoin cancels it (see on_voice_state_update).
+    """
+    empty_channel_scheduler(guild_id).schedule(int(channel_id), delay, _delete_if_still_empty, int(channel_id), guild_id)
+
 
+def cancel_empty_channel_deletion(channel_id: int, guild_id: int) -> None:
+    empty_channel_scheduler(guild_id).cancel(int(channel_id))
 
-# ---------- Helper: auto-delete when empty (for voice channels) ----------
-async def _auto_delete_when_empty(channel: discord.abc.GuildChannel, guild_id: int, timeout_seconds: int = 300):
+
+async def _delete_if_still_empty(channel_id: int, guild_id: int) -> None:
     """
-    Observe the channel and delete it when it becomes empty.
-    timeout_seconds: check every 10 seconds and delete when empty; for reliability, if empty persists, delete after timeout_seconds.
+    Deadline reached: delete the channel if nobody came back meanwhile.
     """
+    ch = bot.get_channel(channel_id)
+    if ch is None:
+        # already deleted
+        remove_temp_channel_record(guild_id, channel_id)
+        return
+    if not isinstance(ch, discord.VoiceChannel) or len(ch.members) > 0:
+        return
     try:
-        # We'll wait in loop and delete when members==0
-        total_wait = 0
-        check_interval = 10
-        while True:
-            ch = bot.get_channel(channel.id)
-            if ch is None:
-                # already deleted
-                remove_temp_channel_record(guild_id, channel.id)
-                return
-            # For voice channels check ch.members
-            if isinstance(ch, discord.VoiceChannel):
-                mem_count = len(ch.members)
-            else:
-                # for text channels we don't auto-delete here
-                return
-            if mem_count == 0:
-                # wait a bit for transient leaves
-                await asyncio.sleep(check_interval)
-                total_wait += check_interval
-                ch2 = bot.get_channel(channel.id)
-                if ch2 is None:
-                    remove_temp_channel_record(guild_id, channel.id)
-                    return
-                if len(ch2.members) == 0:
-                    # delete
-                    try:
-                        await ch2.delete()
-                    except Exception:
-                        pass
-                    remove_temp_channel_record(guild_id, channel.id)
-                    print(f"Auto-deleted temporary channel {channel.name} after being empty.")
-                    return
-                else:
-                    # someone joined again, continue loop
-                    continue
-            await asyncio.sleep(check_interval)
-            total_wait += check_interval
-            # safety: if function runs too long, break (but typically it will run until deletion)
-            if total_wait > 60 * 60 * 6:  # 6 hours safety break
-                return
+        await ch.delete()
     except Exception:
-        print("Error in _auto_delete_when_empty:", traceback.format_exc())
+        pass
+    remove_temp_channel_record(guild_id, channel_id)
+    LOG.info("temp_empty_deleted", f"Deleted empty temporary channel: {ch.name}", guild=guild_id, channel=channel_id)
+
+
+# ---------- Startup reconciliation: persisted records vs guild cache ----------
+async def reconcile_guild(guild: discord.Guild) -> Dict[str, int]:
+    """
+    Compare the persisted temp / hosting / pool records of a guild with its channel cache:
+    - records whose channel no longer exists are pruned (deleted while the bot was offline)
+    - empty temp voice channels get their deletion deadline re-armed
+    """
+    counts = {"pruned": 0, "rearmed": 0}
+    gid = str(guild.id)
+    await load_guild_state(gid)
+    for cid in list(DATA.get("temp_channels", {}).get(gid, {})):
+        ch = guild.get_channel(int(cid))
+        if ch is None:
+            remove_temp_channel_record(guild.id, int(cid))
+            counts["pruned"] += 1
+            continue
+        rec = TEMP_REGISTRY.get(ch.id)
+        if rec is not None and rec.kind is None:
+            rec.kind = "voice" if isinstance(ch, discord.VoiceChannel) else "text"
+            if rec.kind == "text":
+                # enregistrement restauré : la dernière activité connue est le dernier message du salon
+                rec.last_active = discord.utils.snowflake_time(ch.last_message_id or ch.id).timestamp()
+                IDLE_EXPIRER.track(rec)
+        if isinstance(ch, discord.VoiceChannel) and len(ch.members) == 0 and not empty_channel_scheduler(guild.id).is_armed(ch.id):
+            schedule_empty_channel_deletion(ch.id, guild.id)
+            counts["rearmed"] += 1
+    for cid in list(DATA.get("hosting_channels", {}).get(gid, {})):
+        if guild.get_channel(int(cid)) is None:
+            set_entry("hosting_channels", cid, None, guild_id=gid)
+            counts["pruned"] += 1
+    for cid in list(DATA.get("voice_pool", {}).get(gid, {})):
+        if guild.get_channel(int(cid)) is None:
+            set_entry("voice_pool", cid, None, guild_id=gid)
+            counts["pruned"] += 1
+    for cid in list(DATA.get("temp_origins", {}).get(gid, {})):
+        if cid not in DATA.get("temp_channels", {}).get(gid, {}):
+            set_entry("temp_origins", cid, None, guild_id=gid)
+    # laisse la main à la boucle entre deux serveurs
+    await asyncio.sleep(0)
+    return counts
+
+
+RECONCILED_GUILDS: set = set()  # guild_id déjà réconciliés par ce processus (les reconnexions ne refont rien)
+
+
+async def reconcile_all_guilds() -> None:
+    """
+    Reconciliation pass run from on_ready, once per guild and per process; the storage merges all prunes into one flush.
+    Only guilds with persisted state are visited (sharded storage: their files are read off the loop).
+    Afterwards on_guild_channel_delete keeps the records consistent.
+    """
+    started = time.perf_counter()
+    stored = await STORAGE.stored_guilds()
+    guilds = [g for g in bot.guilds if not g.unavailable and g.id not in RECONCILED_GUILDS
+              and (stored is None or str(g.id) in stored)]
+    if not guilds:
+        return
+    RECONCILED_GUILDS.update(g.id for g in guilds)
+    results = await asyncio.gather(*(reconcile_guild(g) for g in guilds), return_exceptions=True)
+    pruned = rearmed = errors = 0
+    for guild, res in zip(guilds, results):
+        if isinstance(res, Exception):
+            errors += 1
+            LOG.error("reconcile_error", "Erreur de réconciliation", exc=res, guild=guild)
+            continue
+        pruned += res["pruned"]
+        rearmed += res["rearmed"]
+    LOG.info("reconcile_done", "Réconciliation terminée", guilds=len(results), errors=errors, pruned=pruned,
+             rearmed=rearmed, ms=round((time.perf_counter() - started) * 1000.0, 1))
+
+
+@bot.event
+@timed_handler
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    """
+    Keep temp / hosting / pool records in sync when a channel is deleted (by the bot, an admin or Discord).
+    """
+    try:
+        gid = str(channel.guild.id)
+        cid = str(channel.id)
+        await load_guild_state(gid)
+        if cid in DATA.get("temp_channels", {}).get(gid, {}):
+            cancel_empty_channel_deletion(channel.id, channel.guild.id)
+            remove_temp_channel_record(channel.guild.id, channel.id)
+        if cid in DATA.get("hosting_channels", {}).get(gid, {}):
+            set_entry("hosting_channels", cid, None, guild_id=gid)
+            await VOICE_POOL.drain(channel.guild, channel.id)
+        if cid in DATA.get("voice_pool", {}).get(gid, {}):
+            set_entry("voice_pool", cid, None, guild_id=gid)
+    except Exception as e:
+        LOG.error("on_guild_channel_delete_error", str(e), guild=channel.guild, channel=channel)
+
+
+# ---------- App command sync: only when the command tree changed ----------
+# COMMAND_SYNC_MODE : "auto" (sync si l'empreinte de l'arbre a changé), "force" (toujours au premier on_ready), "off"
+# COMMAND_SYNC_GUILDS : IDs de serveurs séparés par des virgules -> sync par serveur (instantané, pour la préproduction)
+COMMAND_SYNC_FILE = "command_sync.json"
+COMMAND_SYNC_MODE = os.environ.get("COMMAND_SYNC_MODE", "auto").lower()
+COMMAND_SYNC_GUILDS = [int(x) for x in (os.environ.get("COMMAND_SYNC_GUILDS") or ",".join(str(g) for g in _config.get("sync_guild_ids", []))).split(",") if x.strip()]
+_synced_scopes: set = set()
+
+
+def command_tree_fingerprint(guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """
+    SHA-256 of the payload bot.tree.sync() would send (commands sorted, keys sorted).
+    """
+    payload = sorted((cmd.to_dict() for cmd in bot.tree.get_commands(guild=guild)), key=lambda d: (d.get("type", 1), d["name"]))
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+async def sync_command_tree() -> None:
+    """
+    Sync app commands (globally, or per guild in COMMAND_SYNC_GUILDS) only if their fingerprint differs from the last
+    synced one stored in COMMAND_SYNC_FILE. Reconnects of the same process never sync again.
+    """
+    if COMMAND_SYNC_MODE == "off" or (CLUSTER_WORKER_ID or 0) != 0:
+        # en cluster, seul le worker 0 synchronise (les commandes sont les mêmes pour tous)
+        return
+    state: Dict[str, Any] = {}
+    if os.path.exists(COMMAND_SYNC_FILE):
+        try:
+            state = _read_json_file(COMMAND_SYNC_FILE)
+        except Exception:
+            LOG.error("command_sync_state_error", f"Erreur lors de la lecture de {COMMAND_SYNC_FILE}", path=COMMAND_SYNC_FILE)
+    changed = False
+    for guild in [discord.Object(id=g) for g in COMMAND_SYNC_GUILDS] or [None]:
+        scope = f"{bot.application_id}:{guild.id if guild else 'global'}"
+        if scope in _synced_scopes:
+            continue
+        if guild is not None:
+            bot.tree.copy_global_to(guild=guild)
+        fingerprint = command_tree_fingerprint(guild)
+        if COMMAND_SYNC_MODE != "force" and state.get(scope) == fingerprint:
+            LOG.info("command_sync_skipped", f"Commandes inchangées ({scope}), sync ignoré", scope=scope)
+        else:
+            synced = await bot.tree.sync(guild=guild)
+            LOG.info("command_sync", f"Synced {len(synced)} commands ({'guild ' + str(guild.id) if guild else 'global'})", scope=scope, commands=len(synced))
+            state[scope] = fingerprint
+            changed = True
+        _synced_scopes.add(scope)
+    if changed:
+        write_json_file(COMMAND_SYNC_FILE, state)
 
 
 # ---------- Event: on_ready ----------
 @bot.event
 async def on_ready():
     """
-    Called when bot is ready. We start background tasks and sync app commands for the configured guild if provided.
+    Called when bot is ready (again after each reconnect). We start background tasks once and sync app commands if they changed.
     """
     try:
-        print(f"Bot connecté en tant que {bot.user} (id: {bot.user.id})")
-        # Start keepalive loop
-        if not keepalive_loop_task.is_running():
-            keepalive_loop_task.start()
+        LOG.info("ready", f"Bot connecté en tant que {bot.user} (id: {bot.user.id})", user=bot.user, guilds=len(bot.guilds))
+        # Start keepalive engine (no-op if already running after a reconnect)
+        KEEPALIVE_ENGINE.start()
+        # Start the idle expiry sweeper for temp text channels (no-op if already running)
+        IDLE_EXPIRER.start()
+        # Cluster worker: pick up user / channel languages set through the other workers
+        start_cluster_lang_refresh()
 
-        # Start Flask keepalive server thread (if running on Replit or similar)
-        start_keepalive_thread()
+        # Restore temp channel lifecycle after a restart (prune orphans, re-arm empty channel deletion)
+        await reconcile_all_guilds()
 
-        # Try syncing global commands if CLIENT_ID not set and there is a known guild config
+        # Pre-create idle voice channels for hostings that use a pool
+        for guild in bot.guilds:
+            VOICE_POOL.warm(guild)
+
+        # Start the keepalive / health HTTP server on this loop (no-op if already running after a reconnect)
+        await HEALTH_SERVER.start()
+
+        # Sync app commands only if they changed since the last sync (see COMMAND_SYNC_MODE / COMMAND_SYNC_GUILDS)
         try:
-            # If CLIENT_ID and guild id exist, you can sync to a specific guild for faster deployment
-            if CLIENT_ID:
-                # optionally sync to all guilds where bot is present (dangerous for large bots), we'll do a global sync
-                synced = await bot.tree.sync()
-                print(f"Synced {len(synced)} commands globally.")
-            else:
-                # global sync
-                synced = await bot.tree.sync()
-                print(f"Synced {len(synced)} commands.")
-        except Exception as e:
-            print("Erreur lors du sync des commandes:", e)
+            await sync_command_tree()
+        except Exception:
+            LOG.error("command_sync_error", "Erreur lors du sync des commandes")
     except Exception:
-        print("on_ready error:", traceback.format_exc())
+        LOG.error("on_ready_error")
 
 
 # ---------- Prefix versions for some user convenience ----------
@@ -1246,28 +4764,19 @@ async def create_temp_prefix(ctx: commands.Context, *, name: str = "Temporary"):
     try:
         user_id = ctx.author.id
         guild_id = ctx.guild.id
-        if get_user_temp_count(guild_id, user_id) >= MAX_TEMP_PER_USER:
-            await ctx.send(tr(DATA, guild_id, user_id, ctx.channel.id, "already_max_temp"))
+        quota = get_temp_quota(guild_id)
+        refused = ADMISSION.reserve(guild_id, user_id)
+        if refused:
+            await ctx.send(tr(DATA, guild_id, user_id, ctx.channel.id, ADMISSION_MESSAGES[refused], max=quota))
             return
-        # create
-        cat = None
-        # choose category from any hosting config that has temp_category_id
-        hosting_map = DATA.get("hosting_channels", {}).get(str(guild_id), {})
-        temp_cat_id = None
-        for _, info in hosting_map.items():
-            if info.get("temp_category_id"):
-                temp_cat_id = info.get("temp_category_id")
-                break
-        if temp_cat_id:
-            cat = ctx.guild.get_channel(int(temp_cat_id))
-        elif DEFAULT_TEMP_CATEGORY_ID:
-            cat = ctx.guild.get_channel(int(DEFAULT_TEMP_CATEGORY_ID))
-        new_channel = await ctx.guild.create_voice_channel(name, category=cat)
-        add_temp_channel_record(guild_id, new_channel.id, user_id)
-        await ctx.send(tr(DATA, guild_id, user_id, ctx.channel.id, "created_temp_voice", channel=new_channel.mention, count=get_user_temp_count(guild_id, user_id)))
-        bot.loop.create_task(_auto_delete_when_empty(new_channel, guild_id))
+        # create (category from any hosting config that has temp_category_id)
+        try:
+            new_channel = await provision_temp_channel(ctx.guild, ctx.author, "voice", name=name)
+        finally:
+            ADMISSION.release(guild_id, user_id)
+        await ctx.send(tr(DATA, guild_id, user_id, ctx.channel.id, "created_temp_voice", channel=new_channel.mention, count=get_user_temp_count(guild_id, user_id), max=quota))
     except Exception as e:
-        print("create_temp_prefix error:", e, traceback.format_exc())
+        LOG.error("create_temp_prefix_error", str(e), guild=ctx.guild, user=ctx.author, channel=ctx.channel)
         await ctx.send(f"Erreur: {e}")
 
 
@@ -1280,10 +4789,6 @@ async def delete_temp_prefix(ctx: commands.Context, channel: Optional[discord.Pa
         gid = ctx.guild.id
         uid = ctx.author.id
         if channel:
-            # try parse id from mention or provided
-            ch = channel
-            ch_id = None
-            # this prefix function signature used PartialMessage; better to accept int id, but keep simple
             await ctx.send("Utilise la commande: !delete_temp_prefix <channel_id>")
             return
         else:
@@ -1292,17 +4797,10 @@ async def delete_temp_prefix(ctx: commands.Context, channel: Optional[discord.Pa
             if not chs:
                 await ctx.send(tr(DATA, gid, uid, ctx.channel.id, "no_temp_to_delete"))
                 return
-            for cid in chs:
-                ch = bot.get_channel(cid)
-                if ch:
-                    try:
-                        await ch.delete()
-                    except Exception:
-                        pass
-                remove_temp_channel_record(gid, cid)
+            await purge_temp_channels(ctx.guild, chs)
             await ctx.send("🗑️ Tous tes salons temporaires ont été supprimés.")
     except Exception as e:
-        print("delete_temp_prefix error:", e, traceback.format_exc())
+        LOG.error("delete_temp_prefix_error", str(e), guild=ctx.guild, user=ctx.author, channel=ctx.channel)
         await ctx.send(f"Erreur: {e}")
 
 
@@ -1324,21 +4822,25 @@ async def list_temp_prefix(ctx: commands.Context):
                 lines.append(f"- {cid} (non trouvé)")
         await ctx.send("📋 Tes canaux temporaires :\n" + "\n".join(lines))
     except Exception as e:
-        print("list_temp_prefix error:", e, traceback.format_exc())
+        LOG.error("list_temp_prefix_error", str(e), guild=ctx.guild, user=ctx.author, channel=ctx.channel)
         await ctx.send(f"Erreur: {e}")
 
 
 # ---------- Utility: graceful shutdown saving data ----------
 async def _graceful_shutdown():
     try:
-        print("Saving data before shutdown...")
-        save_data(DATA)
+        LOG.info("shutdown", "Saving data before shutdown...")
+        await HEALTH_SERVER.stop()
+        await STORAGE.flush()
     except Exception:
         pass
 
 
 # ---------- Signal handlers (optional) ----------
-# Not adding OS signal handling to keep code simpler; ensure to call save_data on any manual shutdown.
+# Outside cluster mode no OS signal handling, to keep code simpler; ensure to call STORAGE.flush_sync() on any manual shutdown.
+# Cluster workers are stopped by the coordinator with SIGTERM: treat it like Ctrl+C so bot.run() returns and data is saved.
+if CLUSTER_WORKER_ID is not None:
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
 
 # ---------- Main entry ----------
 if __name__ == "__main__":
@@ -1355,10 +4857,19 @@ if __name__ == "__main__":
         # Start the bot
         bot.run(TOKEN)
     finally:
-        # Save DATA at shutdown
+        # Save DATA at shutdown (flush any write still waiting in the coalescing window)
         try:
-            save_data(DATA)
+            STORAGE.close()
         except Exception:
             pass
+        # then hand our shards over (the next owner loads the state we just flushed)
+        if CLUSTER_LEASE is not None:
+            try:
+                CLUSTER_LEASE.release()
+            except Exception:
+                pass
+        # last: write the traces and log entries still queued (the storage logs its final flush)
+        TRACE_EXPORTER.close()
+        LOG.close()
 
 # End of bot.py
@@ -0,0 +1,554 @@
+# bench_gateway.py
+"""
+Banc d'essai de charge de 75botV5.py sans Discord :
+- une fausse passerelle en mémoire (serveurs, salons, membres) appelle les vrais handlers
+  (on_voice_state_update, on_message, callback de /create_temp)
+- une fausse couche REST (create_voice_channel, create_text_channel, move_to, delete, edit, set_permissions, send)
+  avec latence configurable compte chaque appel
+- tempêtes synthétiques d'arrivées / départs vocaux, de retours rapides (recyclage), de messages et de bruit (mute, salons sans rapport)
+- résultats JSON : latence handler p50/p99, appels REST par opération, retard de la boucle asyncio, RSS max
+- comparaison optionnelle avec une référence (--baseline) : code de sortie 1 en cas de régression
+
+Exemple :
+    python bench_gateway.py --rates 100,500,2000 --joins 2000 --rest-latency-ms 20 --out bench.json
+    python bench_gateway.py --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import discord
+
+BOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "75botV5.py")
+# métriques comparées à la référence : plus haut = pire
+COMPARED_METRICS = ("p50_ms", "p99_ms", "rest_calls_per_op", "loop_lag_p99_ms")
+
+
+def load_bot_module(workdir: str, delete_delay: float, verbose: bool = False):
+    """
+    Charge 75botV5.py dans un répertoire de travail jetable (ses fichiers de données y sont écrits).
+    """
+    os.environ["EMPTY_CHANNEL_DELETE_SECONDS"] = str(delete_delay)
+    if not verbose:
+        # the handlers log every created / deleted channel (JSON lines on stdout)
+        os.environ["LOG_LEVEL"] = "off"
+    # the storms replay thousands of creations per second on one hosting channel: measure the handlers, not the admission buckets
+    for scope in ("USER", "HOSTING", "GUILD"):
+        os.environ[f"ADMISSION_{scope}_PER_MINUTE"] = "0"
+    os.chdir(workdir)
+    spec = importlib.util.spec_from_file_location("bot75", BOT_FILE)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["bot75"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def peak_rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+# ---------------------------
+# Fake REST layer
+# ---------------------------
+class FakeRest:
+    """
+    Simule la latence des appels REST Discord et compte les appels par méthode.
+    """
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls: Dict[str, int] = {}
+        self.time_spent: Dict[str, float] = {}
+
+    async def call(self, method: str) -> None:
+        self.calls[method] = self.calls.get(method, 0) + 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        started = time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        self.time_spent[method] = self.time_spent.get(method, 0.0) + time.perf_counter() - started
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.calls)
+
+
+# ---------------------------
+# Fake Discord objects (only what the bot's handlers touch)
+# ---------------------------
+_ids = itertools.count(10_000_000)
+
+
+class FakeRole:
+    def __init__(self, guild: "FakeGuild"):
+        self.id = guild.id
+        self.guild = guild
+
+    def __hash__(self) -> int:
+        return hash(("role", self.id))
+
+
+class FakeVoiceState:
+    def __init__(self, channel):
+        self.channel = channel
+
+
+class FakeMember:
+    def __init__(self, gateway: "FakeGateway", guild: "FakeGuild", name: str):
+        self.gateway = gateway
+        self.guild = guild
+        self.id = next(_ids)
+        self.display_name = name
+        self.name = name
+        self.bot = False
+        self.mention = f"<@{self.id}>"
+        self.voice_channel = None
+        self.guild_permissions = discord.Permissions.none()
+
+    def __hash__(self) -> int:
+        return hash(("member", self.id))
+
+    async def send(self, content=None, **kwargs):
+        await self.gateway.rest.call("send")
+
+    async def move_to(self, channel, **kwargs):
+        await self.gateway.rest.call("move_to")
+        # Discord answers a move with a new voice state update (hosting -> temp channel)
+        self.gateway.voice_move(self, channel, op="moved")
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, gateway: "FakeGateway", guild: "FakeGuild", name: str, **options):
+        self.gateway = gateway
+        self.guild = guild
+        self.id = next(_ids)
+        self.name = name
+        self.options = options
+        self._fake_members: List[FakeMember] = []
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._fake_members)
+
+    async def delete(self, **kwargs):
+        await self.gateway.rest.call("delete")
+        self.gateway.remove_channel(self)
+
+    async def edit(self, **kwargs):
+        await self.gateway.rest.call("edit")
+        if "name" in kwargs:
+            self.name = kwargs["name"]
+        return self
+
+    async def set_permissions(self, target, **kwargs):
+        await self.gateway.rest.call("set_permissions")
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, gateway: "FakeGateway", guild: "FakeGuild", name: str):
+        self.gateway = gateway
+        self.guild = guild
+        self.id = next(_ids)
+        self.name = name
+
+    async def send(self, content=None, **kwargs):
+        await self.gateway.rest.call("send")
+
+    async def delete(self, **kwargs):
+        await self.gateway.rest.call("delete")
+        self.gateway.remove_channel(self)
+
+    async def set_permissions(self, target, **kwargs):
+        await self.gateway.rest.call("set_permissions")
+
+
+class FakeGuild:
+    def __init__(self, gateway: "FakeGateway", name: str):
+        self.gateway = gateway
+        self.id = next(_ids)
+        self.name = name
+        self.unavailable = False
+        self.bitrate_limit = 96000.0
+        self.default_role = FakeRole(self)
+        self.channels: Dict[int, Any] = {}
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    async def create_voice_channel(self, name: str, category=None, overwrites=None, **options):
+        await self.gateway.rest.call("create_voice_channel")
+        return self.gateway.add_channel(FakeVoiceChannel(self.gateway, self, name, **options))
+
+    async def create_text_channel(self, name: str, category=None, overwrites=None, **options):
+        await self.gateway.rest.call("create_text_channel")
+        return self.gateway.add_channel(FakeTextChannel(self.gateway, self, name))
+
+
+class FakeMessage:
+    def __init__(self, author: FakeMember, channel, content: str):
+        self.id = next(_ids)
+        self.author = author
+        self.guild = author.guild
+        self.channel = channel
+        self.content = content
+        self.mentions: List[Any] = []
+        self.attachments: List[Any] = []
+
+
+class FakeResponse:
+    def __init__(self, rest: FakeRest):
+        self.rest = rest
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        await self.rest.call("defer")
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        await self.rest.call("send")
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, rest: FakeRest):
+        self.rest = rest
+
+    async def send(self, content=None, **kwargs):
+        await self.rest.call("send")
+
+
+class FakeInteraction:
+    def __init__(self, rest: FakeRest, user: FakeMember, channel):
+        self.user = user
+        self.guild = user.guild
+        self.channel = channel
+        self.response = FakeResponse(rest)
+        self.followup = FakeFollowup(rest)
+
+
+# ---------------------------
+# Fake gateway: state + event dispatch with latency measurement
+# ---------------------------
+class FakeGateway:
+    def __init__(self, bot_module, rest: FakeRest):
+        self.m = bot_module
+        self.rest = rest
+        self.channels: Dict[int, Any] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.pending: set = set()
+        # the bot looks channels up through its connection cache
+        bot_module.bot.get_channel = self.get_channel
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    def add_channel(self, channel):
+        self.channels[channel.id] = channel
+        channel.guild.channels[channel.id] = channel
+        return channel
+
+    def remove_channel(self, channel) -> None:
+        self.channels.pop(channel.id, None)
+        channel.guild.channels.pop(channel.id, None)
+
+    def _spawn(self, op: str, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self._timed(op, coro))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        return task
+
+    async def _timed(self, op: str, coro) -> None:
+        started = time.perf_counter()
+        await coro
+        self.latencies.setdefault(op, []).append(time.perf_counter() - started)
+
+    def voice_move(self, member: FakeMember, channel, op: str) -> asyncio.Task:
+        before = member.voice_channel
+        if isinstance(before, FakeVoiceChannel) and member in before._fake_members:
+            before._fake_members.remove(member)
+        if channel is not None:
+            channel._fake_members.append(member)
+        member.voice_channel = channel
+        return self._spawn(op, self.m.on_voice_state_update(member, FakeVoiceState(before), FakeVoiceState(channel)))
+
+    def voice_noise(self, member: FakeMember) -> asyncio.Task:
+        # mute / deafen toggle: same channel before and after
+        state = FakeVoiceState(member.voice_channel)
+        return self._spawn("voice_noise", self.m.on_voice_state_update(member, state, state))
+
+    def message(self, member: FakeMember, channel, content: str, op: str) -> asyncio.Task:
+        return self._spawn(op, self.m.on_message(FakeMessage(member, channel, content)))
+
+    def slash_create_temp(self, member: FakeMember, channel, name: str) -> asyncio.Task:
+        interaction = FakeInteraction(self.rest, member, channel)
+        return self._spawn("slash_create_temp", self.m.slash_create_temp.callback(interaction, name, "voice"))
+
+    async def drain(self) -> None:
+        while self.pending:
+            await asyncio.gather(*list(self.pending), return_exceptions=True)
+
+
+class LoopLagSampler:
+    """
+    Retard de la boucle : écart entre le réveil prévu et le réveil réel d'un sleep périodique.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.samples = []
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    async def stop(self) -> List[float]:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return self.samples
+
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+async def paced(count: int, rate: float, fire) -> None:
+    """
+    Appelle fire(i) count fois au débit cible (opérations / s).
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for i in range(count):
+        due = start + i / rate
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        fire(i)
+
+
+def summarize(gateway: FakeGateway, op: str, ops: int, elapsed: float, rest_before: Dict[str, int], lag: List[float]) -> Dict[str, Any]:
+    latencies = gateway.latencies.get(op, [])
+    rest_after = gateway.rest.snapshot()
+    rest_delta = {k: v - rest_before.get(k, 0) for k, v in rest_after.items() if v - rest_before.get(k, 0)}
+    return {
+        "ops": ops,
+        "elapsed_s": round(elapsed, 4),
+        "ops_per_s": round(ops / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000.0, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000.0, 3),
+        "max_ms": round(max(latencies) * 1000.0, 3) if latencies else 0.0,
+        "rest_calls": rest_delta,
+        "rest_calls_per_op": round(sum(rest_delta.values()) / ops, 3) if ops else 0.0,
+        "loop_lag_p99_ms": round(percentile(lag, 99) * 1000.0, 3),
+        "loop_lag_max_ms": round(max(lag) * 1000.0, 3) if lag else 0.0,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+async def run_scenario(gateway: FakeGateway, sampler: LoopLagSampler, op: str, count: int, rate: float, fire, settle=None) -> Dict[str, Any]:
+    gateway.latencies.pop(op, None)
+    rest_before = gateway.rest.snapshot()
+    sampler.start()
+    started = time.perf_counter()
+    await paced(count, rate, fire)
+    await gateway.drain()
+    if settle is not None:
+        await settle()
+    elapsed = time.perf_counter() - started
+    lag = await sampler.stop()
+    return summarize(gateway, op, count, elapsed, rest_before, lag)
+
+
+async def wait_for(predicate, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while not predicate() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def run_benchmark(m, args) -> Dict[str, Any]:
+    rest = FakeRest(args.rest_latency_ms / 1000.0, args.rest_jitter_ms / 1000.0)
+    gateway = FakeGateway(m, rest)
+    sampler = LoopLagSampler()
+    guild = FakeGuild(gateway, "bench")
+    voice_hosting = gateway.add_channel(FakeVoiceChannel(gateway, guild, "join-to-create"))
+    text_hosting = gateway.add_channel(FakeTextChannel(gateway, guild, "request-a-channel"))
+    lobby_text = gateway.add_channel(FakeTextChannel(gateway, guild, "general"))
+    lobby_voice = gateway.add_channel(FakeVoiceChannel(gateway, guild, "lobby"))
+    # no recycle window here: the leave storm measures real deletions (see voice_rejoin for recycling)
+    m.set_entry("hosting_channels", str(voice_hosting.id), {"type": "voice", "temp_category_id": None, "owner_id": 0, "template": {"recycle_seconds": 0}},
+                guild_id=str(guild.id))
+    m.set_entry("hosting_channels", str(text_hosting.id), {"type": "text", "temp_category_id": None, "owner_id": 0}, guild_id=str(guild.id))
+
+    def voice_channel_ids() -> set:
+        return {ch.id for ch in gateway.channels.values() if isinstance(ch, FakeVoiceChannel)}
+
+    def temp_voice_left(known: set) -> List[Any]:
+        # voice channels created by the scenario (not in the snapshot taken before it) are deleted once their empty deadline expires
+        return [ch for ch in gateway.channels.values() if isinstance(ch, FakeVoiceChannel) and ch.id not in known]
+
+    results: Dict[str, Any] = {}
+    for rate in args.rates:
+        members = [FakeMember(gateway, guild, f"user{i}") for i in range(args.joins)]
+
+        # join storm: hosting join -> create channel -> move -> second voice update
+        results[f"voice_join@{rate:g}"] = await run_scenario(
+            gateway, sampler, "voice_join", len(members), rate,
+            lambda i: gateway.voice_move(members[i], voice_hosting, op="voice_join"))
+
+        # leave storm: temp channel left empty -> deletion deadline -> delete
+        results[f"voice_leave@{rate:g}"] = await run_scenario(
+            gateway, sampler, "voice_leave", len(members), rate,
+            lambda i: gateway.voice_move(members[i], None, op="voice_leave"),
+            settle=lambda: wait_for(lambda: m.TEMP_REGISTRY.guild_count(guild.id) == 0, args.delete_delay + 30.0))
+
+    # quick leave / rejoin within the recycle window: owners are moved back into their parked channel
+    recycle_hosting = gateway.add_channel(FakeVoiceChannel(gateway, guild, "join-to-create-recycle"))
+    m.set_entry("hosting_channels", str(recycle_hosting.id), {"type": "voice", "temp_category_id": None, "owner_id": 0, "template": {"recycle_seconds": 600}},
+                guild_id=str(guild.id))
+    rejoiners = [FakeMember(gateway, guild, f"rejoin{i}") for i in range(args.messages)]
+    for target in (recycle_hosting, None):
+        for member in rejoiners:
+            gateway.voice_move(member, target, op="setup")
+        await gateway.drain()
+    results["voice_rejoin"] = await run_scenario(gateway, sampler, "voice_rejoin", len(rejoiners), max(args.rates),
+                                                 lambda i: gateway.voice_move(rejoiners[i], recycle_hosting, op="voice_rejoin"))
+
+    noisy = [FakeMember(gateway, guild, f"noisy{i}") for i in range(args.noise)]
+    for member in noisy:
+        lobby_voice._fake_members.append(member)
+        member.voice_channel = lobby_voice
+    top_rate = max(args.rates)
+    results["voice_noise"] = await run_scenario(gateway, sampler, "voice_noise", len(noisy), top_rate, lambda i: gateway.voice_noise(noisy[i]))
+    results["message_noise"] = await run_scenario(gateway, sampler, "message_noise", len(noisy), top_rate,
+                                                  lambda i: gateway.message(noisy[i], lobby_text, "hello", op="message_noise"))
+
+    writers = [FakeMember(gateway, guild, f"writer{i}") for i in range(args.messages)]
+    results["message_hosting"] = await run_scenario(gateway, sampler, "message_hosting", len(writers), top_rate,
+                                                    lambda i: gateway.message(writers[i], text_hosting, "channel please", op="message_hosting"))
+
+    slashers = [FakeMember(gateway, guild, f"slash{i}") for i in range(args.messages)]
+    # hostings, the lobby and the parked channels of the rejoiners stay: only count what /create_temp creates
+    known_voice = voice_channel_ids()
+    results["slash_create_temp"] = await run_scenario(gateway, sampler, "slash_create_temp", len(slashers), top_rate,
+                                                      lambda i: gateway.slash_create_temp(slashers[i], lobby_text, f"room{i}"),
+                                                      settle=lambda: wait_for(lambda: not temp_voice_left(known_voice), args.delete_delay + 30.0))
+
+    await m.STORAGE.flush()
+    return results
+
+
+# ---------------------------
+# Baseline comparison
+# ---------------------------
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> List[str]:
+    regressions = []
+    base_scenarios = baseline.get("scenarios", {})
+    for name, current in results["scenarios"].items():
+        base = base_scenarios.get(name)
+        if not base:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = base.get(metric, 0.0), current.get(metric, 0.0)
+            # sub-millisecond timings are noise: a latency regression must also exceed min_delta_ms
+            if metric.endswith("_ms") and new - old < min_delta_ms:
+                continue
+            if old > 0 and new > old * (1.0 + tolerance):
+                regressions.append(f"{name}.{metric}: {old} -> {new} (+{(new / old - 1.0) * 100.0:.0f}%)")
+    old_rss, new_rss = baseline.get("peak_rss_kb", 0), results.get("peak_rss_kb", 0)
+    if old_rss and new_rss > old_rss * (1.0 + tolerance):
+        regressions.append(f"peak_rss_kb: {old_rss} -> {new_rss}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="75bot in-process gateway load benchmark")
+    parser.add_argument("--rates", default="100,500,2000", help="voice join/leave rates to sweep (ops/s, comma separated)")
+    parser.add_argument("--joins", type=int, default=1000, help="members joining the voice hosting channel per rate")
+    parser.add_argument("--messages", type=int, default=500, help="messages in the text hosting channel / slash invocations")
+    parser.add_argument("--noise", type=int, default=5000, help="irrelevant voice updates and messages")
+    parser.add_argument("--rest-latency-ms", type=float, default=20.0, help="fake REST call latency")
+    parser.add_argument("--rest-jitter-ms", type=float, default=10.0, help="extra random REST latency (uniform)")
+    parser.add_argument("--delete-delay", type=float, default=0.05, help="EMPTY_CHANNEL_DELETE_SECONDS used during the run")
+    parser.add_argument("--seed", type=int, default=75)
+    parser.add_argument("--out", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression vs baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore latency regressions smaller than this")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's own log output")
+    args = parser.parse_args(argv)
+    args.rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    # the bot runs in a throwaway directory: resolve output paths first
+    args.out = os.path.abspath(args.out) if args.out else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = tempfile.mkdtemp(prefix="75bot-bench-")
+    m = load_bot_module(workdir, args.delete_delay, args.verbose)
+    if not args.verbose:
+        # startup messages still go through print()
+        m.print = lambda *a, **k: None
+    scenarios = asyncio.run(run_benchmark(m, args))
+    m.STORAGE.close()
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "verbose", "tolerance", "min_delta_ms")},
+        "storage_backend": m.STORAGE_BACKEND,
+        "python": sys.version.split()[0],
+        "scenarios": scenarios,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
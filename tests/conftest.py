@@ -0,0 +1,55 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# les tests réutilisent les faux objets Discord du banc d'essai
+sys.path.insert(0, ROOT)
+
+import bench_gateway  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def bot(tmp_path_factory):
+    """
+    Le module du bot (75botV5.py n'est pas importable par son nom), chargé depuis un dossier temporaire :
+    son chargement au démarrage (STORAGE.load) ne touche pas aux données du dépôt.
+    """
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("import"))
+    try:
+        spec = importlib.util.spec_from_file_location("bot75", os.path.join(ROOT, "75botV5.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["bot75"] = module
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+@pytest.fixture
+def state(bot, tmp_path, monkeypatch):
+    """
+    État vide pour un test : DATA, index, files d'échéances et stockage JSON neufs, fichiers écrits dans tmp_path.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bot, "DATA", bot.empty_data_template())
+    monkeypatch.setattr(bot, "STORAGE", bot.WriteBehindSaver(lambda: bot.DATA, 0.01))
+    monkeypatch.setattr(bot, "TEMP_REGISTRY", bot.TempChannelRegistry())
+    monkeypatch.setattr(bot, "ROUTING", bot.RoutingIndex())
+    monkeypatch.setattr(bot, "EMPTY_CHANNEL_SCHEDULERS", {})
+    # langues mémoïsées pour le DATA précédent
+    bot.invalidate_lang_cache()
+    return bot.DATA
+
+
+@pytest.fixture
+def gateway(bot, state, monkeypatch):
+    """
+    Faux serveurs / salons / membres du banc d'essai (bench_gateway.py), sans latence REST.
+    """
+    # FakeGateway remplace bot.get_channel : restauré après le test
+    monkeypatch.setattr(bot.bot, "get_channel", bot.bot.get_channel)
+    return bench_gateway.FakeGateway(bot, bench_gateway.FakeRest(0.0, 0.0))
@@ -0,0 +1,63 @@
+def test_token_bucket_refill(bot):
+    bucket = bot.TokenBucket(per_minute=60, burst=3, now=0.0)
+    assert bucket.refill(0.0) == 3
+    bucket.tokens = 0.0
+    assert bucket.refill(0.5) == 0.5
+    assert bucket.refill(1.0) == 1.0
+    # jamais au-delà de la rafale
+    assert bucket.refill(100.0) == 3
+
+
+def test_admission_rate_limit_refills(bot, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(bot.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(bot.AdmissionController, "overloaded", staticmethod(lambda guild_id: False))
+    monkeypatch.setattr(bot, "get_temp_quota", lambda guild_id: 100)
+    monkeypatch.setitem(bot.AdmissionController.LIMITS, "user", (6, 3))
+    admission = bot.AdmissionController()
+
+    for _ in range(3):
+        assert admission.reserve(1, 7) is None
+    assert admission.reserve(1, 7) == "rate_limited"
+    # 6 créations / minute : un jeton toutes les 10 s
+    clock[0] += 5
+    assert admission.reserve(1, 7) == "rate_limited"
+    clock[0] += 5
+    assert admission.reserve(1, 7) is None
+    assert admission.stats["admitted"] == 4
+    assert admission.stats["rate_limited"] == 2
+
+
+def test_admission_quota_counts_reservations(bot, state, monkeypatch):
+    monkeypatch.setattr(bot.AdmissionController, "overloaded", staticmethod(lambda guild_id: False))
+    monkeypatch.setattr(bot, "get_temp_quota", lambda guild_id: 2)
+    admission = bot.AdmissionController()
+    bot.add_temp_channel_record(1, 20, 7)
+
+    # un canal existant + une création en cours : quota atteint
+    assert admission.reserve(1, 7) is None
+    assert admission.reserve(1, 7) == "quota"
+    admission.release(1, 7)
+    assert admission.reserve(1, 7) is None
+    assert admission.reserve(1, 8) is None
+    assert admission.stats["quota"] == 1
+
+
+def test_admission_debits_all_buckets_or_none(bot, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(bot.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(bot.AdmissionController, "overloaded", staticmethod(lambda guild_id: False))
+    monkeypatch.setattr(bot, "get_temp_quota", lambda guild_id: 100)
+    monkeypatch.setitem(bot.AdmissionController.LIMITS, "user", (60, 5))
+    monkeypatch.setitem(bot.AdmissionController.LIMITS, "hosting", (60, 2))
+    monkeypatch.setitem(bot.AdmissionController.LIMITS, "guild", (0, 0))
+    admission = bot.AdmissionController()
+
+    assert admission.reserve(1, 7, hosting_id=10) is None
+    assert admission.reserve(1, 8, hosting_id=10) is None
+    # seau du hosting channel vide : refus, et le seau du membre n'est pas débité
+    assert admission.reserve(1, 7, hosting_id=10) == "rate_limited"
+    assert admission._buckets[("user", 7)].tokens == 4
+    # portée désactivée (0 / minute) : pas de seau
+    assert ("guild", 1) not in admission._buckets
+    assert admission.reserve(1, 7, hosting_id=11) is None
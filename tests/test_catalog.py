@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+TEMPLATES = [
+    "plain text",
+    "Hello {user}!",
+    "{a}{b} and {a}",
+    "{n:>4} / {ratio:.1%}",
+    "{user!r}",
+    "{obj.real} attr",
+    "{items[0]} item",
+]
+KWARGS = {"user": "Ana", "a": 1, "b": "x", "n": 7, "ratio": 0.25, "obj": 3, "items": ["i0"]}
+
+
+@pytest.fixture
+def catalog(bot, tmp_path):
+    for lang, entries in {
+        "fr": {"_name": "Français", "hello": "Bonjour {user}", "only_fr": "seulement fr", "broken": "{missing}"},
+        "en": {"_name": "English", "hello": "Hello {user}"},
+    }.items():
+        with open(tmp_path / f"{lang}.json", "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+    return bot.TranslationCatalog(str(tmp_path), "fr")
+
+
+def test_catalog_loads_locales_lazily(catalog):
+    assert catalog.available() == ["en", "fr"]
+    assert catalog._bundles == {}
+    assert catalog.render("en", "hello", {"user": "Ana"}) == "Hello Ana"
+    assert list(catalog._bundles) == ["en"]
+    assert catalog.display_name("fr") == "Français"
+
+
+def test_catalog_falls_back_to_default_then_key(catalog):
+    assert catalog.render("en", "only_fr", {}) == "seulement fr"
+    assert catalog.render("de", "hello", {"user": "Ana"}) == "Bonjour Ana"
+    assert catalog.render("en", "unknown_key", {"user": "Ana"}) == "unknown_key"
+    # argument manquant : texte brut plutôt qu'une exception
+    assert catalog.render("fr", "broken", {"user": "Ana"}) == "{missing}"
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_compiled_templates_match_str_format(bot, template):
+    assert bot._render_template(bot._compile_template(template), KWARGS) == template.format(**KWARGS)
+
+
+def test_non_identifier_fields_keep_str_format(bot):
+    for template in ("{0} first", "{obj.real} attr", "{items[0]} item", "{} auto"):
+        assert bot._compile_template(template) == ("format", template)
+    assert isinstance(bot._compile_template("Hello {user}!"), list)
+
+
+def test_lang_cache_follows_set_entry(bot, state):
+    assert bot.get_lang_pref(bot.DATA, 1, 5, 40) == bot.DEFAULT_LANG
+    bot.set_entry("server_lang", "1", "ar")
+    assert bot.get_lang_pref(bot.DATA, 1, 5, 40) == "ar"
+    bot.set_entry("channel_lang", "40", "fr", home_guild=1)
+    assert bot.get_lang_pref(bot.DATA, 1, 5, 40) == "fr"
+    bot.set_entry("user_lang", "5", "en")
+    assert bot.get_lang_pref(bot.DATA, 1, 5, 40) == "en"
+    assert bot.tr(bot.DATA, 1, 5, 40, "unknown_key") == "unknown_key"
+    bot.set_entry("user_lang", "5", None)
+    assert bot.get_lang_pref(bot.DATA, 1, 5, 40) == "fr"
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import pytest
+from discord import app_commands
+
+
+@pytest.fixture
+def synced(bot, tmp_path, monkeypatch):
+    """
+    Appels à bot.tree.sync (scope de chaque appel), avec un état de sync vide dans tmp_path.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bot, "_synced_scopes", set())
+    monkeypatch.setattr(bot, "COMMAND_SYNC_MODE", "auto")
+    monkeypatch.setattr(bot, "COMMAND_SYNC_GUILDS", [])
+    calls = []
+
+    async def sync(guild=None):
+        calls.append(guild.id if guild is not None else None)
+        return bot.bot.tree.get_commands(guild=guild)
+
+    monkeypatch.setattr(bot.bot.tree, "sync", sync)
+    return calls
+
+
+def _new_process(bot, monkeypatch):
+    # un redémarrage : seules les empreintes de COMMAND_SYNC_FILE restent
+    monkeypatch.setattr(bot, "_synced_scopes", set())
+
+
+def test_unchanged_tree_skips_sync(bot, synced, monkeypatch):
+    asyncio.run(bot.sync_command_tree())
+    assert synced == [None]
+    with open(bot.COMMAND_SYNC_FILE, "r", encoding="utf-8") as f:
+        assert list(json.load(f).values()) == [bot.command_tree_fingerprint()]
+
+    # reconnexion du même processus, puis redémarrage avec les mêmes commandes : aucun sync
+    asyncio.run(bot.sync_command_tree())
+    _new_process(bot, monkeypatch)
+    asyncio.run(bot.sync_command_tree())
+    assert synced == [None]
+
+
+def test_changed_tree_resyncs_and_persists(bot, synced, monkeypatch):
+    asyncio.run(bot.sync_command_tree())
+    before = bot.command_tree_fingerprint()
+
+    async def extra(interaction):
+        pass
+
+    command = app_commands.Command(name="zz_test_extra", description="test", callback=extra)
+    bot.bot.tree.add_command(command)
+    try:
+        after = bot.command_tree_fingerprint()
+        _new_process(bot, monkeypatch)
+        asyncio.run(bot.sync_command_tree())
+    finally:
+        bot.bot.tree.remove_command("zz_test_extra")
+    assert after != before
+    assert synced == [None, None]
+    with open(bot.COMMAND_SYNC_FILE, "r", encoding="utf-8") as f:
+        assert list(json.load(f).values()) == [after]
+
+
+def test_guild_sync_targets_only_the_guild(bot, synced, monkeypatch):
+    monkeypatch.setattr(bot, "COMMAND_SYNC_GUILDS", [42])
+    try:
+        asyncio.run(bot.sync_command_tree())
+        fingerprint = bot.command_tree_fingerprint(bot.discord.Object(id=42))
+    finally:
+        bot.bot.tree.clear_commands(guild=bot.discord.Object(id=42))
+    assert synced == [42]
+    with open(bot.COMMAND_SYNC_FILE, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    assert list(state) == [f"{bot.bot.application_id}:42"]
+    assert state[f"{bot.bot.application_id}:42"] == fingerprint
+
+
+def test_sync_off(bot, synced, monkeypatch):
+    monkeypatch.setattr(bot, "COMMAND_SYNC_MODE", "off")
+    asyncio.run(bot.sync_command_tree())
+    assert synced == []
@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import bench_gateway
+
+
+def _text_hosting(bot, gateway, monkeypatch):
+    expirer = bot.TextIdleExpirer(60, 25)
+    monkeypatch.setattr(bot, "IDLE_EXPIRER", expirer)
+    guild = bench_gateway.FakeGuild(gateway, "idle")
+    hosting = gateway.add_channel(bench_gateway.FakeTextChannel(gateway, guild, "hosting"))
+    info = {"type": "text", "temp_category_id": None, "owner_id": 1, "template": {"idle_minutes": 10, "idle_warning_minutes": 2}}
+    bot.set_entry("hosting_channels", str(hosting.id), info, guild_id=guild.id)
+    return expirer, guild, hosting
+
+
+def _temp(bot, gateway, expirer, guild, hosting, idle_minutes, cls=bench_gateway.FakeTextChannel, kind="text"):
+    channel = gateway.add_channel(cls(gateway, guild, "temp"))
+    bot.add_temp_channel_record(guild.id, channel.id, 7, origin_id=hosting.id, kind=kind)
+    bot.TEMP_REGISTRY.touch(channel.id, time.time() - idle_minutes * 60)
+    # dernier message connu au démarrage : inscrit à sa vraie échéance
+    expirer.track(bot.TEMP_REGISTRY.get(channel.id))
+    return channel
+
+
+def test_idle_sweep_warns_then_expires(bot, gateway, monkeypatch):
+    expirer, guild, hosting = _text_hosting(bot, gateway, monkeypatch)
+    expired = _temp(bot, gateway, expirer, guild, hosting, 11)
+    warned = _temp(bot, gateway, expirer, guild, hosting, 9)
+    active = _temp(bot, gateway, expirer, guild, hosting, 1)
+    voice = _temp(bot, gateway, expirer, guild, hosting, 60, cls=bench_gateway.FakeVoiceChannel, kind="voice")
+
+    asyncio.run(expirer.sweep_guild(guild))
+    assert guild.get_channel(expired.id) is None
+    assert expired.id not in bot.TEMP_REGISTRY
+    assert gateway.rest.calls.get("send") == 1
+    assert expirer.stats == {"sweeps": 0, "warned": 1, "expired": 1}
+    # averti : réinscrit à son expiration, pas averti une seconde fois
+    assert expirer._due[warned.id] == bot.TEMP_REGISTRY.get(warned.id).last_active + 600
+    asyncio.run(expirer.sweep_guild(guild))
+    assert expirer.stats["warned"] == 1
+    assert {active.id, voice.id, warned.id} <= set(guild.channels)
+    assert voice.id not in expirer._due
+
+
+def test_idle_activity_postpones_expiry(bot, gateway, monkeypatch):
+    expirer, guild, hosting = _text_hosting(bot, gateway, monkeypatch)
+    channel = _temp(bot, gateway, expirer, guild, hosting, 11)
+    # un message arrive après l'inscription : on_message ne touche qu'à last_active
+    bot.TEMP_REGISTRY.touch(channel.id)
+
+    asyncio.run(expirer.sweep_guild(guild))
+    assert channel.id in guild.channels
+    assert expirer.stats["expired"] == 0
+    assert expirer._due[channel.id] > time.time() + 7 * 60
+
+
+def test_idle_sweep_visits_only_due_guilds(bot, gateway, monkeypatch):
+    expirer, guild, hosting = _text_hosting(bot, gateway, monkeypatch)
+    quiet = bench_gateway.FakeGuild(gateway, "quiet")
+    _temp(bot, gateway, expirer, guild, hosting, 11)
+    _temp(bot, gateway, expirer, quiet, hosting, 1)
+    visited = []
+
+    def get_guild(guild_id):
+        visited.append(guild_id)
+        return {guild.id: guild, quiet.id: quiet}[guild_id]
+
+    monkeypatch.setattr(bot.bot, "get_guild", get_guild)
+    asyncio.run(expirer.sweep())
+    assert visited == [guild.id]
+    assert expirer.stats["expired"] == 1
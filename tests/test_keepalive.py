@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import bench_gateway
+
+
+def _configs(bot, gateway, count, **cfg):
+    guild = bench_gateway.FakeGuild(gateway, "keepalive")
+    channel = gateway.add_channel(bench_gateway.FakeTextChannel(gateway, guild, "keepalive"))
+    gids = []
+    for i in range(count):
+        gid = str(1000 + i)
+        bot.set_entry("keepalive_config", gid, dict({"channel_id": channel.id, "message": "ping", "interval_minutes": 5}, **cfg))
+        gids.append(gid)
+    return channel, gids
+
+
+def _due(engine):
+    return {gid: due for due, seq, gid in engine._heap if engine._entries.get(gid) == seq}
+
+
+def test_keepalive_due_order_and_sub_minute_intervals(bot, state):
+    engine = bot.KeepaliveEngine(10, 0.0, 0.0)
+    now = time.time()
+    state["keepalive_config"] = {
+        "1": {"channel_id": 1, "interval_seconds": 20, "last_sent": now - 5},
+        "2": {"channel_id": 1, "interval_minutes": 1, "last_sent": now - 50},
+        "3": {"channel_id": 1, "interval_seconds": 3, "last_sent": now},     # plancher KEEPALIVE_MIN_INTERVAL_SECONDS
+        "4": {"channel_id": 1, "interval_minutes": 5, "last_sent": now},
+    }
+    for gid in state["keepalive_config"]:
+        engine.update(gid)
+    due = _due(engine)
+    assert [gid for _, _, gid in sorted(engine._heap)] == ["2", "3", "1", "4"]
+    assert abs(due["1"] - (now + 15)) < 0.01
+    assert abs(due["3"] - (now + bot.KEEPALIVE_MIN_INTERVAL_SECONDS)) < 0.01
+
+    # config supprimée : plus d'échéance
+    del state["keepalive_config"]["4"]
+    engine.update("4")
+    assert "4" not in _due(engine)
+
+
+def test_keepalive_late_configs_spread_over_jitter_window(bot, state):
+    engine = bot.KeepaliveEngine(10, 0.0, 0.1)
+    state["keepalive_config"] = {str(i): {"channel_id": 1, "interval_minutes": 10, "last_sent": 0} for i in range(50)}
+    now = time.time()
+    for gid in state["keepalive_config"]:
+        engine.update(gid)
+    due = list(_due(engine).values())
+    # en retard : pas tous à la même seconde, mais tous dans la fenêtre de gigue (10 % de l'intervalle)
+    assert all(now <= d <= now + 60 + 0.01 for d in due)
+    assert max(due) - min(due) > 10
+
+
+def test_keepalive_dispatch_batches_saves_and_retries(bot, gateway):
+    channel, gids = _configs(bot, gateway, 3)
+    missing = gids[2]
+    bot.DATA["keepalive_config"][missing]["channel_id"] = 1
+    engine = bot.KeepaliveEngine(10, 0.0, 0.0)
+
+    async def scenario():
+        flushes = bot.STORAGE.stats["flushes"]
+        await engine._dispatch([(gid, time.time()) for gid in gids])
+        await asyncio.sleep(0.05)
+        return bot.STORAGE.stats["flushes"] - flushes
+
+    started = time.time()
+    assert asyncio.run(scenario()) == 1
+    assert gateway.rest.calls["send"] == 2
+    for gid in gids[:2]:
+        assert bot.DATA["keepalive_config"][gid]["last_sent"] >= started
+        assert abs(_due(engine)[gid] - (bot.DATA["keepalive_config"][gid]["last_sent"] + 300)) < 0.01
+    # envoi impossible : last_sent inchangé, nouvel essai après KEEPALIVE_RETRY_SECONDS
+    assert "last_sent" not in bot.DATA["keepalive_config"][missing]
+    assert abs(_due(engine)[missing] - (started + bot.KEEPALIVE_RETRY_SECONDS)) < 1
+    assert engine.stats["sent"] == 2 and engine.stats["failed"] == 1
+
+
+def test_keepalive_skips_config_replaced_during_send(bot, gateway):
+    channel, (gid,) = _configs(bot, gateway, 1)
+    engine = bot.KeepaliveEngine(10, 0.0, 0.0)
+    replacement = {"channel_id": channel.id, "message": "new", "interval_minutes": 1}
+
+    async def send(content=None, **kwargs):
+        bot.set_entry("keepalive_config", gid, replacement)
+        engine.update(gid)
+
+    channel.send = send
+    asyncio.run(engine._dispatch([(gid, time.time())]))
+    # la nouvelle config garde son échéance et n'hérite pas du last_sent de l'ancienne
+    assert bot.DATA["keepalive_config"][gid] is replacement
+    assert "last_sent" not in replacement
+    assert len(_due(engine)) == 1
+
+
+def test_keepalive_paces_guilds_sharing_a_channel(bot, gateway):
+    channel, gids = _configs(bot, gateway, 3)
+    engine = bot.KeepaliveEngine(10, 0.05, 0.0)
+    sent = []
+
+    async def send(content=None, **kwargs):
+        sent.append(time.monotonic())
+
+    channel.send = send
+    asyncio.run(engine._dispatch([(gid, time.time()) for gid in gids]))
+    gaps = [b - a for a, b in zip(sent, sent[1:])]
+    assert len(sent) == 3
+    assert all(gap >= 0.045 for gap in gaps)
+
+
+def test_keepalive_heap_compacts_stale_entries(bot, state):
+    engine = bot.KeepaliveEngine(10, 0.0, 0.0)
+    state["keepalive_config"] = {"1": {"channel_id": 1, "interval_minutes": 5}}
+    for _ in range(500):
+        engine.update("1")
+        engine.remove("1")
+    assert len(engine._heap) <= 64
+    engine.update("1")
+    assert list(_due(engine)) == ["1"]
@@ -0,0 +1,105 @@
+import io
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+
+def _logger(bot, queue_size=100, sample=None, error_window=60.0, level="debug"):
+    """
+    Logger sans thread d'écriture : les entrées restent dans la file jusqu'à _drained().
+    """
+    logger = bot.StructuredLogger(None, level, queue_size, sample or {}, error_window)
+    logger._ensure_thread = lambda: None
+    return logger
+
+
+def _drained(logger):
+    stream = io.StringIO()
+    logger._drain(stream)
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_line_shape(bot):
+    logger = _logger(bot, level="info")
+    logger.debug("hidden", "below the level")
+    logger.info("temp_created", "Salon créé", guild=SimpleNamespace(id=1), user=7, channel=SimpleNamespace(id=40), kind="voice")
+    try:
+        raise ValueError("bad value")
+    except ValueError:
+        logger.error("handler_error", "Erreur")
+
+    info, error = _drained(logger)
+    assert set(info) == {"ts", "level", "event", "msg", "guild", "user", "channel", "kind"}
+    assert (info["level"], info["event"], info["guild"], info["user"], info["channel"], info["kind"]) == ("info", "temp_created", 1, 7, 40, "voice")
+    assert error["level"] == "error"
+    assert error["exc"].startswith("Traceback") and "ValueError: bad value" in error["exc"]
+    assert logger.stats["written"] == 2
+
+
+def test_full_queue_drops_oldest(bot):
+    logger = _logger(bot, queue_size=2)
+    for i in range(3):
+        logger.info(f"event_{i}")
+    assert logger.stats["dropped"] == 1
+    assert [entry["event"] for entry in _drained(logger)] == ["event_1", "event_2"]
+
+
+def test_repeated_errors_suppressed_within_window(bot):
+    logger = _logger(bot, error_window=0.05)
+    for _ in range(3):
+        logger.error("flush_error", "boom", exc=RuntimeError("disk full"))
+    # autre exception, même événement : fenêtre distincte
+    logger.error("flush_error", "boom", exc=OSError("gone"))
+    assert logger.stats["suppressed"] == 2
+    assert len(_drained(logger)) == 2
+
+    time.sleep(0.06)
+    logger.error("flush_error", "boom", exc=RuntimeError("disk full"))
+    (entry,) = _drained(logger)
+    assert entry["repeated"] == 2
+    # le compte repart de zéro après avoir été signalé
+    time.sleep(0.06)
+    logger.error("flush_error", "boom", exc=RuntimeError("disk full"))
+    assert "repeated" not in _drained(logger)[0]
+
+
+def test_per_event_sampling(bot, monkeypatch):
+    draws = iter([0.1, 0.9, 0.3, 0.7, 0.0])
+    monkeypatch.setattr(bot.random, "random", lambda: next(draws))
+    logger = _logger(bot, sample={"noisy": 0.5, "never": 0.0})
+    for _ in range(4):
+        logger.info("noisy")
+    logger.info("never")
+    logger.info("other")
+    entries = _drained(logger)
+    assert [entry["event"] for entry in entries] == ["noisy", "noisy", "other"]
+    assert entries[0]["sample"] == 0.5 and "sample" not in entries[-1]
+    assert logger.stats["sampled_out"] == 3
+
+
+def test_concurrent_logging_from_threads(bot, tmp_path):
+    path = tmp_path / "log.jsonl"
+    logger = bot.StructuredLogger(str(path), "info", 100_000, {}, 60.0)
+    barrier = threading.Barrier(8)
+
+    def worker(n):
+        barrier.wait()
+        for i in range(500):
+            logger.error("repeated_error", "same")
+            # assez de clés distinctes pour déclencher la purge des fenêtres pendant les insertions
+            logger.error("distinct_error", f"worker {n} #{i}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writers = [t for t in threading.enumerate() if t.name == "log-writer" and t is logger._thread]
+    logger.close()
+
+    assert len(writers) == 1
+    assert logger.stats["suppressed"] == 8 * 500 - 1
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == logger.stats["written"] == 1 + 8 * 500
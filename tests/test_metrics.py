@@ -0,0 +1,43 @@
+def test_counter_and_gauge_rendering(bot):
+    registry = bot.MetricsRegistry("t_")
+    created = registry.counter("created_total", "Created", ("guild", "kind"))
+    created.inc(2, "voice")
+    created.inc(1, "text", amount=2)
+    created.inc(2, "voice")
+    registry.gauge_func("queue", "Queue", lambda: {("a\"b",): 3, ("nan",): float("nan")}, ("name",))
+    registry.gauge_func("lag_seconds", "Lag", lambda: 0.25)
+
+    assert registry.render() == (
+        "# HELP t_created_total Created\n"
+        "# TYPE t_created_total counter\n"
+        't_created_total{guild="1",kind="text"} 2\n'
+        't_created_total{guild="2",kind="voice"} 2\n'
+        "# HELP t_queue Queue\n"
+        "# TYPE t_queue gauge\n"
+        't_queue{name="a\\"b"} 3\n'
+        "# HELP t_lag_seconds Lag\n"
+        "# TYPE t_lag_seconds gauge\n"
+        "t_lag_seconds 0.25\n"
+    )
+
+
+def test_histogram_rendering_is_cumulative(bot):
+    registry = bot.MetricsRegistry("t_")
+    hist = registry.histogram("duration_seconds", "Duration", ("handler",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, "on_message")
+
+    assert registry.render().splitlines()[2:] == [
+        't_duration_seconds_bucket{handler="on_message",le="0.1"} 1',
+        't_duration_seconds_bucket{handler="on_message",le="1"} 3',
+        't_duration_seconds_bucket{handler="on_message",le="+Inf"} 4',
+        't_duration_seconds_sum{handler="on_message"} 4.05',
+        't_duration_seconds_count{handler="on_message"} 4',
+    ]
+
+
+def test_failing_gauge_does_not_break_the_page(bot):
+    registry = bot.MetricsRegistry("t_")
+    registry.gauge_func("broken", "Broken", lambda: 1 / 0)
+    registry.counter("ok_total", "Ok").inc()
+    assert registry.render().splitlines()[-1] == "t_ok_total 1"
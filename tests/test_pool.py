@@ -0,0 +1,70 @@
+import asyncio
+
+import bench_gateway
+
+
+def _voice_hosting(bot, gateway, pool_size):
+    guild = bench_gateway.FakeGuild(gateway, "pool")
+    hosting = gateway.add_channel(bench_gateway.FakeVoiceChannel(gateway, guild, "hosting"))
+    info = {"type": "voice", "temp_category_id": None, "owner_id": 1, "template": {"pool_size": pool_size}}
+    bot.set_entry("hosting_channels", str(hosting.id), info, guild_id=guild.id)
+    return guild, hosting, info
+
+
+def _member(gateway, guild):
+    member = bench_gateway.FakeMember(gateway, guild, "member")
+
+    async def move_to(channel, **kwargs):
+        member.voice_channel = channel
+
+    member.move_to = move_to
+    return member
+
+
+def test_pool_claim_and_refill(bot, gateway):
+    pool = bot.VoiceChannelPool()
+    guild, hosting, info = _voice_hosting(bot, gateway, pool_size=2)
+
+    async def scenario():
+        pool.warm(guild)
+        await asyncio.sleep(0.01)
+        warmed = pool.idle_channels(guild.id, hosting.id)
+        member = _member(gateway, guild)
+        channel = await pool.claim(guild, member, hosting.id, info)
+        await asyncio.sleep(0.01)
+        return warmed, member, channel
+
+    warmed, member, channel = asyncio.run(scenario())
+    assert len(warmed) == 1
+    # le membre reçoit le canal préchauffé, le pool est remis à niveau en arrière-plan
+    assert channel.id == warmed[0]
+    assert member.voice_channel is channel
+    assert bot.TEMP_REGISTRY.get(channel.id).owner_id == member.id
+    assert channel.name == "member's Channel"
+    refilled = pool.idle_channels(guild.id, hosting.id)
+    assert len(refilled) == 1 and refilled[0] != channel.id
+    assert pool.stats == {"claimed": 1, "misses": 0, "created": 2, "trimmed": 0}
+
+
+def test_pool_empties_when_quiet_and_refills_on_join(bot, gateway, monkeypatch):
+    monkeypatch.setattr(bot, "POOL_TRIM_SECONDS", 0.05)
+    pool = bot.VoiceChannelPool()
+    guild, hosting, info = _voice_hosting(bot, gateway, pool_size=2)
+
+    async def scenario():
+        pool.warm(guild)
+        await asyncio.sleep(0.01)
+        assert len(pool.idle_channels(guild.id, hosting.id)) == 1
+        # pas d'arrivée pendant POOL_TRIM_SECONDS : plus aucun canal caché, et plus d'échéance
+        await asyncio.sleep(0.1)
+        assert pool.idle_channels(guild.id, hosting.id) == []
+        assert len(pool._scheduler) == 0
+        # l'arrivée suivante passe par la création normale et relance le remplissage
+        assert await pool.claim(guild, _member(gateway, guild), hosting.id, info) is None
+        await asyncio.sleep(0.01)
+        assert len(pool.idle_channels(guild.id, hosting.id)) == 1
+
+    asyncio.run(scenario())
+    assert pool.stats["trimmed"] == 1
+    assert pool.stats["misses"] == 1
+    assert len([ch for ch in guild.channels.values() if ch.name == bot.VOICE_POOL_CHANNEL_NAME]) == 1
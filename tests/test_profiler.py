@@ -0,0 +1,47 @@
+import asyncio
+import os
+import time
+
+
+async def busy_loop_for_test(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+        # rend la main à la boucle de temps en temps, comme un vrai handler
+        if int(time.perf_counter() * 1000) % 50 == 0:
+            await asyncio.sleep(0)
+
+
+def test_cpu_report_names_busy_coroutine(bot, tmp_path):
+    profiler = bot.PerfProfiler()
+    raw_path = str(tmp_path / "cpu.folded")
+
+    async def scenario():
+        busy = asyncio.ensure_future(busy_loop_for_test(0.4))
+        report = await profiler._cpu(0.3, 10, raw_path)
+        await busy
+        return report
+
+    report = asyncio.run(scenario())
+    assert "busy_loop_for_test" in report
+    with open(raw_path, encoding="utf-8") as f:
+        assert "busy_loop_for_test" in f.read()
+
+
+def test_second_concurrent_profile_refused(bot, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "PROFILE_DIR", str(tmp_path))
+    profiler = bot.PerfProfiler()
+
+    async def scenario():
+        first = asyncio.ensure_future(profiler.run("cpu", 1, 5))
+        await asyncio.sleep(0)
+        assert profiler.busy
+        second = await profiler.run("cpu", 1, 5)
+        return second, await first
+
+    second, first = asyncio.run(scenario())
+    assert second is None
+    report, report_path, raw_path = first
+    assert report.startswith("CPU profile:")
+    assert os.path.exists(report_path) and os.path.exists(raw_path)
+    assert not profiler.busy
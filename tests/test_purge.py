@@ -0,0 +1,77 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import discord
+
+import bench_gateway
+
+
+def _temp_channels(bot, gateway):
+    guild = bench_gateway.FakeGuild(gateway, "purge")
+    specs = [  # (classe, propriétaire, catégorie, inactif depuis (s))
+        (bench_gateway.FakeVoiceChannel, 7, 5, 3600),
+        (bench_gateway.FakeTextChannel, 7, 5, 0),
+        (bench_gateway.FakeVoiceChannel, 8, 6, 3600),
+        (bench_gateway.FakeTextChannel, 8, 5, 3600),
+    ]
+    channels = []
+    for cls, owner_id, category_id, idle in specs:
+        channel = gateway.add_channel(cls(gateway, guild, "temp"))
+        channel.category_id = category_id
+        bot.add_temp_channel_record(guild.id, channel.id, owner_id)
+        bot.TEMP_REGISTRY.touch(channel.id, time.time() - idle)
+        channels.append(channel)
+    return guild, [channel.id for channel in channels]
+
+
+def test_select_temp_channels_filters(bot, gateway):
+    guild, ids = _temp_channels(bot, gateway)
+    assert bot.select_temp_channels(guild) == ids
+    assert bot.select_temp_channels(guild, owner_id=7) == ids[:2]
+    assert bot.select_temp_channels(guild, category_id=5) == [ids[0], ids[1], ids[3]]
+    assert bot.select_temp_channels(guild, idle_seconds=600) == [ids[0], ids[2], ids[3]]
+    # le type vient du salon quand l'enregistrement ne le connaît pas
+    assert bot.select_temp_channels(guild, kind="text") == [ids[1], ids[3]]
+    assert bot.select_temp_channels(guild, owner_id=8, category_id=5, idle_seconds=600, kind="text") == [ids[3]]
+
+    # un salon disparu ne correspond plus à un filtre qui a besoin de lui
+    gateway.remove_channel(guild.get_channel(ids[0]))
+    assert bot.select_temp_channels(guild, category_id=5) == [ids[1], ids[3]]
+    assert ids[0] in bot.select_temp_channels(guild, owner_id=7)
+
+
+def test_purge_outcomes_and_single_save(bot, gateway, monkeypatch):
+    monkeypatch.setattr(bot, "PURGE_MAX_RETRIES", 1)
+    guild, ids = _temp_channels(bot, gateway)
+    flushes = []
+    real_flush = bot.STORAGE.flush
+
+    async def flush():
+        flushes.append(len(bot.TEMP_REGISTRY))
+        await real_flush()
+
+    monkeypatch.setattr(bot.STORAGE, "flush", flush)
+    limited, broken, gone = (guild.get_channel(cid) for cid in ids[:3])
+    attempts = []
+
+    async def rate_limited_once(**kwargs):
+        attempts.append(limited.id)
+        if len(attempts) == 1:
+            raise discord.RateLimited(0.0)
+        gateway.remove_channel(limited)
+
+    async def forbidden(**kwargs):
+        raise discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), "missing permissions")
+
+    limited.delete = rate_limited_once
+    broken.delete = forbidden
+    gateway.remove_channel(gone)
+
+    result = asyncio.run(bot.purge_temp_channels(guild, ids))
+    assert result == {"deleted": 2, "missing": 1, "failed": 1}
+    assert attempts == [limited.id, limited.id]
+    # le salon en échec garde son enregistrement ; les autres sont retirés en un seul flush
+    assert list(bot.TEMP_REGISTRY.records) == [broken.id]
+    assert flushes == [1]
+    assert list(bot.DATA["temp_channels"][str(guild.id)]) == [str(broken.id)]
@@ -0,0 +1,45 @@
+import asyncio
+
+import bench_gateway
+
+
+def test_reconcile_prunes_gone_channels_and_keeps_live_ones(bot, gateway):
+    guild = bench_gateway.FakeGuild(gateway, "reconcile")
+    gid = str(guild.id)
+
+    def channel(cls, name):
+        return gateway.add_channel(cls(gateway, guild, name))
+
+    hosting = channel(bench_gateway.FakeVoiceChannel, "hosting")
+    empty_voice = channel(bench_gateway.FakeVoiceChannel, "empty")
+    busy_voice = channel(bench_gateway.FakeVoiceChannel, "busy")
+    busy_voice._fake_members.append(bench_gateway.FakeMember(gateway, guild, "member"))
+    text = channel(bench_gateway.FakeTextChannel, "text")
+    text.last_message_id = None
+    pooled = channel(bench_gateway.FakeVoiceChannel, bot.VOICE_POOL_CHANNEL_NAME)
+    gone_ids = [next(bench_gateway._ids) for _ in range(3)]  # salons supprimés pendant l'arrêt du bot
+
+    # état persistant tel que rechargé au démarrage (sans kind ni last_active)
+    bot.set_entry("hosting_channels", str(hosting.id), {"type": "voice", "temp_category_id": None, "owner_id": 1}, guild_id=gid)
+    bot.set_entry("hosting_channels", str(gone_ids[0]), {"type": "text", "temp_category_id": None, "owner_id": 1}, guild_id=gid)
+    for ch in (empty_voice, busy_voice, text):
+        bot.set_entry("temp_channels", str(ch.id), 7, guild_id=gid)
+    bot.set_entry("temp_channels", str(gone_ids[1]), 7, guild_id=gid)
+    bot.set_entry("temp_origins", str(gone_ids[1]), hosting.id, guild_id=gid)
+    bot.set_entry("voice_pool", str(pooled.id), hosting.id, guild_id=gid)
+    bot.set_entry("voice_pool", str(gone_ids[2]), hosting.id, guild_id=gid)
+    bot.rebuild_index_for_guild(gid)
+
+    counts = asyncio.run(bot.reconcile_guild(guild))
+    assert counts == {"pruned": 3, "rearmed": 1}
+    assert set(bot.DATA["temp_channels"][gid]) == {str(empty_voice.id), str(busy_voice.id), str(text.id)}
+    assert set(bot.DATA["hosting_channels"][gid]) == {str(hosting.id)}
+    assert set(bot.DATA["voice_pool"][gid]) == {str(pooled.id)}
+    assert bot.DATA["temp_origins"][gid] == {}
+    assert gone_ids[1] not in bot.TEMP_REGISTRY
+    assert bot.ROUTING.get(gone_ids[0]) is None
+    # seul le salon vocal vide est réarmé ; le type des enregistrements restaurés est résolu
+    scheduler = bot.empty_channel_scheduler(guild.id)
+    assert scheduler.is_armed(empty_voice.id) and not scheduler.is_armed(busy_voice.id)
+    assert bot.TEMP_REGISTRY.get(text.id).kind == "text"
+    assert bot.TEMP_REGISTRY.get(busy_voice.id).kind == "voice"
@@ -0,0 +1,52 @@
+import bench_gateway
+
+
+def _parked_setup(bot, gateway, recycle_seconds):
+    guild = bench_gateway.FakeGuild(gateway, "recycle")
+    hosting = gateway.add_channel(bench_gateway.FakeVoiceChannel(gateway, guild, "hosting"))
+    info = {"type": "voice", "temp_category_id": None, "owner_id": 1, "template": {"recycle_seconds": recycle_seconds}}
+    bot.set_entry("hosting_channels", str(hosting.id), info, guild_id=guild.id)
+    channels = []
+    for _ in range(2):
+        channel = gateway.add_channel(bench_gateway.FakeVoiceChannel(gateway, guild, "owner's Channel"))
+        bot.add_temp_channel_record(guild.id, channel.id, 7, origin_id=hosting.id, kind="voice")
+        channels.append(channel)
+    return guild, hosting, channels
+
+
+def test_recycle_take_and_release(bot, gateway):
+    recycler = bot.ChannelRecycler()
+    guild, hosting, (first, second) = _parked_setup(bot, gateway, recycle_seconds=120)
+
+    assert recycler.park(first.id) == 120
+    assert recycler.take(guild, 8, hosting.id) is None
+    assert recycler.take(guild, 7, hosting.id) is first
+    # repris une fois : plus garé
+    assert recycler.take(guild, 7, hosting.id) is None
+
+    # un seul salon garé par propriétaire et hosting channel : le dernier remplace le précédent
+    recycler.park(first.id)
+    recycler.park(second.id)
+    assert len(recycler) == 1
+    recycler.release(first.id)
+    assert recycler.take(guild, 7, hosting.id) is second
+
+    recycler.park(first.id)
+    recycler.release(first.id)
+    assert recycler.take(guild, 7, hosting.id) is None
+    assert recycler.stats == {"parked": 4, "recycled": 2}
+
+
+def test_recycle_disabled_or_channel_gone(bot, gateway):
+    recycler = bot.ChannelRecycler()
+    guild, hosting, (first, second) = _parked_setup(bot, gateway, recycle_seconds=0)
+    # fenêtre nulle : suppression habituelle, rien n'est garé
+    assert recycler.park(first.id) == bot.EMPTY_CHANNEL_DELETE_SECONDS
+    assert len(recycler) == 0
+
+    bot.set_entry("hosting_channels", str(hosting.id), {"type": "voice", "temp_category_id": None, "owner_id": 1,
+                                                        "template": {"recycle_seconds": 60}}, guild_id=guild.id)
+    recycler.park(second.id)
+    gateway.remove_channel(second)
+    assert recycler.take(guild, 7, hosting.id) is None
+    assert len(recycler) == 0
@@ -0,0 +1,38 @@
+def test_temp_registry_counts_and_remove(bot):
+    registry = bot.TempChannelRegistry()
+    registry.add(1, 100, 7, origin_id=50, kind="voice")
+    registry.add(2, 100, 7, origin_id=50, kind="text")
+    registry.add(3, 100, 8)
+    registry.add(4, 200, 7)
+    assert registry.count_for(100, 7) == 2
+    assert registry.guild_count(100) == 3
+    assert sorted(registry.from_origin(50)) == [1, 2]
+
+    assert registry.remove(1).channel_id == 1
+    assert registry.remove(1) is None
+    assert registry.count_for(100, 7) == 1
+    assert registry.from_origin(50) == [2]
+
+    registry.remove(4)
+    assert registry.guild_counts() == {100: 2}
+    assert registry.count_for(200, 7) == 0
+    assert len(registry) == 2
+
+
+def test_temp_registry_transfer_and_rebuild(bot):
+    registry = bot.TempChannelRegistry()
+    registry.add(1, 100, 7, created_at=10.0)
+    registry.add(2, 100, 7, created_at=5.0)
+    registry.add(3, 100, 8, origin_id=50)
+    assert registry.owned_by(100, 7) == [2, 1]
+
+    registry.transfer(1, 8)
+    assert registry.count_for(100, 7) == 1
+    assert registry.count_for(100, 8) == 2
+
+    # resynchronisation avec DATA : 2 disparaît, 3 change de propriétaire et garde son origine, 4 est restauré
+    registry.rebuild_guild(100, {"1": 8, "3": 9, "4": 7}, {"4": 60})
+    assert 2 not in registry
+    assert registry.get(3).owner_id == 9 and registry.get(3).origin_id == 50
+    assert registry.from_origin(60) == [4]
+    assert [rec.channel_id for rec in registry.oldest(100)] == [1, 3, 4]
@@ -0,0 +1,56 @@
+import asyncio
+
+
+def test_routing_follows_set_entry(bot, state):
+    bot.set_entry("hosting_channels", "10", {"type": "voice", "temp_category_id": None, "owner_id": 1}, guild_id=1)
+    bot.set_entry("hosting_channels", "11", {"type": "text", "temp_category_id": 99, "owner_id": 1}, guild_id=1)
+    bot.set_entry("temp_channels", "20", 7, guild_id=1)
+    assert bot.ROUTING.get(10)[0] == "hosting"
+    assert bot.ROUTING.get(20) == ("temp", 7)
+    assert bot.ROUTING.default_category[1] == 99
+
+    # transfert, puis suppressions : les routes suivent sans reconstruction
+    bot.set_entry("temp_channels", "20", 8, guild_id=1)
+    assert bot.ROUTING.get(20) == ("temp", 8)
+    bot.set_entry("temp_channels", "20", None, guild_id=1)
+    bot.set_entry("hosting_channels", "11", None, guild_id=1)
+    assert bot.ROUTING.get(20) is None
+    assert bot.ROUTING.get(11) is None
+    assert 1 not in bot.ROUTING.default_category
+    assert bot.ROUTING.get(None) is None
+
+
+def test_routing_rebuild_drops_stale_routes(bot, state):
+    bot.set_entry("temp_channels", "20", 7, guild_id=1)
+    bot.set_entry("temp_channels", "30", 7, guild_id=2)
+    # DATA modifié sans passer par set_entry (rechargement du serveur)
+    state["temp_channels"]["1"] = {"21": 9}
+    bot.rebuild_index_for_guild("1")
+    assert bot.ROUTING.get(20) is None
+    assert bot.ROUTING.get(21) == ("temp", 9)
+    assert bot.ROUTING.get(30) == ("temp", 7)
+    assert bot.TEMP_REGISTRY.count_for(1, 7) == 0
+    assert bot.TEMP_REGISTRY.count_for(1, 9) == 1
+
+
+def test_route_lookup_loads_unknown_guild_once(bot, state, monkeypatch):
+    loads = []
+
+    async def load_guild_state(guild_id):
+        loads.append(guild_id)
+        state["temp_channels"][str(guild_id)] = {"20": 7}
+        bot.rebuild_index_for_guild(str(guild_id))
+
+    monkeypatch.setattr(bot, "load_guild_state", load_guild_state)
+    monkeypatch.setattr(bot.STORAGE, "is_loaded", lambda gid: gid in {str(g) for g in loads})
+
+    async def scenario():
+        first = await bot.route_lookup(1, None, 20)
+        # salon ordinaire d'un serveur déjà chargé : une seule recherche, pas de rechargement
+        second = await bot.route_lookup(1, 40)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == [None, ("temp", 7)]
+    assert second == [None]
+    assert loads == [1]
@@ -0,0 +1,51 @@
+import asyncio
+
+
+def test_deadline_scheduler_cancel_and_rearm(bot):
+    fired = []
+
+    async def fire(key):
+        fired.append(key)
+
+    async def scenario():
+        scheduler = bot.DeadlineScheduler("test")
+        scheduler.schedule("a", 0.05, fire, "a")
+        scheduler.schedule("b", 0.05, fire, "b")
+        assert scheduler.cancel("b")
+        assert not scheduler.cancel("b")
+        # réarmer remplace l'échéance précédente
+        scheduler.schedule("a", 0.2, fire, "a")
+        await asyncio.sleep(0.1)
+        assert fired == []
+        assert scheduler.is_armed("a") and not scheduler.is_armed("b")
+        await asyncio.sleep(0.2)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert fired == ["a"]
+    assert len(scheduler) == 0
+    assert scheduler.stats["fired"] == 1
+    assert scheduler.stats["cancelled"] == 1
+
+
+def test_deadline_scheduler_fires_in_order_and_survives_errors(bot):
+    fired = []
+
+    async def fire(key):
+        fired.append(key)
+        if key == "boom":
+            raise RuntimeError("boom")
+
+    async def scenario():
+        scheduler = bot.DeadlineScheduler("test")
+        scheduler.schedule("late", 0.1, fire, "late")
+        scheduler.schedule("boom", 0.02, fire, "boom")
+        # une échéance plus proche réarme le timer
+        scheduler.schedule("early", 0.01, fire, "early")
+        await asyncio.sleep(0.2)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert fired == ["early", "boom", "late"]
+    assert scheduler.stats["fired"] == 3
+    assert scheduler.stats["errors"] == 1
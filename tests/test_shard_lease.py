@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+
+def _leases(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {sid: (worker, expires) for sid, worker, expires in conn.execute("SELECT shard_id, worker, expires FROM shard_leases")}
+    finally:
+        conn.close()
+
+
+def test_lease_acquire_conflict_and_steal_after_expiry(bot, tmp_path):
+    path = str(tmp_path / "cluster.sqlite3")
+    first = bot.ShardLease(path, "worker-0", [0, 1], ttl=0.2)
+    second = bot.ShardLease(path, "worker-1", [1, 2], ttl=30)
+    first.acquire_blocking()
+    assert {sid: worker for sid, (worker, _) in _leases(path).items()} == {0: "worker-0", 1: "worker-0"}
+
+    # shard 1 encore tenu : rien n'est pris, même pas le shard 2 libre
+    conn = second._connect()
+    try:
+        assert second._try_acquire(conn).startswith("worker-0 (pid ")
+        assert 2 not in _leases(path)
+        # bail non renouvelé : il expire et peut être repris
+        time.sleep(0.25)
+        assert second._try_acquire(conn) is None
+    finally:
+        conn.close()
+    assert {sid: worker for sid, (worker, _) in _leases(path).items()} == {0: "worker-0", 1: "worker-1", 2: "worker-1"}
+
+
+def test_lease_renewal_and_release(bot, tmp_path):
+    path = str(tmp_path / "cluster.sqlite3")
+    lease = bot.ShardLease(path, "worker-0", [0], ttl=0.3)
+    lease.acquire_blocking()
+    acquired = _leases(path)[0][1]
+    lease.start_renewal()
+    try:
+        time.sleep(0.45)
+        # renouvelé toutes les ttl / 3 : toujours valide après l'échéance initiale
+        assert _leases(path)[0][1] > acquired
+        assert _leases(path)[0][1] > time.time()
+    finally:
+        lease.release()
+    assert not lease._thread.is_alive()
+    assert _leases(path) == {}
+
+    # libéré : un autre worker prend le shard sans attendre
+    other = bot.ShardLease(path, "worker-1", [0], ttl=30)
+    started = time.monotonic()
+    other.acquire_blocking()
+    assert time.monotonic() - started < 0.5
+    assert _leases(path)[0][0] == "worker-1"
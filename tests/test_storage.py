@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+BACKENDS = ("json", "sqlite", "journal", "sharded")
+
+# (section, key, value, guild_id, home_guild) : même découpage que set_entry()
+CHANGES = [
+    ("hosting_channels", "10", {"type": "voice", "temp_category_id": None, "owner_id": 7, "template": {"user_limit": 4}}, "1", None),
+    ("hosting_channels", "11", {"type": "text", "temp_category_id": 99, "owner_id": 7}, "1", None),
+    ("temp_channels", "20", 7, "1", None),
+    ("temp_origins", "20", 10, "1", None),
+    ("voice_pool", "30", 10, "1", None),
+    ("temp_channels", "21", 8, "2", None),
+    ("temp_channels", "22", 8, "2", None),
+    ("user_lang", "5", "en", None, None),
+    ("channel_lang", "40", "ar", None, "1"),
+    ("server_lang", "2", "fr", None, None),
+    ("keepalive_config", "1", {"channel_id": 50, "interval_minutes": 5, "message": "ping", "last_sent": 1.5}, None, None),
+    # mises à jour et suppressions
+    ("temp_channels", "20", 9, "1", None),
+    ("hosting_channels", "11", None, "1", None),
+    ("temp_channels", "22", None, "2", None),
+]
+
+
+def _set(bot, storage, data, section, key, value, guild_id, home_guild):
+    if guild_id is None and section in bot.GUILD_KEYED_SECTIONS:
+        home_guild = key
+    home = guild_id or home_guild
+    if home is not None:
+        storage.ensure_guild(data, home)
+    bot.apply_change(data, section, guild_id, key, value)
+    storage.record(section, guild_id, key, value, home_guild=home)
+
+
+def _open(bot, holder):
+    storage = bot.create_storage(lambda: holder["data"])
+    holder["data"] = storage.load()
+    for gid in ("1", "2"):
+        storage.ensure_guild(holder["data"], gid)
+    return storage
+
+
+def _persisted(bot, data):
+    # les serveurs vidés n'ont pas besoin d'être conservés
+    out = {}
+    for section in bot.empty_data_template():
+        entries = data.get(section) or {}
+        if section in bot.GUILD_SCOPED_SECTIONS:
+            entries = {gid: mapping for gid, mapping in entries.items() if mapping}
+        out[section] = entries
+    return out
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_round_trip(bot, backend, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bot, "STORAGE_BACKEND", backend)
+    holder = {}
+    storage = _open(bot, holder)
+    for change in CHANGES:
+        _set(bot, storage, holder["data"], *change)
+    expected = _persisted(bot, holder["data"])
+    storage.close()
+
+    reloaded = {}
+    _open(bot, reloaded).close()
+    assert _persisted(bot, reloaded["data"]) == expected
+    assert expected["temp_channels"] == {"1": {"20": 9}, "2": {"21": 8}}
+    assert "11" not in expected["hosting_channels"]["1"]
+
+
+def test_journal_compaction(bot, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def scenario():
+        holder = {}
+        storage = bot.JournalStorage(lambda: holder["data"], bot.JOURNAL_FILE, 0.01, compact_bytes=200)
+        holder["data"] = storage.load()
+        for i in range(20):
+            _set(bot, storage, holder["data"], "temp_channels", str(100 + i), i, "1", None)
+        await storage.flush()
+        while storage._compacting:
+            await asyncio.sleep(0.01)
+        return storage, holder
+
+    storage, holder = asyncio.run(scenario())
+    assert storage.stats["compactions"] == 1
+    assert os.path.getsize(bot.JOURNAL_FILE) == 0
+    with open(bot.DATA_FILE, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["journal_seq"] == 20
+    assert len(snapshot["temp_channels"]["1"]) == 20
+
+    # après la compaction, les nouvelles lignes sont rejouées par-dessus le snapshot
+    _set(bot, storage, holder["data"], "temp_channels", "100", None, "1", None)
+    storage.flush_sync()
+    replay = bot.JournalStorage(lambda: None, bot.JOURNAL_FILE, 0.01, compact_bytes=200)
+    data = replay.load()
+    assert "100" not in data["temp_channels"]["1"]
+    assert len(data["temp_channels"]["1"]) == 19
+
+
+def test_sqlite_migrates_legacy_json_once(bot, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    legacy = bot.empty_data_template()
+    legacy["temp_channels"] = {"1": {"20": 7}}
+    legacy["user_lang"] = {"5": "en"}
+    with open(bot.DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(legacy, f)
+
+    storage = bot.SqliteStorage(bot.SQLITE_FILE, 0.01)
+    assert storage._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    data = storage.load()
+    assert data["temp_channels"] == {"1": {"20": 7}}
+    assert data["user_lang"] == {"5": "en"}
+    storage.close()
+
+    # le fichier JSON a changé depuis : la migration déjà faite n'est pas rejouée
+    legacy["temp_channels"] = {"1": {"21": 8}}
+    with open(bot.DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(legacy, f)
+    storage = bot.SqliteStorage(bot.SQLITE_FILE, 0.01)
+    assert storage.migrate_from_json(bot.DATA_FILE) == 0
+    assert storage.load()["temp_channels"] == {"1": {"20": 7}}
+    storage.close()
+
+
+def test_journal_replay_stops_at_truncated_line(bot, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    holder = {}
+    storage = bot.JournalStorage(lambda: holder["data"], bot.JOURNAL_FILE, 0.01, compact_bytes=1 << 20)
+    holder["data"] = storage.load()
+    for i in range(3):
+        _set(bot, storage, holder["data"], "temp_channels", str(100 + i), i, "1", None)
+    storage.flush_sync()
+    storage._file.close()
+    # crash pendant l'écriture : la dernière ligne est coupée
+    with open(bot.JOURNAL_FILE, "ab") as f:
+        f.write(b'{"n":4,"s":"temp_channels","g":"1","k":"103"')
+
+    replay = bot.JournalStorage(lambda: None, bot.JOURNAL_FILE, 0.01, compact_bytes=1 << 20)
+    data = replay.load()
+    assert data["temp_channels"] == {"1": {"100": 0, "101": 1, "102": 2}}
+    assert replay._seq == 3
+    # la relecture est repliée dans le snapshot : le journal repart vide
+    assert os.path.getsize(bot.JOURNAL_FILE) == 0
+    replay._file.close()
+
+
+def test_sharded_lazy_load_and_dirty_flush(bot, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    holder = {}
+    storage = bot.ShardedStorage(lambda: holder["data"], bot.SHARD_DIR, 0.01)
+    holder["data"] = storage.load()
+    for gid in ("1", "2"):
+        _set(bot, storage, holder["data"], "temp_channels", "20" + gid, 7, gid, None)
+    storage.close()
+
+    holder = {}
+    storage = bot.ShardedStorage(lambda: holder["data"], bot.SHARD_DIR, 0.01)
+    holder["data"] = storage.load()
+    # rien n'est lu avant le premier événement du serveur
+    assert holder["data"]["temp_channels"] == {}
+    assert not storage.is_loaded("1")
+    assert asyncio.run(storage.stored_guilds()) == {"1", "2"}
+    assert storage.ensure_guild(holder["data"], "1")
+    assert not storage.ensure_guild(holder["data"], "1")
+    assert holder["data"]["temp_channels"] == {"1": {"201": 7}}
+
+    # seul le fichier du serveur modifié est réécrit
+    _set(bot, storage, holder["data"], "temp_channels", "201", None, "1", None)
+    assert storage.stats["last_size"] == 1
+    assert not os.path.exists(os.path.join(bot.SHARD_DIR, "1.json"))
+    assert os.path.exists(os.path.join(bot.SHARD_DIR, "2.json"))
+    storage.close()
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+
+
+class ListExporter:
+    def __init__(self):
+        self.exported = []
+
+    def export(self, spans):
+        self.exported.append(list(spans))
+
+
+def _traced_handler(bot, tracer, n):
+    for i in range(n):
+        with tracer.span("handler", root=True, i=i):
+            with tracer.span("rest"):
+                pass
+
+
+def test_sampling_ratio_zero_and_one(bot):
+    exporter = ListExporter()
+    # ratio 0 sans seuil de lenteur : traçage désactivé
+    disabled = bot.Tracer(exporter, 0.0, 0.0)
+    assert disabled.start("handler") is None
+    _traced_handler(bot, disabled, 5)
+    # ratio 0 avec un seuil jamais atteint : rien n'est exporté non plus
+    _traced_handler(bot, bot.Tracer(exporter, 0.0, 60_000.0), 5)
+    assert exporter.exported == []
+
+    _traced_handler(bot, bot.Tracer(exporter, 1.0, 0.0), 5)
+    assert len(exporter.exported) == 5
+    assert all([span.name for span in trace] == ["rest", "handler"] for trace in exporter.exported)
+
+
+def test_slow_traces_kept_without_sampling(bot):
+    exporter = ListExporter()
+    tracer = bot.Tracer(exporter, 0.0, 1.0)
+
+    async def scenario():
+        with tracer.span("fast", root=True):
+            pass
+        with tracer.span("slow", root=True):
+            with tracer.span("rest"):
+                await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert [[span.name for span in trace] for trace in exporter.exported] == [["rest", "slow"]]
+
+
+def test_parent_child_propagation_across_await(bot):
+    exporter = ListExporter()
+    tracer = bot.Tracer(exporter, 1.0, 0.0)
+
+    async def fetch():
+        await asyncio.sleep(0)
+        with tracer.span("rest.fetch"):
+            await asyncio.sleep(0)
+
+    async def handler():
+        with tracer.span("on_message", root=True) as root:
+            await fetch()
+            # une tâche lancée depuis le handler hérite du contexte (copie)
+            await asyncio.get_running_loop().create_task(fetch())
+            with tracer.span("storage.flush"):
+                await asyncio.sleep(0)
+        return root
+
+    async def scenario():
+        # deux handlers concurrents : chacun garde sa propre span courante
+        return await asyncio.gather(handler(), handler())
+
+    roots = asyncio.run(scenario())
+    assert len(exporter.exported) == 2
+    for root in roots:
+        (trace,) = [t for t in exporter.exported if t[-1] is root]
+        assert [span.name for span in trace] == ["rest.fetch", "rest.fetch", "storage.flush", "on_message"]
+        assert all(span.trace_id == root.trace_id and span.parent_id == root.span_id for span in trace[:-1])
+        assert root.parent_id is None
+    assert bot._CURRENT_SPAN.get() is None
+
+
+def test_error_status_and_otlp_line_shape(bot, tmp_path):
+    exporter = ListExporter()
+    tracer = bot.Tracer(exporter, 1.0, 0.0)
+    try:
+        with tracer.span("/create_temp", root=True, guild=1, ok=True, ratio=0.5, kind="voice"):
+            with tracer.span("rest.create_voice_channel"):
+                raise ValueError("boom")
+    except ValueError:
+        pass
+    (spans,) = exporter.exported
+    file_exporter = bot.TraceFileExporter(str(tmp_path / "traces.jsonl"), 1 << 20, 1)
+    doc = json.loads(file_exporter._encode(spans))
+
+    (resource,) = doc["resourceSpans"]
+    assert {"key": "service.name", "value": {"stringValue": bot.TRACE_SERVICE_NAME}} in resource["resource"]["attributes"]
+    (scope,) = resource["scopeSpans"]
+    child, root = scope["spans"]
+    assert root["name"] == "/create_temp" and "parentSpanId" not in root
+    assert child["parentSpanId"] == root["spanId"] and child["traceId"] == root["traceId"]
+    assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+    assert root["attributes"] == [
+        {"key": "guild", "value": {"intValue": "1"}},
+        {"key": "ok", "value": {"boolValue": True}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "kind", "value": {"stringValue": "voice"}},
+    ]
+    assert child["status"] == {"code": 2, "message": "ValueError: boom"}
+    assert root["status"] == {"code": 2, "message": "ValueError: boom"}
+
+
+def _write(exporter, spans):
+    # un passage du thread d'écriture, exécuté ici
+    exporter._queue.append(spans)
+    exporter._stop = True
+    exporter._wake.set()
+    exporter._run()
+
+
+def test_rotation_at_max_bytes(bot, tmp_path):
+    exporter = ListExporter()
+    tracer = bot.Tracer(exporter, 1.0, 0.0)
+    _traced_handler(bot, tracer, 4)
+    path = str(tmp_path / "traces.jsonl")
+    file_exporter = bot.TraceFileExporter(path, 100, backups=2)
+
+    for spans in exporter.exported:
+        _write(file_exporter, spans)
+    # chaque ligne dépasse max_bytes : rotation avant chaque écriture, deux sauvegardes gardées
+    assert sorted(os.listdir(tmp_path)) == ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"]
+    names = []
+    for suffix in (".2", ".1", ""):
+        with open(path + suffix, "r", encoding="utf-8") as f:
+            (line,) = f.read().splitlines()
+        names.append([a["value"]["intValue"] for a in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][1]["attributes"]])
+    assert names == [["1"], ["2"], ["3"]]
+    assert file_exporter.stats["exported"] == 4